@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+from .item_store import encode_items, decode_items, item_key
+from .ranker import tokenize
+
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def _format_time(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime(_TIME_FORMAT) if isinstance(value, datetime) else None
+
+
+def _index_text(item: Dict[str, Any]) -> str:
+    """全文索引的文本：与排序模块相同的分词结果，中文按相邻两字切分"""
+    return ' '.join(tokenize(f"{item.get('title', '')} {item.get('content', '')}"))
+
+
+def _match_query(keyword: str) -> Optional[str]:
+    """把关键词转换为FTS5短语查询，关键词切分后的词必须相邻出现"""
+    tokens = tokenize(keyword)
+    if not tokens:
+        return None
+    return '"' + ' '.join(token.replace('"', '') for token in tokens) + '"'
+
+
+class Archive:
+    """新闻和摘要的长期存档
+
+    保存每次运行处理后的新闻（含相似新闻簇编号）和生成的分类摘要，
+    新闻标题和内容建立FTS5全文索引，可按关键词、来源、分类和日期范围查询。
+    当前SQLite不支持FTS5时退化为LIKE查询。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS items (
+                    key TEXT PRIMARY KEY,
+                    title TEXT,
+                    link TEXT,
+                    content TEXT,
+                    source_name TEXT,
+                    source_url TEXT,
+                    category TEXT,
+                    cluster_id TEXT,
+                    published TEXT,
+                    archived_at TEXT NOT NULL,
+                    payload TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_archive_items_time ON items (published, archived_at);
+                CREATE INDEX IF NOT EXISTS idx_archive_items_source ON items (source_name);
+                CREATE TABLE IF NOT EXISTS summaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_date TEXT NOT NULL,
+                    profile TEXT NOT NULL DEFAULT '',
+                    category TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    item_keys TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_archive_summaries ON summaries (run_date, profile, category);
+                CREATE TABLE IF NOT EXISTS digests (
+                    period TEXT NOT NULL,
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    input_hash TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (period, start_date, end_date, profile, category)
+                );
+            """)
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(key UNINDEXED, text)")
+                self.fts5 = True
+            except sqlite3.OperationalError:
+                self.logger.warning("当前SQLite不支持FTS5，关键词查询将使用LIKE")
+                self.fts5 = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def add_items(self, items: List[Dict[str, Any]], batch_size: int = 500) -> int:
+        """存档新闻，已存档的新闻更新簇编号等字段，每batch_size条一个事务，返回写入条数"""
+        items = [item for item in items if item]
+        archived_at = datetime.utcnow().strftime(_TIME_FORMAT)
+        with closing(self._connect()) as conn:
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                rows = [(
+                    item_key(item),
+                    item.get('title'),
+                    item.get('link'),
+                    item.get('content'),
+                    item.get('source_name'),
+                    item.get('source_url'),
+                    item.get('category', 'general'),
+                    item.get('cluster_id'),
+                    _format_time(item.get('published')),
+                    archived_at,
+                    encode_items(item)
+                ) for item in batch]
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO items (key, title, link, content, source_name, source_url, category, "
+                    "cluster_id, published, archived_at, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                if self.fts5:
+                    keys = [(row[0],) for row in rows]
+                    conn.executemany("DELETE FROM items_fts WHERE key = ?", keys)
+                    conn.executemany(
+                        "INSERT INTO items_fts (key, text) VALUES (?, ?)",
+                        [(item_key(item), _index_text(item)) for item in batch]
+                    )
+                conn.execute("COMMIT")
+        self.logger.info(f"已存档 {len(items)} 条新闻")
+        return len(items)
+
+    def add_summaries(self, run_date: str, summaries: Dict[str, Any], profile: str = '') -> None:
+        """存档一次运行的分类摘要
+
+        Args:
+            run_date: 运行日期，格式YYYY-MM-DD
+            summaries: 分类到(Markdown摘要, 新闻列表)的映射
+            profile: profile名称，单profile模式为空字符串
+        """
+        created_at = datetime.utcnow().strftime(_TIME_FORMAT)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO summaries (run_date, profile, category, summary, item_keys, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_date, profile, category, summary, json.dumps([item_key(item) for item in items]), created_at)
+                 for category, (summary, items) in summaries.items()]
+            )
+            conn.execute("COMMIT")
+
+    def search(self, keyword: Optional[str] = None, source: Optional[str] = None,
+               category: Optional[str] = None, since: Optional[datetime] = None,
+               until: Optional[datetime] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """查询存档的新闻，按发布时间倒序返回
+
+        Args:
+            keyword: 标题或内容中的关键词
+            source: 源名称或源URL
+            category: 分类
+            since/until: 发布时间范围（UTC），发布时间未知时按存档时间
+        """
+        clauses = []
+        params = []
+        if keyword:
+            query = _match_query(keyword) if self.fts5 else None
+            if query:
+                clauses.append("key IN (SELECT key FROM items_fts WHERE items_fts MATCH ?)")
+                params.append(query)
+            else:
+                clauses.append("(title LIKE ? OR content LIKE ?)")
+                params.extend([f"%{keyword}%"] * 2)
+        if source:
+            clauses.append("(source_name = ? OR source_url = ?)")
+            params.extend([source, source])
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        if since:
+            clauses.append("COALESCE(published, archived_at) >= ?")
+            params.append(_format_time(since))
+        if until:
+            clauses.append("COALESCE(published, archived_at) < ?")
+            params.append(_format_time(until))
+
+        sql = "SELECT payload, cluster_id FROM items"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY COALESCE(published, archived_at) DESC LIMIT ?"
+        params.append(limit)
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        results = []
+        for payload, cluster_id in rows:
+            item = decode_items(payload)
+            item['cluster_id'] = cluster_id
+            results.append(item)
+        return results
+
+    def summaries(self, since: Optional[str] = None, until: Optional[str] = None,
+                  category: Optional[str] = None, profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """查询存档的分类摘要，按运行日期排序，日期格式YYYY-MM-DD，until不含当天"""
+        clauses = []
+        params = []
+        for clause, value in (("run_date >= ?", since), ("run_date < ?", until),
+                              ("category = ?", category), ("profile = ?", profile)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        sql = "SELECT run_date, profile, category, summary, item_keys FROM summaries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY run_date, id"
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [
+            {'run_date': run_date, 'profile': profile, 'category': category,
+             'summary': summary, 'item_keys': json.loads(item_keys)}
+            for run_date, profile, category, summary, item_keys in rows
+        ]
+
+    def load_digest(self, period: str, start_date: str, end_date: str, profile: str,
+                    category: str, input_hash: str) -> Optional[str]:
+        """读取输入未变化的已生成汇总摘要，没有或输入已变化时返回None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT summary FROM digests WHERE period = ? AND start_date = ? AND end_date = ? "
+                "AND profile = ? AND category = ? AND input_hash = ?",
+                (period, start_date, end_date, profile, category, input_hash)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_digest(self, period: str, start_date: str, end_date: str, profile: str,
+                    category: str, input_hash: str, summary: str) -> None:
+        """保存汇总摘要，覆盖同一区间之前的结果"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO digests (period, start_date, end_date, profile, category, input_hash, "
+                "summary, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (period, start_date, end_date, profile, category, input_hash, summary,
+                 datetime.utcnow().strftime(_TIME_FORMAT))
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查询谛听新闻存档')
+    parser.add_argument('--path', default=os.path.join('data', 'archive.db'), help='存档数据库路径')
+    subparsers = parser.add_subparsers(dest='command')
+
+    items_parser = subparsers.add_parser('items', help='查询新闻')
+    items_parser.add_argument('--keyword', help='标题或内容中的关键词')
+    items_parser.add_argument('--source', help='源名称或源URL')
+    items_parser.add_argument('--category', help='分类')
+    items_parser.add_argument('--since', help='起始日期（含），格式YYYY-MM-DD')
+    items_parser.add_argument('--until', help='结束日期（含），格式YYYY-MM-DD')
+    items_parser.add_argument('--limit', type=int, default=50, help='最多返回的条数')
+
+    summaries_parser = subparsers.add_parser('summaries', help='查询分类摘要')
+    summaries_parser.add_argument('--category', help='分类')
+    summaries_parser.add_argument('--profile', help='profile名称')
+    summaries_parser.add_argument('--since', help='起始日期（含），格式YYYY-MM-DD')
+    summaries_parser.add_argument('--until', help='结束日期（含），格式YYYY-MM-DD')
+
+    args = parser.parse_args()
+    archive = Archive(args.path)
+    since = datetime.strptime(args.since, '%Y-%m-%d') if getattr(args, 'since', None) else None
+    until = datetime.strptime(args.until, '%Y-%m-%d') + timedelta(days=1) if getattr(args, 'until', None) else None
+
+    if args.command == 'items':
+        for item in archive.search(args.keyword, args.source, args.category, since, until, args.limit):
+            published = _format_time(item.get('published')) or '发布时间未知'
+            print(f"[{published}] [{item.get('source_name', '')}] {item.get('title', '')}\n    {item.get('link', '')}")
+    elif args.command == 'summaries':
+        for record in archive.summaries(
+            since.strftime('%Y-%m-%d') if since else None,
+            until.strftime('%Y-%m-%d') if until else None,
+            args.category,
+            args.profile
+        ):
+            print(f"===== {record['run_date']} {record['profile']} {record['category']} =====\n{record['summary']}\n")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import requests
+
+# 批处理任务的终止状态
+FINISHED = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def parse_batch_output(lines: List[str]) -> Dict[str, Optional[str]]:
+    """解析批处理输出文件，返回custom_id到生成内容的映射，失败的请求对应None"""
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get('response') or {}
+        content = None
+        if response.get('status_code') == 200:
+            choices = (response.get('body') or {}).get('choices') or []
+            if choices:
+                content = choices[0]['message'].get('content')
+        results[record['custom_id']] = content
+    return results
+
+
+class DashScopeBatchClient:
+    """DashScope的OpenAI兼容批处理接口
+
+    上传JSONL任务文件后创建批处理任务，任务在completion_window内异步完成，
+    完成后通过输出文件下载结果。
+    """
+
+    def __init__(self, api_key: str, config: Dict[str, Any] = None):
+        config = config or {}
+        self.api_key = api_key
+        self.base_url = config.get('base_url', 'https://dashscope.aliyuncs.com/compatible-mode/v1')
+        self.completion_window = config.get('completion_window', '24h')
+        self.timeout = config.get('timeout', 30)
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def submit(self, path: str) -> str:
+        """上传任务文件并创建批处理任务，返回任务ID"""
+        with open(path, 'rb') as f:
+            response = requests.post(
+                f"{self.base_url}/files",
+                headers=self._headers(),
+                data={'purpose': 'batch'},
+                files={'file': (os.path.basename(path), f, 'application/jsonl')},
+                timeout=self.timeout
+            )
+        response.raise_for_status()
+        file_id = response.json()['id']
+
+        response = requests.post(
+            f"{self.base_url}/batches",
+            headers=self._headers(),
+            json={
+                'input_file_id': file_id,
+                'endpoint': '/v1/chat/completions',
+                'completion_window': self.completion_window
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()['id']
+
+    def status(self, batch_id: str) -> Tuple[str, Optional[str]]:
+        """查询任务状态，返回(状态, 输出文件ID)"""
+        response = requests.get(f"{self.base_url}/batches/{batch_id}", headers=self._headers(), timeout=self.timeout)
+        response.raise_for_status()
+        result = response.json()
+        return result['status'], result.get('output_file_id')
+
+    def results(self, output_ref: str) -> Dict[str, Optional[str]]:
+        """下载输出文件并解析结果"""
+        response = requests.get(
+            f"{self.base_url}/files/{output_ref}/content",
+            headers=self._headers(),
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return parse_batch_output(response.text.splitlines())
+
+
+class LocalBatchClient:
+    """本地批处理替身，用于测试和没有批处理接口的环境
+
+    首次查询状态时逐条调用handler处理任务文件中的请求，
+    把结果写成与批处理接口相同格式的输出文件。
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], str]):
+        self.handler = handler
+        self.logger = logging.getLogger(__name__)
+
+    def submit(self, path: str) -> str:
+        return path
+
+    def status(self, batch_id: str) -> Tuple[str, Optional[str]]:
+        output_path = f"{os.path.splitext(batch_id)[0]}.output.jsonl"
+        if not os.path.exists(output_path):
+            with open(batch_id, 'r', encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            with open(output_path, 'w', encoding='utf-8') as out:
+                for request in entries:
+                    out.write(json.dumps(self._process(request), ensure_ascii=False) + '\n')
+        return 'completed', output_path
+
+    def _process(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            content = self.handler(request['body'])
+            response = {'status_code': 200, 'body': {'choices': [{'message': {'role': 'assistant', 'content': content}}]}}
+            error = None
+        except Exception as e:
+            self.logger.error(f"本地批处理请求 {request['custom_id']} 失败: {str(e)}")
+            response = {'status_code': 500, 'body': None}
+            error = {'message': str(e)}
+        return {'custom_id': request['custom_id'], 'response': response, 'error': error}
+
+    def results(self, output_ref: str) -> Dict[str, Optional[str]]:
+        with open(output_ref, 'r', encoding='utf-8') as f:
+            return parse_batch_output(f.readlines())
+
+
+class BatchQueue:
+    """可延后分类的批处理队列
+
+    一次运行中收集的请求写入同一个JSONL任务文件提交，任务状态和引用编号
+    映射保存在同目录的JSON文件里，进程重启后仍可继续查询和合并结果。
+    """
+
+    def __init__(self, config: Dict[str, Any], client):
+        self.client = client
+        self.categories = set(config.get('categories', []))
+        self.directory = config.get('dir', os.path.join('data', 'batches'))
+        self.model = config.get('model', 'qwen-turbo')
+        self.max_tokens = config.get('max_tokens', 1500)
+        self.poll_interval = config.get('poll_interval', 30)
+        self.logger = logging.getLogger(__name__)
+        self._requests = []
+        self._meta = {}
+
+    def is_deferred(self, category: str) -> bool:
+        return category in self.categories
+
+    def add(self, category: str, messages: List[Dict[str, str]], refs: Optional[Dict[str, str]] = None,
+            profile: str = '', items: Optional[List[Dict[str, Any]]] = None) -> str:
+        """加入一个待提交的请求，返回custom_id
+
+        profile为等待该结果的profile名称，单profile模式为空字符串；items为提示词中的新闻，
+        保存标题、链接、来源和内容，用于收取结果时校验链接，以及请求没有结果时改为同步生成。
+        """
+        custom_id = f"{category}-{len(self._requests) + 1}"
+        self._requests.append({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {'model': self.model, 'messages': messages, 'max_tokens': self.max_tokens}
+        })
+        self._meta[custom_id] = {
+            'category': category, 'refs': refs, 'profiles': [profile],
+            'items': [{'title': item.get('title', ''), 'link': item['link'],
+                       'source_name': item.get('source_name', ''), 'content': item.get('content', '')}
+                      for item in items or [] if item and item.get('link')]
+        }
+        return custom_id
+
+    def add_profile(self, job_id: str, custom_id: str, profile: str) -> None:
+        """已提交的请求的结果也发送给另一个profile（不同profile的相同分类和新闻集合只提交一次）"""
+        for job in self._load_jobs([job_id]):
+            profiles = job['requests'][custom_id].setdefault('profiles', [''])
+            if profile not in profiles:
+                profiles.append(profile)
+                self._save_job(job)
+
+    def flush(self) -> Optional[str]:
+        """提交本次运行收集的请求，返回任务编号；没有请求或提交失败时返回None"""
+        if not self._requests:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        job_id = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        input_path = os.path.join(self.directory, f"{job_id}.jsonl")
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for request in self._requests:
+                f.write(json.dumps(request, ensure_ascii=False) + '\n')
+
+        job = {'job_id': job_id, 'status': 'submitted', 'requests': self._meta}
+        self._requests = []
+        self._meta = {}
+        try:
+            job['batch_id'] = self.client.submit(input_path)
+        except Exception as e:
+            self.logger.error(f"提交批处理任务 {job_id} 失败: {str(e)}")
+            return None
+        self._save_job(job)
+
+        self.logger.info(f"已提交批处理任务 {job_id}，共 {len(job['requests'])} 个请求")
+        return job_id
+
+    def poll(self, job_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """查询未完成的任务，返回已结束任务中每个请求的任务编号、分类、生成内容、引用编号映射和等待结果的profile
+
+        没有结果的请求（任务失败、过期或个别请求出错）summary为None，由调用方按保存的新闻改为同步生成；
+        结果送达后需调用mark_collected，否则下次查询仍会返回。
+        """
+        completed = []
+        for job in self._load_jobs(job_ids):
+            try:
+                status, output_ref = self.client.status(job['batch_id'])
+            except Exception as e:
+                self.logger.warning(f"查询批处理任务 {job['job_id']} 状态失败: {str(e)}")
+                continue
+            if status not in FINISHED:
+                continue
+
+            if status == 'completed' and output_ref:
+                results = self.client.results(output_ref)
+            else:
+                self.logger.error(f"批处理任务 {job['job_id']} 结束，状态: {status}")
+                results = {}
+            for custom_id, meta in job['requests'].items():
+                if not results.get(custom_id) and status == 'completed':
+                    self.logger.error(f"批处理请求 {custom_id} 没有返回结果")
+                completed.append(dict(meta, job_id=job['job_id'], custom_id=custom_id,
+                                      summary=results.get(custom_id) or None))
+        return completed
+
+    def mark_collected(self, job_ids: List[str]) -> None:
+        """结果已合并或发送后标记任务完成"""
+        for job in self._load_jobs(sorted(set(job_ids))):
+            job['status'] = 'collected'
+            self._save_job(job)
+
+    def pending(self, job_id: str) -> bool:
+        """任务是否仍在等待收取"""
+        return bool(self._load_jobs([job_id]))
+
+    def wait(self, job_id: str, timeout: float) -> List[Dict[str, Any]]:
+        """在timeout秒内等待任务完成，超时返回空列表，任务留待之后收取"""
+        deadline = time.time() + timeout
+        while True:
+            completed = self.poll([job_id])
+            if completed or not self.pending(job_id):
+                return completed
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return []
+            time.sleep(min(self.poll_interval, remaining))
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save_job(self, job: Dict[str, Any]) -> None:
+        with open(self._job_path(job['job_id']), 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+
+    def _load_jobs(self, job_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """读取状态为submitted的任务"""
+        if job_ids is None:
+            if not os.path.isdir(self.directory):
+                return []
+            job_ids = sorted(name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json'))
+
+        jobs = []
+        for job_id in job_ids:
+            try:
+                with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except (IOError, ValueError) as e:
+                self.logger.warning(f"读取批处理任务 {job_id} 失败: {str(e)}")
+                continue
+            if job.get('status') == 'submitted':
+                jobs.append(job)
+        return jobs
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import base64
+import builtins
+import gzip
+import hashlib
+import json
+import logging
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def _body_hash(body) -> str:
+    if body is None:
+        return ''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if not isinstance(body, bytes):
+        return ''
+    return hashlib.sha1(body).hexdigest()
+
+
+def _error_info(e: BaseException) -> Dict[str, Any]:
+    args = [arg.decode('utf-8', 'replace') if isinstance(arg, bytes) else arg for arg in e.args]
+    args = [arg if isinstance(arg, (str, int, float)) else str(arg) for arg in args]
+    return {'type': type(e).__name__, 'message': str(e), 'args': args}
+
+
+def _rebuild_error(info: Dict[str, Any], *modules) -> BaseException:
+    """按记录的类型名依次在modules和内置异常中查找并重建异常，找不到时返回RuntimeError"""
+    for module in modules + (builtins,):
+        cls = getattr(module, info['type'], None)
+        if isinstance(cls, type) and issubclass(cls, BaseException):
+            try:
+                return cls(*info.get('args', []))
+            except TypeError:
+                return cls(info['message'])
+    return RuntimeError(info['message'])
+
+
+class Cassette:
+    """外部I/O的录制与回放
+
+    录制模式下记录运行期间所有经过requests的HTTP响应（RSS、图片、通义千问接口和SDK）
+    以及SMTP会话，逐行写入gzip压缩的JSON文件；回放模式下按请求方法和URL（优先请求体一致的记录）
+    返回录制的响应，并按录制时的耗时除以speed等待，speed为0时不等待。SMTP只回放各步骤的结果，
+    不会真正发信。录制和回放期间通过pin()固定运行时间等与时钟有关的值；会影响发出哪些请求的本地缓存
+    放在state_dir临时目录中，结束时删除。
+    """
+
+    def __init__(self, path: str, mode: str = 'record', speed: float = 1.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"未知的cassette模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._file = None
+        self._started = None
+        self._originals = {}
+        self.state_dir = None
+
+        self._meta = {}
+        self._http = []
+        self._http_index = {}
+        self._smtp = []
+        self.stats = {'http': 0, 'smtp': 0, 'misses': 0}
+        if mode == 'replay':
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry['kind'] == 'meta':
+                    self._meta[entry['name']] = entry['value']
+                elif entry['kind'] == 'http':
+                    entry['used'] = False
+                    self._http_index.setdefault((entry['method'], entry['url']), []).append(len(self._http))
+                    self._http.append(entry)
+                elif entry['kind'] == 'smtp':
+                    self._smtp.append(entry)
+        self.logger.info(f"已读取cassette {self.path}：HTTP响应 {len(self._http)} 个，SMTP步骤 {len(self._smtp)} 个")
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self.stats[entry['kind']] = self.stats.get(entry['kind'], 0) + 1
+
+    def _wait(self, elapsed: float) -> None:
+        if self.speed and elapsed:
+            time.sleep(elapsed / self.speed)
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def install(self) -> None:
+        """替换HTTPAdapter.send和smtplib中的连接类"""
+        if self._originals:
+            return
+        self._started = time.time()
+        self.state_dir = tempfile.mkdtemp(prefix='diting-cassette-')
+        if self.mode == 'record':
+            self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self._originals = {
+            'send': HTTPAdapter.send,
+            'SMTP': smtplib.SMTP,
+            'SMTP_SSL': smtplib.SMTP_SSL
+        }
+        cassette = self
+
+        def send(adapter, request, *args, **kwargs):
+            return cassette._send(adapter, request, args, kwargs)
+        HTTPAdapter.send = send
+        smtplib.SMTP = self._smtp_factory(self._originals['SMTP'])
+        smtplib.SMTP_SSL = self._smtp_factory(self._originals['SMTP_SSL'])
+        self.logger.info(f"cassette {'录制' if self.mode == 'record' else '回放'}已开启: {self.path}")
+
+    def uninstall(self) -> None:
+        if not self._originals:
+            return
+        HTTPAdapter.send = self._originals['send']
+        smtplib.SMTP = self._originals['SMTP']
+        smtplib.SMTP_SSL = self._originals['SMTP_SSL']
+        self._originals = {}
+        if self.state_dir:
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+            self.state_dir = None
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+        if self.mode == 'record':
+            self.logger.info(f"cassette录制完成：HTTP响应 {self.stats['http']} 个，SMTP步骤 {self.stats['smtp']} 个")
+        else:
+            unused = sum(1 for entry in self._http if not entry['used'])
+            self.logger.info(f"cassette回放完成：HTTP响应 {self.stats['http']} 个，未命中 {self.stats['misses']} 个，"
+                             f"未使用的记录 {unused} 个")
+
+    def pin(self, name: str, value: Optional[datetime]) -> Optional[datetime]:
+        """固定与时钟有关的值：录制时记下value，回放时返回录制的值"""
+        if self.mode == 'record':
+            self._write({'kind': 'meta', 'name': name,
+                         'value': value.strftime(_TIME_FORMAT) if value else None})
+            return value
+        if name not in self._meta:
+            return value
+        recorded = self._meta[name]
+        return datetime.strptime(recorded, _TIME_FORMAT) if recorded else None
+
+    def _send(self, adapter: HTTPAdapter, request, args: tuple, kwargs: Dict[str, Any]) -> requests.Response:
+        if self.mode == 'replay':
+            return self._replay_http(adapter, request)
+
+        entry = {'kind': 'http', 'method': request.method, 'url': request.url,
+                 'body_hash': _body_hash(request.body), 'offset': time.time() - self._started}
+        started = time.time()
+        try:
+            response = self._originals['send'](adapter, request, *args, **kwargs)
+            # 录制时完整读取响应体，调用方之后的iter_content从已读取的内容中分块返回
+            body = response.content
+        except Exception as e:
+            entry.update({'elapsed': time.time() - started, 'error': _error_info(e)})
+            self._write(entry)
+            raise
+        entry.update({
+            'elapsed': time.time() - started,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': list(response.headers.items()),
+            'body': base64.b64encode(body or b'').decode('ascii')
+        })
+        self._write(entry)
+        return response
+
+    def _replay_http(self, adapter: HTTPAdapter, request) -> requests.Response:
+        body_hash = _body_hash(request.body)
+        with self._lock:
+            candidates = [self._http[i] for i in self._http_index.get((request.method, request.url), [])
+                          if not self._http[i]['used']]
+            entry = next((c for c in candidates if c['body_hash'] == body_hash), None)
+            if entry is None and candidates:
+                entry = candidates[0]
+            if entry is not None:
+                entry['used'] = True
+                self.stats['http'] += 1
+            else:
+                self.stats['misses'] += 1
+        if entry is None:
+            self.logger.warning(f"cassette中没有 {request.method} {request.url} 的记录")
+            raise requests.exceptions.ConnectionError(f"cassette中没有 {request.method} {request.url} 的记录",
+                                                      request=request)
+
+        self._wait(entry['elapsed'])
+        if entry.get('error'):
+            raise _rebuild_error(entry['error'], requests.exceptions)
+
+        body = base64.b64decode(entry['body'])
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = adapter
+        response.elapsed = timedelta(seconds=entry['elapsed'])
+        response.raw = BytesIO(body)
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    def _next_smtp(self, op: str) -> Optional[Dict[str, Any]]:
+        """按顺序取出下一个同名的SMTP步骤"""
+        with self._lock:
+            for i, entry in enumerate(self._smtp):
+                if entry['op'] == op:
+                    self.stats['smtp'] += 1
+                    return self._smtp.pop(i)
+        return None
+
+    def _smtp_factory(self, original):
+        cassette = self
+
+        class RecordedSMTP:
+            """录制时代理真实连接并记录每一步，回放时只返回录制的结果"""
+
+            def __init__(self, host='', port=0, *args, **kwargs):
+                self._server = None
+                if cassette.mode == 'replay':
+                    cassette._replay_smtp('connect')
+                    cassette.logger.info(f"回放SMTP会话 {host}:{port}，不会真正发送邮件")
+                    return
+                self._server = cassette._record_smtp('connect', {'host': host, 'port': port},
+                                                     lambda: original(host, port, *args, **kwargs))
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.close()
+
+            def close(self):
+                if self._server is not None:
+                    self._server.close()
+
+            def __getattr__(self, name):
+                def call(*args, **kwargs):
+                    if cassette.mode == 'replay':
+                        return cassette._replay_smtp(name)
+                    method = getattr(self._server, name)
+                    return cassette._record_smtp(name, _smtp_args(name, args), lambda: method(*args, **kwargs))
+                return call
+
+        return RecordedSMTP
+
+    def _record_smtp(self, op: str, args: Dict[str, Any], call):
+        entry = {'kind': 'smtp', 'op': op, 'args': args, 'offset': time.time() - self._started}
+        started = time.time()
+        try:
+            result = call()
+        except Exception as e:
+            entry.update({'elapsed': time.time() - started, 'error': _error_info(e)})
+            self._write(entry)
+            raise
+        entry['elapsed'] = time.time() - started
+        if op != 'connect':
+            entry['result'] = _jsonable(result)
+        self._write(entry)
+        return result
+
+    def _replay_smtp(self, op: str):
+        entry = self._next_smtp(op)
+        if entry is None:
+            return None
+        self._wait(entry['elapsed'])
+        if entry.get('error'):
+            raise _rebuild_error(entry['error'], smtplib)
+        return entry.get('result')
+
+
+def _smtp_args(op: str, args: tuple) -> Dict[str, Any]:
+    """SMTP步骤的参数摘要，不记录密码和邮件正文"""
+    if op == 'login':
+        return {'user': args[0] if args else None}
+    if op == 'send_message' and args:
+        msg = args[0]
+        return {'subject': msg.get('Subject'), 'from': msg.get('From'), 'to': msg.get('To'),
+                'bytes': len(msg.as_bytes())}
+    if op == 'sendmail' and len(args) >= 3:
+        return {'from': args[0], 'to': args[1], 'bytes': len(args[2])}
+    return {}
+
+
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
@@ -10,9 +10,21 @@ from io import BytesIO
 import os
 from bs4 import BeautifulSoup
 
+from .image_triage import ImageTriage
+from .video_processor import VideoProcessor
+
 class ContentProcessor:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        # 图片下载前的筛选，按image_processing.triage配置在首次处理图片时创建
+        self.image_triage = None
+        # 视频探测和抽帧，按video_processing配置在首次处理视频时创建
+        self.video_processor = None
+        
+    def start_report(self) -> None:
+        """开始新的一次报告，重置报告级的图片数量上限"""
+        if self.image_triage:
+            self.image_triage.reset()
         
     def process(self, items: List[Dict[str, Any]], content_type: str, rules: Dict[str, Any]) -> List[Dict[str, Any]]:
         """处理新闻内容
@@ -33,11 +45,12 @@ class ContentProcessor:
                 if self._should_filter(item, rules['content_filters']):
                     continue
                     
-                # 处理文本内容
+                # 处理文本内容，抓取到的全文使用full_text的长度上限
                 if 'content' in item:
                     item['content'] = self._process_text(
                         item['content'],
-                        rules['content_extractors']
+                        rules['content_extractors'],
+                        full_text=item.get('full_text', False)
                     )
                     
                 # 处理标题
@@ -52,7 +65,8 @@ class ContentProcessor:
                 if content_type in ['image', 'video']:
                     item['media'] = self._process_media(
                         item['media'],
-                        rules['image_processing']
+                        rules['image_processing'],
+                        rules.get('video_processing')
                     )
                     
                 processed_items.append(item)
@@ -72,7 +86,8 @@ class ContentProcessor:
                 return True
         return False
         
-    def _process_text(self, text: str, rules: Dict[str, Dict[str, int]], is_title: bool = False) -> str:
+    def _process_text(self, text: str, rules: Dict[str, Dict[str, int]], is_title: bool = False,
+                      full_text: bool = False) -> str:
         """处理文本内容"""
         if not text:
             return text
@@ -85,26 +100,50 @@ class ContentProcessor:
         text = re.sub(r'\s+', ' ', text).strip()
         
         # 截断文本
-        max_length = rules['title']['max_length'] if is_title else rules['summary']['max_length']
+        if is_title:
+            max_length = rules['title']['max_length']
+        elif full_text:
+            max_length = rules.get('full_text', rules['summary'])['max_length']
+        else:
+            max_length = rules['summary']['max_length']
         if len(text) > max_length:
             text = text[:max_length] + '...'
             
         return text
         
-    def _process_media(self, media: Dict[str, List[str]], rules: Dict[str, Any]) -> Dict[str, List[str]]:
+    def _process_media(self, media: Dict[str, List[str]], rules: Dict[str, Any],
+                       video_rules: Dict[str, Any] = None) -> Dict[str, List[str]]:
         """处理媒体内容"""
         processed_media = {
             'images': [],
-            'videos': media['videos']  # 视频暂时不做处理
+            'videos': media['videos'],
+            'video_meta': []
         }
         
+        # 视频只探测元数据并抽取关键帧，关键帧和图片一起进入邮件
+        if media['videos']:
+            if self.video_processor is None:
+                self.video_processor = VideoProcessor(video_rules)
+            processed_media['video_meta'] = self.video_processor.process(media['videos'])
+            for meta in processed_media['video_meta']:
+                processed_media['images'].extend(meta['frames'])
+        
+        # 去重并跳过过小、过大的图片，只下载通过筛选的部分
+        if self.image_triage is None:
+            self.image_triage = ImageTriage(rules.get('triage'))
+        image_urls = self.image_triage.select(media['images'], media.get('image_sizes'))
+        
         # 处理图片
-        for img_url in media['images']:
+        for img_url in image_urls:
             try:
                 # 下载图片
                 response = requests.get(img_url, timeout=30)
                 img = Image.open(BytesIO(response.content))
                 
+                # JPEG按目标尺寸以降低的分辨率解码，大图无需完整解码
+                if img.format == 'JPEG':
+                    img.draft('RGB', (rules['max_width'], rules['max_height']))
+                
                 # 调整大小
                 if img.width > rules['max_width'] or img.height > rules['max_height']:
                     img.thumbnail((rules['max_width'], rules['max_height']))
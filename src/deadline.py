@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+# 日报的各个阶段，按执行顺序排列
+STAGES = ('collect', 'summarize', 'render', 'send')
+# 没有历史记录时各阶段的预计耗时（秒）
+DEFAULT_DURATIONS = {'collect': 600, 'summarize': 900, 'render': 60, 'send': 60}
+
+
+class StageTimings:
+    """各阶段历史耗时的记录
+
+    每个阶段保留最近若干次的耗时，持久化到JSON文件，按分位数估计下一次的耗时。
+    """
+
+    def __init__(self, path: str, config: Dict[str, Any] = None):
+        config = config or {}
+        self.path = path
+        self.history = config.get('history', 20)
+        self.quantile = config.get('quantile', 0.9)
+        self.defaults = dict(DEFAULT_DURATIONS, **config.get('default_durations', {}))
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._samples = self._load()
+
+    def _load(self) -> Dict[str, List[float]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"读取阶段耗时记录失败: {str(e)}")
+            return {}
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._samples, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def estimate(self, stage: str) -> float:
+        """阶段的预计耗时：最近若干次耗时的分位数，没有记录时使用默认值"""
+        with self._lock:
+            samples = sorted(self._samples.get(stage, []))
+        if not samples:
+            return self.defaults.get(stage, 0)
+        return samples[max(0, math.ceil(self.quantile * len(samples)) - 1)]
+
+    def total(self, stages=STAGES) -> float:
+        return sum(self.estimate(stage) for stage in stages)
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.setdefault(stage, [])
+            samples.append(round(seconds, 3))
+            del samples[:-self.history]
+            try:
+                self._save()
+            except Exception as e:
+                self.logger.error(f"保存阶段耗时记录失败: {str(e)}")
+
+
+class RunDeadline:
+    """一次运行的截止时间和各阶段的时间预算
+
+    阶段开始时，把距截止时间的剩余时间按该阶段及之后各阶段的预计耗时比例分配，
+    得到该阶段的截止时间。deadline为None时不限制时间，只记录各阶段耗时。
+    """
+
+    def __init__(self, deadline: Optional[float] = None, timings: Optional[StageTimings] = None,
+                 stages=STAGES):
+        self.deadline = deadline
+        self.timings = timings
+        self.stages = list(stages)
+        self.logger = logging.getLogger(__name__)
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def stage_deadline(self, stage: str) -> Optional[float]:
+        """阶段的截止时间（时间戳），不限制时间时返回None"""
+        if self.deadline is None:
+            return None
+        later = self.stages[self.stages.index(stage):] if stage in self.stages else [stage]
+        estimates = [self.timings.estimate(name) if self.timings else 1.0 for name in later]
+        total = sum(estimates)
+        share = estimates[0] / total if total else 1.0
+        return time.time() + max(0.0, self.remaining()) * share
+
+    @contextmanager
+    def stage(self, stage: str, nested: Optional[Dict[str, float]] = None):
+        """执行一个阶段，返回该阶段的截止时间，结束后记录耗时
+
+        nested由调用方在阶段内累计嵌套执行的其他阶段的耗时（阶段 -> 秒），如多profile模式下
+        与摘要交替进行的图片和发送；结束时从本阶段的耗时中扣除，并作为这些阶段的耗时分别记录。
+        """
+        stage_deadline = self.stage_deadline(stage)
+        if stage_deadline is not None:
+            self.logger.info(f"{stage} 阶段预算 {max(0.0, stage_deadline - time.time()):.0f} 秒")
+        started = time.time()
+        try:
+            yield stage_deadline
+        finally:
+            elapsed = time.time() - started
+            if self.timings:
+                for name, seconds in (nested or {}).items():
+                    self.timings.record(name, seconds)
+                self.timings.record(stage, max(0.0, elapsed - sum((nested or {}).values())))
+            if stage_deadline is not None and time.time() > stage_deadline:
+                self.logger.warning(f"{stage} 阶段耗时 {elapsed:.0f} 秒，超出预算")
+
+
+class DeadlineScheduler:
+    """按送达时间倒推开始时间
+
+    开始时间为送达时间减去各阶段的预计耗时和安全余量，预计耗时随历史记录变化，
+    因此每次检查时重新计算。时间均为本地时间，与schedule的定时任务一致。
+    """
+
+    def __init__(self, deliver_at: str, timings: StageTimings, config: Dict[str, Any] = None):
+        config = config or {}
+        hour, minute = deliver_at.split(':')
+        self.deliver_at = (int(hour), int(minute))
+        self.margin = config.get('margin', 300)
+        self.timings = timings
+        self.logger = logging.getLogger(__name__)
+        self._last_deadline = None
+
+    def deadline_for(self, now: datetime) -> datetime:
+        """now之后最近的一个送达时间"""
+        deadline = now.replace(hour=self.deliver_at[0], minute=self.deliver_at[1], second=0, microsecond=0)
+        return deadline if deadline > now else deadline + timedelta(days=1)
+
+    def start_at(self, deadline: datetime) -> datetime:
+        return deadline - timedelta(seconds=self.timings.total() + self.margin)
+
+    def due(self, now: datetime) -> Optional[datetime]:
+        """到了开始时间且该送达时间尚未处理时返回送达时间，否则返回None"""
+        deadline = self.deadline_for(now)
+        if deadline == self._last_deadline or now < self.start_at(deadline):
+            return None
+        self._last_deadline = deadline
+        self.logger.info(
+            f"按历史耗时预计需要 {self.timings.total():.0f} 秒，开始生成 {deadline.strftime('%H:%M')} 送达的日报"
+        )
+        return deadline
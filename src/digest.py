@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from .summarizer import FAILED_SUMMARY
+
+PERIOD_NAMES = {'week': '周报', 'month': '月报'}
+
+
+def period_range(period: str, end: date) -> Tuple[date, date]:
+    """汇总区间（含首尾两天）：周报为截至end的7天，月报为end所在月的1日到end"""
+    if period == 'week':
+        return end - timedelta(days=6), end
+    if period == 'month':
+        return end.replace(day=1), end
+    raise ValueError(f"不支持的汇总周期: {period}")
+
+
+def _hash(parts: List[Tuple[str, str]]) -> str:
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class DigestBuilder:
+    """基于存档的每日分类摘要逐级生成周报、月报
+
+    周报把一周内每天的分类摘要再总结一次；月报先按7天一段生成各段的汇总，
+    再总结这些汇总。每一级结果按输入摘要的哈希缓存在存档中，
+    重新生成时只有内容变化的日期所在的区间需要再次调用大模型。
+    """
+
+    def __init__(self, archive, summarizer):
+        self.archive = archive
+        self.summarizer = summarizer
+        self.logger = logging.getLogger(__name__)
+
+    def build(self, period: str, end: date, profile: str = '') -> Dict[str, str]:
+        """生成汇总摘要，返回分类到Markdown摘要的映射"""
+        start, end = period_range(period, end)
+        daily = self._daily_summaries(start, end, profile)
+        if not daily:
+            self.logger.warning(f"{start} 至 {end} 没有存档的每日摘要")
+            return {}
+
+        digests = {}
+        for category, days in daily.items():
+            if period == 'week':
+                summary = self._digest('week', start, end, profile, category, days)
+            else:
+                # 先按7天一段汇总，再汇总各段
+                weeks = []
+                segment_start = start
+                while segment_start <= end:
+                    segment_end = min(segment_start + timedelta(days=6), end)
+                    segment = [(day, text) for day, text in days
+                               if segment_start.isoformat() <= day <= segment_end.isoformat()]
+                    if segment:
+                        weekly = self._digest('week', segment_start, segment_end, profile, category, segment)
+                        if not weekly.endswith(FAILED_SUMMARY):
+                            weeks.append((f"{segment_start.isoformat()} 至 {segment_end.isoformat()}", weekly))
+                    segment_start = segment_end + timedelta(days=1)
+                summary = self._digest('month', start, end, profile, category, weeks) if weeks else None
+            if summary:
+                digests[category] = summary
+        return digests
+
+    def _daily_summaries(self, start: date, end: date, profile: str) -> Dict[str, List[Tuple[str, str]]]:
+        """读取区间内的每日分类摘要，同一天同一分类有多条时使用最后一次的结果"""
+        latest = {}
+        records = self.archive.summaries(start.isoformat(), (end + timedelta(days=1)).isoformat(), profile=profile)
+        for record in records:
+            latest[(record['category'], record['run_date'])] = record['summary']
+
+        daily = {}
+        for (category, run_date), summary in sorted(latest.items(), key=lambda entry: entry[0][1]):
+            daily.setdefault(category, []).append((run_date, summary))
+        return daily
+
+    def _digest(self, period: str, start: date, end: date, profile: str, category: str,
+                parts: List[Tuple[str, str]]) -> str:
+        """汇总一个区间内的摘要，输入未变化时直接使用缓存"""
+        if len(parts) == 1 and period == 'week' and start == end:
+            return parts[0][1]
+
+        input_hash = _hash(parts)
+        cached = self.archive.load_digest(period, start.isoformat(), end.isoformat(), profile, category, input_hash)
+        if cached is not None:
+            self.logger.info(f"{category} 类 {start} 至 {end} 的汇总摘要未变化，使用缓存")
+            return cached
+
+        label = f"{start.isoformat()} 至 {end.isoformat()}"
+        try:
+            summary = self.summarizer.summarize_digest(category, label, parts)
+        except Exception as e:
+            self.logger.error(f"生成 {category} 类 {label} 汇总摘要失败: {str(e)}")
+            return f"## {category}\n\n{FAILED_SUMMARY}"
+
+        self.archive.save_digest(period, start.isoformat(), end.isoformat(), profile, category, input_hash, summary)
+        return summary
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from .rss_parser import RSSParser
+from .content_processor import ContentProcessor
+from .item_store import encode_items, decode_items
+from .full_text import FullTextFetcher
+from .url_normalizer import UrlNormalizer
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(source: Dict[str, Any], shard_count: int) -> int:
+    """按源URL的哈希计算分片编号，同一个源总是落在同一个分片"""
+    digest = hashlib.md5(source['url'].encode('utf-8')).hexdigest()
+    return int(digest, 16) % shard_count
+
+
+def split_shards(sources: List[Dict[str, Any]], shard_count: int) -> List[List[Dict[str, Any]]]:
+    """将源列表切分为shard_count个分片，丢弃空分片"""
+    shards = [[] for _ in range(shard_count)]
+    for source in sources:
+        shards[shard_of(source, shard_count)].append(source)
+    return [shard for shard in shards if shard]
+
+
+def process_shard(sources: List[Dict[str, Any]], rules: Dict[str, Any],
+                  rss_parser: Optional[RSSParser] = None,
+                  content_processor: Optional[ContentProcessor] = None,
+                  since: Optional[datetime] = None,
+                  deadline: Optional[float] = None,
+                  full_text: Optional[FullTextFetcher] = None,
+                  worker_config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """抓取并处理一个分片内的所有源
+
+    在worker进程中调用时按协调者传来的worker_config新建解析器（含链接规范化）、处理器和全文抓取器。
+    给出deadline（时间戳）时，到时尚未开始抓取的源被跳过，已抓取的新闻照常返回。给出full_text时，
+    开启fetch_full_text的源在所有源解析完成后统一并发抓取全文，再做内容处理。
+    """
+    if rss_parser is None:
+        url_config = (worker_config or {}).get('url_normalization') or {}
+        rss_parser = RSSParser(url_normalizer=UrlNormalizer(url_config) if url_config.get('enabled', True) else None)
+    if full_text is None and worker_config is not None and any(source.get('fetch_full_text') for source in sources):
+        full_text = FullTextFetcher(worker_config.get('full_text'))
+    content_processor = content_processor or ContentProcessor()
+
+    parsed = []
+    for index, source in enumerate(sources):
+        if deadline is not None and time.time() >= deadline:
+            logger.warning(f"抓取阶段已到截止时间，跳过剩余的 {len(sources) - index} 个源")
+            break
+        try:
+            parsed.append((source, rss_parser.parse(source, since)))
+        except Exception as e:
+            logger.error(f"处理源 {source['name']} 时出错: {str(e)}")
+
+    if full_text and (deadline is None or time.time() < deadline):
+        try:
+            full_text.fill([item for source, news_items in parsed if source.get('fetch_full_text')
+                            for item in news_items])
+        except Exception as e:
+            logger.error(f"抓取全文时出错: {str(e)}")
+
+    all_news = []
+    for source, news_items in parsed:
+        try:
+            processed_items = content_processor.process(
+                news_items,
+                source['type'],
+                rules
+            )
+            all_news.extend(processed_items)
+        except Exception as e:
+            logger.error(f"处理源 {source['name']} 时出错: {str(e)}")
+    return all_news
+
+
+def _merge(sources: List[Dict[str, Any]], results: List[List[Dict[str, Any]]],
+           max_images: Optional[int] = None) -> List[Dict[str, Any]]:
+    """合并各分片的结果，并恢复sources.yaml中的源顺序
+
+    每个worker各自按triage.max_per_report限制下载的图片数，给出max_images时
+    按源顺序保留前max_images张图片（视频关键帧不计），使整份报告仍遵守该上限。
+    """
+    order = {source['url']: index for index, source in enumerate(sources)}
+    merged = [item for result in results for item in result]
+    merged.sort(key=lambda item: order.get(item.get('source_url'), len(order)))
+    if max_images is not None:
+        used = 0
+        for item in merged:
+            media = item.get('media') or {}
+            if not media.get('images'):
+                continue
+            frames = {frame for meta in media.get('video_meta') or [] for frame in meta.get('frames', [])}
+            kept = []
+            for path in media['images']:
+                if path in frames:
+                    kept.append(path)
+                elif used < max_images:
+                    kept.append(path)
+                    used += 1
+            media['images'] = kept
+    return merged
+
+
+class SQLiteWorkQueue:
+    """基于SQLite的分片任务队列
+
+    协调者写入分片任务，本机或其他节点上的worker领取任务并写回结果。
+    数据库文件放在共享存储上即可实现跨节点执行。
+    """
+
+    def __init__(self, path: str, lease_seconds: int = 600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT NOT NULL,
+                    shard INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    claimed_at REAL,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, run_id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None 后手动控制事务，便于用 BEGIN IMMEDIATE 加写锁
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, shards: List[List[Dict[str, Any]]], rules: Dict[str, Any],
+                since: Optional[datetime] = None, worker_config: Optional[Dict[str, Any]] = None,
+                deadline: Optional[float] = None) -> str:
+        """写入一次运行的全部分片任务，返回run_id；deadline（时间戳）随任务传给worker，到时跳过剩余的源"""
+        run_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO tasks (run_id, shard, payload) VALUES (?, ?, ?)",
+                [(run_id, index, encode_items({'sources': shard, 'rules': rules, 'since': since,
+                                            'worker_config': worker_config, 'deadline': deadline}))
+                 for index, shard in enumerate(shards)]
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        self.logger.info(f"已写入 {len(shards)} 个分片任务，run_id: {run_id}")
+        return run_id
+
+    def claim(self, run_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """领取一个待处理的任务，租约过期的任务会被重新领取"""
+        expired = time.time() - self.lease_seconds
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            query = ("SELECT id, run_id, payload FROM tasks WHERE "
+                     "(status = 'pending' OR (status = 'running' AND claimed_at < ?))")
+            params = [expired]
+            if run_id:
+                query += " AND run_id = ?"
+                params.append(run_id)
+            row = conn.execute(query + " ORDER BY id LIMIT 1", params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'running', worker = ?, claimed_at = ? WHERE id = ?",
+                (self.worker_id, time.time(), row[0])
+            )
+            conn.execute("COMMIT")
+            return {'id': row[0], 'run_id': row[1], **decode_items(row[2])}
+        finally:
+            conn.close()
+
+    def complete(self, task_id: int, items: List[Dict[str, Any]]) -> None:
+        """写回任务结果"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE tasks SET status = 'done', result = ? WHERE id = ?",
+                (encode_items(items), task_id)
+            )
+
+    def fail(self, task_id: int, error: str) -> None:
+        """标记任务失败"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', error = ? WHERE id = ?",
+                (error, task_id)
+            )
+
+    def run_task(self, task: Dict[str, Any]) -> None:
+        """执行一个已领取的任务"""
+        try:
+            self.logger.info(f"worker {self.worker_id} 开始处理任务 {task['id']}，共 {len(task['sources'])} 个源")
+            self.complete(task['id'], process_shard(task['sources'], task['rules'], since=task.get('since'),
+                                                    deadline=task.get('deadline'),
+                                                    worker_config=task.get('worker_config')))
+        except Exception as e:
+            self.logger.error(f"处理任务 {task['id']} 时出错: {str(e)}")
+            self.fail(task['id'], str(e))
+
+    def pending_count(self, run_id: str) -> int:
+        """统计尚未完成的任务数"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE run_id = ? AND status IN ('pending', 'running')",
+                (run_id,)
+            ).fetchone()[0]
+
+    def collect(self, run_id: str) -> List[List[Dict[str, Any]]]:
+        """读取一次运行的全部结果并清理任务记录"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT shard, status, result, error FROM tasks WHERE run_id = ? ORDER BY shard",
+                (run_id,)
+            ).fetchall()
+            conn.execute("DELETE FROM tasks WHERE run_id = ?", (run_id,))
+        finally:
+            conn.close()
+
+        results = []
+        for shard, status, result, error in rows:
+            if status == 'done':
+                results.append(decode_items(result))
+            else:
+                self.logger.error(f"分片 {shard} 处理失败: {error}")
+        return results
+
+    def serve(self, poll_interval: float = 5.0) -> None:
+        """以worker身份持续领取并处理任务"""
+        self.logger.info(f"worker {self.worker_id} 已启动，队列: {self.path}")
+        while True:
+            task = self.claim()
+            if task is None:
+                time.sleep(poll_interval)
+                continue
+            self.run_task(task)
+
+
+class ShardCoordinator:
+    """分片协调者
+
+    按源URL哈希将源切分到多个worker，worker负责抓取和内容处理，
+    协调者合并结果后交给摘要生成。支持两种后端：
+    - process: 本机多进程
+    - sqlite: 基于SQLite的任务队列，可跨节点
+    worker_config随任务传给worker，用于创建链接规范化和全文抓取组件。
+    """
+
+    def __init__(self, config: Dict[str, Any], worker_config: Optional[Dict[str, Any]] = None):
+        self.workers = int(config.get('workers', os.cpu_count() or 1))
+        self.backend = config.get('backend', 'process')
+        self.timeout = config.get('timeout', 1800)
+        self.queue_path = config.get('queue_path', os.path.join('data', 'queue.db'))
+        self.lease_seconds = config.get('lease_seconds', 600)
+        self.worker_config = worker_config or {}
+        self.logger = logging.getLogger(__name__)
+
+        if self.backend not in ('process', 'sqlite'):
+            raise ValueError(f"不支持的分布式后端: {self.backend}")
+
+    def collect(self, sources: List[Dict[str, Any]], rules: Dict[str, Any],
+                since: Optional[datetime] = None, deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """分片执行抓取和处理，返回合并后的新闻列表
+
+        给出deadline（时间戳）时，worker到时跳过剩余的源，协调者的等待时间也不超过deadline。
+        """
+        shards = split_shards(sources, self.workers)
+        self.logger.info(f"共 {len(sources)} 个源，切分为 {len(shards)} 个分片，后端: {self.backend}")
+
+        start_time = time.time()
+        timeout = self.timeout if deadline is None else max(0.0, min(self.timeout, deadline - start_time))
+        if self.backend == 'process':
+            results = self._collect_with_processes(shards, rules, since, timeout, deadline)
+        else:
+            results = self._collect_with_queue(shards, rules, since, timeout, deadline)
+
+        triage_config = (rules.get('image_processing') or {}).get('triage') or {}
+        merged = _merge(sources, results, triage_config.get('max_per_report', 30))
+        self.logger.info(f"分片执行完成，耗时 {time.time() - start_time:.1f} 秒，共 {len(merged)} 条新闻")
+        return merged
+
+    def _collect_with_processes(self, shards, rules, since, timeout, deadline=None):
+        """使用本机进程池执行各分片
+
+        所有分片共用一个timeout，到时未完成的分片放弃，卡住的worker进程被终止，不阻塞协调者。
+        """
+        results = []
+        executor = ProcessPoolExecutor(max_workers=min(self.workers, len(shards)) or 1)
+        futures = [executor.submit(process_shard, shard, rules, since=since, deadline=deadline,
+                                   worker_config=self.worker_config)
+                   for shard in shards]
+        _, not_done = wait(futures, timeout=timeout)
+        for index, future in enumerate(futures):
+            if future in not_done:
+                self.logger.error(f"分片 {index} 在 {timeout:.0f} 秒内未完成，已放弃")
+                continue
+            try:
+                results.append(future.result())
+            except Exception as e:
+                self.logger.error(f"分片 {index} 处理失败: {str(e)}")
+
+        if not_done:
+            for future in not_done:
+                future.cancel()
+            # Python 3.6的shutdown不支持cancel_futures，也不会停止运行中的任务，直接终止worker进程
+            for process in list((getattr(executor, '_processes', None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=not not_done)
+        return results
+
+    def _collect_with_queue(self, shards, rules, since, timeout, deadline=None):
+        """通过SQLite任务队列分发分片，协调者自身也参与处理"""
+        queue = SQLiteWorkQueue(self.queue_path, self.lease_seconds)
+        run_id = queue.enqueue(shards, rules, since, self.worker_config, deadline)
+
+        wait_until = time.time() + timeout
+        while time.time() < wait_until:
+            task = queue.claim(run_id)
+            if task is not None:
+                queue.run_task(task)
+                continue
+            if queue.pending_count(run_id) == 0:
+                break
+            # 剩余任务都在其他worker手上，等待其完成
+            time.sleep(max(0.0, min(1.0, wait_until - time.time())))
+        else:
+            self.logger.error(f"分片任务在 {timeout:.0f} 秒内未全部完成，使用已完成的结果")
+
+        return queue.collect(run_id)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+from xml.parsers import expat
+
+from feedparser.datetimes import _parse_date as feedparser_parse_date
+
+
+class _StopParsing(Exception):
+    """已经拿到足够的条目，提前结束解析"""
+
+
+class FeedStreamReader:
+    """流式读取RSS/Atom文档
+
+    边下载边用expat增量解析，在以下情况提前结束下载：
+    - 已读取的字节数超过max_bytes
+    - 已完整解析max_entries个条目
+    - 连续出现old_entry_tolerance个早于since的条目
+    - 超过deadline（time.time()时间戳），避免慢速响应拖住整次运行
+
+    提前结束时在最后一个完整条目处截断，并补齐未闭合的父元素，
+    返回的文档仍是合法的XML，可以直接交给feedparser。
+    """
+
+    ENTRY_TAGS = ('item', 'entry')
+    DATE_TAGS = ('pubDate', 'published', 'updated', 'date', 'issued', 'modified')
+    CHUNK_SIZE = 16384
+
+    def __init__(self, max_bytes: int, max_entries: Optional[int] = None,
+                 since: Optional[datetime] = None, old_entry_tolerance: int = 3,
+                 deadline: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.since = since
+        self.old_entry_tolerance = old_entry_tolerance
+        self.deadline = deadline
+        self.logger = logging.getLogger(__name__)
+
+        self._buffer = bytearray()
+        self._stack = []
+        self._entry_depth = None
+        self._date_text = None
+        self._entries = 0
+        self._old_streak = 0
+        # 最后一个完整条目结束的位置，以及此时尚未闭合的元素
+        self._cut = None
+        self._open_at_cut = []
+        self.timed_out = False
+
+    def read(self, response) -> bytes:
+        """读取响应内容，返回需要交给feedparser的文档"""
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = self._start
+        parser.EndElementHandler = lambda name: self._end(parser, name)
+        parser.CharacterDataHandler = self._data
+
+        parsing = True
+        truncated = False
+        try:
+            for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                if not chunk:
+                    continue
+                if not self._buffer:
+                    # expat不接受XML声明之前的空白
+                    chunk = chunk.lstrip()
+                self._buffer.extend(chunk)
+
+                if parsing:
+                    try:
+                        parser.Parse(bytes(chunk), False)
+                    except _StopParsing:
+                        truncated = True
+                        break
+                    except expat.ExpatError as e:
+                        # 非良构文档交给feedparser的宽松模式处理，只保留字节上限
+                        self.logger.debug(f"增量解析失败，改为整体解析: {str(e)}")
+                        parsing = False
+
+                if len(self._buffer) >= self.max_bytes:
+                    self.logger.warning(f"RSS文档超过 {self.max_bytes} 字节上限，停止下载")
+                    truncated = True
+                    break
+                if self.deadline is not None and time.time() >= self.deadline:
+                    self.logger.warning("RSS文档下载超时，停止下载")
+                    self.timed_out = True
+                    truncated = True
+                    break
+        finally:
+            response.close()
+
+        if truncated and self._cut is not None:
+            closing = ''.join(f'</{name}>' for name in reversed(self._open_at_cut))
+            return bytes(self._buffer[:self._cut]) + closing.encode('utf-8')
+        return bytes(self._buffer[:self.max_bytes])
+
+    @property
+    def entries(self) -> int:
+        """已完整解析的条目数"""
+        return self._entries
+
+    def _local_name(self, name: str) -> str:
+        return name.rsplit(':', 1)[-1]
+
+    def _start(self, name: str, attrs) -> None:
+        self._stack.append(name)
+        local = self._local_name(name)
+        if self._entry_depth is None and local in self.ENTRY_TAGS:
+            self._entry_depth = len(self._stack)
+            self._date_text = None
+        elif (self._entry_depth is not None and len(self._stack) == self._entry_depth + 1
+              and local in self.DATE_TAGS and self._date_text is None):
+            self._date_text = ''
+
+    def _data(self, text: str) -> None:
+        if (self._entry_depth is not None and len(self._stack) == self._entry_depth + 1
+                and self._local_name(self._stack[-1]) in self.DATE_TAGS and self._date_text is not None):
+            self._date_text += text
+
+    def _end(self, parser, name: str) -> None:
+        depth = len(self._stack)
+        self._stack.pop()
+        if self._entry_depth is None or depth != self._entry_depth:
+            return
+
+        # 条目结束：记录可截断的位置
+        self._entry_depth = None
+        self._entries += 1
+        self._cut = self._buffer.find(b'>', parser.CurrentByteIndex) + 1
+        self._open_at_cut = list(self._stack)
+
+        if self._is_old(self._date_text):
+            self._old_streak += 1
+        else:
+            self._old_streak = 0
+
+        if self.max_entries and self._entries >= self.max_entries:
+            raise _StopParsing()
+        if self.since is not None and self._old_streak >= self.old_entry_tolerance:
+            raise _StopParsing()
+
+    def _is_old(self, date_text: Optional[str]) -> bool:
+        if self.since is None or not date_text:
+            return False
+        parsed = feedparser_parse_date(date_text.strip())
+        return parsed is not None and datetime(*parsed[:6]) < self.since
+
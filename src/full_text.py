@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit
+
+import requests
+from bs4 import BeautifulSoup
+
+from .url_normalizer import canonicalize
+
+# lxml解析速度明显快于html.parser，未安装时退回标准库解析器
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# 与正文无关的标签直接删除
+_REMOVE_TAGS = ['script', 'style', 'noscript', 'iframe', 'form', 'nav', 'header', 'footer', 'aside',
+                'svg', 'button', 'select', 'input', 'textarea']
+_BLOCK_TAGS = ['p', 'div', 'table', 'ul', 'ol', 'pre', 'section', 'article', 'blockquote', 'h1', 'h2', 'h3']
+# class或id中出现这些词的元素通常不是正文
+_UNLIKELY = re.compile(r'comment|sidebar|footer|share|related|recommend|advert|\bads?\b|banner|menu|nav|'
+                       r'breadcrumb|copyright|social|popup|login|subscribe', re.I)
+_POSITIVE = re.compile(r'article|content|main|post|entry|text|body|detail|story', re.I)
+_PUNCTUATION = re.compile(r'[，。,；;！？]')
+
+
+def _class_weight(node) -> int:
+    names = ' '.join(node.get('class') or []) + ' ' + (node.get('id') or '')
+    weight = 0
+    if _UNLIKELY.search(names):
+        weight -= 25
+    if _POSITIVE.search(names):
+        weight += 25
+    return weight
+
+
+def _link_density(node, text_length: int) -> float:
+    if not text_length:
+        return 1.0
+    link_length = sum(len(link.get_text(strip=True)) for link in node.find_all('a'))
+    return min(1.0, link_length / text_length)
+
+
+def extract_main_text(html, from_encoding: Optional[str] = None, min_chars: int = 200) -> str:
+    """readability式正文抽取
+
+    删除脚本、导航等无关元素后，按段落的长度和标点数给其父元素和祖父元素打分，
+    再按链接密度和class/id修正，取得分最高的元素中的段落作为正文。正文不足min_chars字时返回空字符串。
+    """
+    soup = BeautifulSoup(html, HTML_PARSER, from_encoding=from_encoding)
+    for tag in soup.find_all(_REMOVE_TAGS):
+        tag.decompose()
+    unlikely = [tag for tag in soup.find_all(True)
+                if tag.name not in ('html', 'body', 'article') and _class_weight(tag) < 0]
+    for tag in unlikely:
+        if not tag.decomposed:
+            tag.decompose()
+
+    # 不含块级子元素的div按段落处理，很多中文网站的正文不用<p>
+    paragraphs = soup.find_all(['p', 'pre']) + [div for div in soup.find_all('div') if div.find(_BLOCK_TAGS) is None]
+    nodes = {}
+    scores = {}
+    for paragraph in paragraphs:
+        text = paragraph.get_text(' ', strip=True)
+        if len(text) < 25:
+            continue
+        score = 1 + len(_PUNCTUATION.findall(text)) + min(len(text) // 100, 3)
+        for node, share in ((paragraph.parent, 1.0), (paragraph.parent.parent if paragraph.parent else None, 0.5)):
+            if node is None or node.name in (None, '[document]'):
+                continue
+            if id(node) not in nodes:
+                nodes[id(node)] = node
+                scores[id(node)] = _class_weight(node)
+            scores[id(node)] += score * share
+
+    best = None
+    best_score = 0.0
+    for key, node in nodes.items():
+        text_length = len(node.get_text(strip=True))
+        score = scores[key] * (1 - _link_density(node, text_length))
+        if score > best_score:
+            best, best_score = node, score
+    if best is None:
+        best = soup.find('article') or soup.body
+    if best is None:
+        return ''
+
+    # 按文档顺序取段落，已取过的段落内部的元素不再重复
+    lines = []
+    taken = set()
+    for paragraph in best.find_all(['p', 'pre', 'h2', 'h3', 'li', 'div']) or [best]:
+        if paragraph.name == 'div' and paragraph.find(_BLOCK_TAGS) is not None:
+            continue
+        if any(id(parent) in taken for parent in paragraph.parents):
+            continue
+        taken.add(id(paragraph))
+        text = re.sub(r'\s+', ' ', paragraph.get_text(' ', strip=True))
+        if text and _link_density(paragraph, len(text)) < 0.5:
+            lines.append(text)
+    content = '\n'.join(lines)
+    if len(content) < min_chars:
+        content = re.sub(r'\n\s*\n+', '\n', best.get_text('\n', strip=True))
+    return content if len(content) >= min_chars else ''
+
+
+class HostLimiter:
+    """按域名限制并发数和相邻两次请求的间隔"""
+
+    def __init__(self, per_host: int = 2, interval: float = 1.0):
+        self.per_host = per_host
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    @contextmanager
+    def slot(self, host: str):
+        with self._lock:
+            state = self._hosts.setdefault(host, {'semaphore': threading.Semaphore(self.per_host), 'next': 0.0})
+        state['semaphore'].acquire()
+        try:
+            with self._lock:
+                now = time.time()
+                wait = max(0.0, state['next'] - now)
+                state['next'] = max(now, state['next']) + self.interval
+            if wait:
+                time.sleep(wait)
+            yield
+        finally:
+            state['semaphore'].release()
+
+
+class FullTextFetcher:
+    """只提供标题和摘要的源的全文抓取
+
+    并发下载新闻链接指向的网页，按域名限制并发数和请求间隔，抽取正文替换content。
+    抽取结果按规范化的链接保存在SQLite中，同一篇文章在多次运行之间只下载和抽取一次；
+    下载失败的链接在failure_ttl之后重试。
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.workers = config.get('workers', 8)
+        self.limiter = HostLimiter(config.get('per_host', 2), config.get('host_interval', 1.0))
+        self.timeout = config.get('timeout', 10)
+        self.max_bytes = config.get('max_bytes', 2 * 1024 * 1024)
+        self.min_chars = config.get('min_chars', 200)
+        # RSS中的内容已达到该长度时不再抓取全文
+        self.min_feed_chars = config.get('min_feed_chars', 400)
+        self.failure_ttl = config.get('failure_ttl', 6 * 3600)
+        self.retention_days = config.get('retention_days', 30)
+        self.user_agent = config.get('user_agent', 'Mozilla/5.0 (compatible; DiTing/1.0)')
+        self.cache_path = config.get('cache_path', os.path.join('data', 'full_text.db'))
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    url TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    ok INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.cache_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def fill(self, items: List[Dict[str, Any]]) -> int:
+        """为内容过短的新闻补充全文，原地修改content并设置full_text，返回补充的条数"""
+        targets = {}
+        for item in items:
+            if item and item.get('link') and len(item.get('content') or '') < self.min_feed_chars:
+                targets.setdefault(canonicalize(item['link']), []).append(item)
+        if not targets:
+            return 0
+
+        contents = self._cached(list(targets))
+        pending = [url for url in targets if url not in contents]
+        if pending:
+            started = time.time()
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(self._fetch, self._interleave(pending)))
+            rows = []
+            for url, content in zip(self._interleave(pending), results):
+                contents[url] = content or ''
+                rows.append((url, content or '', 0 if content is None else 1, time.time()))
+            with closing(self._connect()) as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO articles (url, content, ok, fetched_at) VALUES (?, ?, ?, ?)", rows
+                )
+            self.logger.info(f"下载全文 {len(pending)} 篇，耗时 {time.time() - started:.1f} 秒，"
+                             f"命中缓存 {len(targets) - len(pending)} 篇")
+
+        filled = 0
+        for url, url_items in targets.items():
+            content = contents.get(url)
+            for item in url_items:
+                if content and len(content) > len(item.get('content') or ''):
+                    item['content'] = content
+                    item['full_text'] = True
+                    filled += 1
+        return filled
+
+    def _cached(self, urls: List[str]) -> Dict[str, str]:
+        """读取缓存：抽取成功的结果一直有效，下载失败的记录在failure_ttl内有效"""
+        cached = {}
+        retry_before = time.time() - self.failure_ttl
+        with closing(self._connect()) as conn:
+            for start in range(0, len(urls), 500):
+                batch = urls[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f"SELECT url, content FROM articles WHERE (ok = 1 OR fetched_at > ?) AND url IN ({placeholders})",
+                    [retry_before] + batch
+                ).fetchall()
+                cached.update(dict(rows))
+        return cached
+
+    def _interleave(self, urls: List[str]) -> List[str]:
+        """按域名轮流排列，避免线程都在等待同一个域名"""
+        by_host = {}
+        for url in urls:
+            by_host.setdefault(urlsplit(url).hostname or '', []).append(url)
+        queues = list(by_host.values())
+        ordered = []
+        for index in range(max(len(queue) for queue in queues)):
+            ordered.extend(queue[index] for queue in queues if index < len(queue))
+        return ordered
+
+    def _fetch(self, url: str) -> Optional[str]:
+        """下载网页并抽取正文；下载失败返回None，没有可用正文返回空字符串"""
+        with self.limiter.slot(urlsplit(url).hostname or ''):
+            try:
+                response = requests.get(url, timeout=self.timeout, stream=True,
+                                        headers={'User-Agent': self.user_agent})
+                try:
+                    if response.status_code >= 400:
+                        self.logger.debug(f"下载全文 {url} 失败: HTTP {response.status_code}")
+                        return None
+                    content_type = response.headers.get('Content-Type', '')
+                    if content_type and 'html' not in content_type:
+                        return ''
+                    body = bytearray()
+                    for chunk in response.iter_content(chunk_size=65536):
+                        body.extend(chunk)
+                        if len(body) >= self.max_bytes:
+                            break
+                finally:
+                    response.close()
+            except requests.exceptions.RequestException as e:
+                self.logger.debug(f"下载全文 {url} 失败: {str(e)}")
+                return None
+
+        # 响应头未声明编码时由BeautifulSoup按网页中的meta判断
+        charset = re.search(r'charset=([\w-]+)', content_type or '')
+        try:
+            return extract_main_text(bytes(body), charset.group(1) if charset else None, self.min_chars)
+        except Exception as e:
+            self.logger.warning(f"抽取 {url} 正文失败: {str(e)}")
+            return ''
+
+    def purge(self) -> None:
+        """删除超过保留期的缓存"""
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM articles WHERE fetched_at < ?", (time.time() - self.retention_days * 86400,))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urldefrag
+
+import requests
+from PIL import ImageFile
+
+
+def parse_dimension(value: Any) -> Optional[int]:
+    """解析RSS或HTML中声明的宽高，"100%"、"auto"等无法使用的值返回None"""
+    try:
+        value = int(str(value).strip().lower().replace('px', ''))
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class ImageTriage:
+    """下载前的图片筛选
+
+    对一条新闻的全部候选图片统一处理：先去重，再用声明的宽高判断，
+    没有声明宽高的图片并发发送HEAD和Range请求，只读取文件头得到尺寸和大小，
+    过小（追踪像素、图标）或过大的图片不再下载，最后按单条新闻和单次报告的上限截取。
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.min_side = config.get('min_side', 100)
+        self.max_pixels = config.get('max_pixels', 40000000)
+        self.max_bytes = config.get('max_bytes', 10 * 1024 * 1024)
+        self.max_per_item = config.get('max_per_item', 3)
+        self.max_per_report = config.get('max_per_report', 30)
+        self.probe_bytes = config.get('probe_bytes', 64 * 1024)
+        self.probe_timeout = config.get('probe_timeout', 10)
+        self.probe_workers = config.get('probe_workers', 8)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._used = 0
+
+    def reset(self) -> None:
+        """开始新的一次报告，重置报告级的图片计数"""
+        with self._lock:
+            self._used = 0
+
+    def select(self, urls: List[str], declared: Dict[str, Any] = None) -> List[str]:
+        """返回值得下载的图片URL
+
+        Args:
+            urls: 候选图片URL
+            declared: URL到声明宽高(width, height)的映射
+        """
+        declared = {urldefrag(url.strip())[0]: size for url, size in (declared or {}).items()}
+        candidates = self.dedupe(urls)
+
+        # 先用声明的宽高筛掉明显不合适的图片，无法判断的再探测
+        unknown = []
+        accepted = []
+        for url in candidates:
+            verdict = self._check(declared.get(url))
+            if verdict is None:
+                unknown.append(url)
+            elif verdict:
+                accepted.append(url)
+
+        if unknown:
+            with ThreadPoolExecutor(max_workers=min(self.probe_workers, len(unknown))) as executor:
+                probed = dict(zip(unknown, executor.map(self.probe, unknown)))
+            accepted = [url for url in candidates
+                        if url in accepted or (url in probed and self._check_probe(probed[url]))]
+
+        selected = accepted[:self.max_per_item]
+        with self._lock:
+            allowed = max(self.max_per_report - self._used, 0)
+            selected = selected[:allowed]
+            self._used += len(selected)
+
+        if len(selected) < len(urls):
+            self.logger.info(f"图片筛选: {len(urls)} 张候选 -> {len(selected)} 张，去重后 {len(candidates)} 张")
+        return selected
+
+    def dedupe(self, urls: List[str]) -> List[str]:
+        """按URL去重，忽略首尾空白和片段标识，保持原有顺序"""
+        seen = set()
+        result = []
+        for url in urls:
+            if not url:
+                continue
+            key = urldefrag(url.strip())[0]
+            if not key.startswith(('http://', 'https://')) or key in seen:
+                continue
+            seen.add(key)
+            result.append(key)
+        return result
+
+    def probe(self, url: str) -> Optional[Tuple[Optional[Tuple[int, int]], Optional[int]]]:
+        """探测图片尺寸和文件大小，返回((宽, 高)或None, 字节数或None)，无法访问时返回None"""
+        length = None
+        try:
+            response = requests.head(url, timeout=self.probe_timeout, allow_redirects=True)
+            if response.status_code < 400:
+                length = parse_dimension(response.headers.get('Content-Length'))
+                if length and self.max_bytes and length > self.max_bytes:
+                    return None, length
+        except requests.exceptions.RequestException as e:
+            self.logger.debug(f"HEAD请求失败 {url}: {str(e)}")
+
+        try:
+            response = requests.get(
+                url,
+                headers={'Range': f"bytes=0-{self.probe_bytes - 1}"},
+                timeout=self.probe_timeout,
+                stream=True
+            )
+            with response:
+                if response.status_code >= 400:
+                    return None
+                if length is None and response.status_code == 206:
+                    content_range = response.headers.get('Content-Range', '')
+                    length = parse_dimension(content_range.rpartition('/')[2])
+                # 服务器不支持Range时同样只读取前probe_bytes字节
+                parser = ImageFile.Parser()
+                received = 0
+                for chunk in response.iter_content(chunk_size=8192):
+                    parser.feed(chunk)
+                    received += len(chunk)
+                    if parser.image is not None or received >= self.probe_bytes:
+                        break
+                size = parser.image.size if parser.image is not None else None
+                return size, length
+        except requests.exceptions.RequestException as e:
+            self.logger.debug(f"探测图片失败 {url}: {str(e)}")
+            return None
+        except Exception as e:
+            # 文件头无法识别，尺寸未知
+            self.logger.debug(f"解析图片头失败 {url}: {str(e)}")
+            return None, length
+
+    def _check(self, size: Any) -> Optional[bool]:
+        """根据宽高判断是否保留，宽高未知时返回None"""
+        if not size:
+            return None
+        width, height = (parse_dimension(value) for value in size)
+        if not width or not height:
+            return None
+        if min(width, height) < self.min_side:
+            return False
+        return not (self.max_pixels and width * height > self.max_pixels)
+
+    def _check_probe(self, probed: Optional[Tuple[Optional[Tuple[int, int]], Optional[int]]]) -> bool:
+        if probed is None:
+            return False
+        size, length = probed
+        if length and self.max_bytes and length > self.max_bytes:
+            return False
+        # 探测不到尺寸的图片交给下载阶段处理
+        return self._check(size) is not False
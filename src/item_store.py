@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+
+def encode_items(items: List[Dict[str, Any]]) -> str:
+    """将新闻列表序列化为JSON，datetime字段转为ISO格式"""
+    def default(value):
+        if isinstance(value, datetime):
+            return {'__datetime__': value.isoformat()}
+        raise TypeError(f"无法序列化类型: {type(value)}")
+    return json.dumps(items, ensure_ascii=False, default=default)
+
+
+def decode_items(payload: str) -> Any:
+    """反序列化encode_items生成的JSON"""
+    def object_hook(value):
+        if '__datetime__' in value:
+            text = value['__datetime__']
+            fmt = '%Y-%m-%dT%H:%M:%S.%f' if '.' in text else '%Y-%m-%dT%H:%M:%S'
+            return datetime.strptime(text, fmt)
+        return value
+    return json.loads(payload, object_hook=object_hook)
+
+
+def item_key(item: Dict[str, Any]) -> str:
+    """新闻的唯一键，优先使用链接，无链接时使用源和标题"""
+    raw = item.get('link') or f"{item.get('source_url', '')}|{item.get('title', '')}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ItemStore:
+    """已抓取新闻的本地存储
+
+    服务模式下后台轮询把处理好的新闻写入这里，
+    生成日报时只读取尚未推送的新闻，不再集中抓取。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS items (
+                    key TEXT PRIMARY KEY,
+                    source_url TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    ingested_at REAL NOT NULL,
+                    reported INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_items_reported ON items (reported, ingested_at);
+                CREATE TABLE IF NOT EXISTS source_state (
+                    url TEXT PRIMARY KEY,
+                    state TEXT NOT NULL
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def add_items(self, items: List[Dict[str, Any]]) -> int:
+        """写入新闻，已存在的新闻会被忽略，返回新增条数"""
+        if not items:
+            return 0
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO items (key, source_url, payload, ingested_at) VALUES (?, ?, ?, ?)",
+                [(item_key(item), item.get('source_url', ''), encode_items(item), now) for item in items]
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        return added
+
+    def has_items(self, items: List[Dict[str, Any]]) -> List[bool]:
+        """检查新闻是否已经入库"""
+        keys = [item_key(item) for item in items]
+        with closing(self._connect()) as conn:
+            existing = set()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key FROM items WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                existing.update(row[0] for row in rows)
+        return [key in existing for key in keys]
+
+    def pending_items(self, source_urls: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """读取尚未推送的新闻，按入库顺序返回"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT source_url, payload FROM items WHERE reported = 0 ORDER BY ingested_at, rowid"
+            ).fetchall()
+        wanted = set(source_urls) if source_urls is not None else None
+        return [decode_items(payload) for source_url, payload in rows
+                if wanted is None or source_url in wanted]
+
+    def mark_reported(self, items: List[Dict[str, Any]]) -> None:
+        """将新闻标记为已推送"""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE items SET reported = 1 WHERE key = ?",
+                [(item_key(item),) for item in items]
+            )
+            conn.execute("COMMIT")
+
+    def purge(self, retention_days: int) -> None:
+        """删除超过保留期的已推送新闻"""
+        cutoff = time.time() - retention_days * 86400
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM items WHERE reported = 1 AND ingested_at < ?", (cutoff,))
+
+    def load_source_state(self, url: str) -> Dict[str, Any]:
+        """读取源的轮询状态"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT state FROM source_state WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_source_state(self, url: str, state: Dict[str, Any]) -> None:
+        """保存源的轮询状态"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO source_state (url, state) VALUES (?, ?)",
+                (url, json.dumps(state))
+            )
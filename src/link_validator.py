@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from .ranker import tokenize
+
+_MARKDOWN_LINK = re.compile(r'\[([^\[\]]*)\]\(([^()\s]*(?:\([^()\s]*\)[^()\s]*)*)\)')
+# 引用编号还原后仍残留的编号，说明模型编造了不存在的编号
+_LEFTOVER_REF = re.compile(r'\s*[\[【]R\d+[\]】](?:\(R\d+\))?')
+
+
+def _loose_url(url: str) -> str:
+    """宽松比较用的URL：忽略协议、www、末尾斜杠、片段和百分号编码"""
+    url = unquote((url or '').strip().rstrip('.,;，。；、）)'))
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    path = parts.path.rstrip('/')
+    return f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+
+
+def items_from_markdown(texts: List[str]) -> List[Dict[str, Any]]:
+    """从已校验过的摘要中取出链接，每个链接以所在行的文字作为标题，用于校验汇总摘要"""
+    items = {}
+    for text in texts:
+        for line in (text or '').split('\n'):
+            title = re.sub(r'^[\s\-*#>\d.]+', '', _MARKDOWN_LINK.sub(r'\1', line)).strip()
+            for match in _MARKDOWN_LINK.finditer(line):
+                items.setdefault(match.group(2), {'title': title, 'link': match.group(2)})
+    return list(items.values())
+
+
+class LinkValidator:
+    """摘要链接的本地校验
+
+    解析模型输出的Markdown，把每个链接对应回输入的新闻：完全一致的保留；
+    忽略协议、末尾斜杠等差异后一致的改为原始链接；否则按所在列表项的文字与新闻标题的重合度
+    找回对应的新闻，找不到时去掉该链接。没有出现在摘要中的新闻记录在报告中。
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.title_threshold = config.get('title_threshold', 0.6)
+        self.logger = logging.getLogger(__name__)
+
+    def validate(self, category: str, summary: str, items: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """校验并修复摘要中的链接
+
+        Returns:
+            (修复后的摘要, 报告)，报告包含kept、repaired、dropped三类链接数和missing（未出现的新闻标题）
+        """
+        items = [item for item in items if item and item.get('link')]
+        exact = {item['link']: item for item in items}
+        loose = {}
+        for item in items:
+            loose.setdefault(_loose_url(item['link']), item)
+
+        report = {'kept': 0, 'repaired': 0, 'dropped': 0, 'missing': []}
+        linked = set()
+        lines = []
+        for line in summary.split('\n'):
+            line = _LEFTOVER_REF.sub('', line)
+            lines.append(_MARKDOWN_LINK.sub(lambda match: self._check(match, line, exact, loose, items,
+                                                                          linked, report), line))
+
+        report['missing'] = [item.get('title', '') for item in items if item['link'] not in linked]
+        if report['repaired'] or report['dropped']:
+            self.logger.warning(
+                f"{category} 类摘要链接校验：修复 {report['repaired']} 个，去掉 {report['dropped']} 个无法对应的链接"
+            )
+        if report['missing']:
+            self.logger.info(f"{category} 类摘要未提及 {len(report['missing'])} 条新闻: {'；'.join(report['missing'][:5])}")
+        return '\n'.join(lines), report
+
+    def _check(self, match, line: str, exact: Dict[str, Any], loose: Dict[str, Any],
+               items: List[Dict[str, Any]], linked: set, report: Dict[str, Any]) -> str:
+        text, url = match.group(1), match.group(2)
+        if url in exact:
+            report['kept'] += 1
+            linked.add(url)
+            return match.group(0)
+
+        item = loose.get(_loose_url(url)) or self._match_title(line, items, linked)
+        if item is not None:
+            report['repaired'] += 1
+            linked.add(item['link'])
+            self.logger.debug(f"链接 {url} 修复为 {item['link']}")
+            return f"[{text}]({item['link']})"
+
+        report['dropped'] += 1
+        self.logger.debug(f"去掉无法对应的链接: {url}")
+        # 通用的“链接”字样直接去掉，其他链接文字保留为纯文本
+        return '' if text in ('链接', '原文', '原始链接') else text
+
+    def _match_title(self, line: str, items: List[Dict[str, Any]], linked: set) -> Optional[Dict[str, Any]]:
+        """按新闻标题的词在该行中出现的比例找回新闻，优先尚未被链接的新闻"""
+        line_tokens = set(tokenize(_MARKDOWN_LINK.sub(r'\1', line)))
+        best = None
+        best_score = self.title_threshold
+        for item in items:
+            title_tokens = set(tokenize(item.get('title', '')))
+            if not title_tokens:
+                continue
+            score = len(title_tokens & line_tokens) / len(title_tokens)
+            if item['link'] in linked:
+                score -= 0.01
+            if score >= best_score:
+                best, best_score = item, score
+        return best
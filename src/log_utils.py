@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import atexit
+import gzip
+import hashlib
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import zlib
+from datetime import date
+from typing import Dict, Any, Optional
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 由setup_logging配置，未配置时不保存大段内容，只记录长度
+_dumper = None
+
+
+def setup_logging(config: Dict[str, Any]) -> logging.handlers.QueueListener:
+    """配置异步日志
+
+    业务线程只把日志记录放入队列，由后台的QueueListener线程写入按大小轮转的日志文件和控制台，
+    文件I/O不再阻塞抓取和摘要生成。队列使用multiprocessing.Queue，分片执行时fork出的worker进程
+    继承根日志器的QueueHandler，日志同样经队列交给主进程的监听线程写入。
+    """
+    global _dumper
+
+    os.makedirs(os.path.dirname(config['file']) or '.', exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        config['file'],
+        maxBytes=config.get('max_bytes', 10 * 1024 * 1024),
+        backupCount=config.get('backup_count', 5),
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = multiprocessing.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, config['level']))
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener.start()
+    atexit.register(_stop_listener, listener)
+
+    dumps_config = config.get('dumps', {})
+    artifact_dir = dumps_config.get('artifact_dir', os.path.join(os.path.dirname(config['file']), 'artifacts'))
+    _dumper = PayloadDumper(ArtifactStore(artifact_dir), dumps_config)
+    return listener
+
+
+def _stop_listener(listener: logging.handlers.QueueListener) -> None:
+    """退出前把队列中剩余的日志写完，已停止的监听器不再重复停止"""
+    if getattr(listener, '_thread', None) is not None:
+        listener.stop()
+
+
+class ArtifactStore:
+    """按内容哈希保存的压缩存档
+
+    相同内容只保存一份，文件按哈希前两位分目录，日志中只记录引用。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.txt.gz")
+
+    def put(self, content: str) -> str:
+        """保存内容，返回引用（内容哈希）"""
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return digest
+
+    def get(self, ref: str) -> str:
+        """按引用读取内容"""
+        with gzip.open(self._path(ref), 'rb') as f:
+            return f.read().decode('utf-8')
+
+
+class PayloadDumper:
+    """提示词、模型响应等大段内容的采样记录
+
+    按sample_rate采样，同一天内同一个key（如分类）的提示词和响应同时被采中或跳过；
+    采中的内容不超过inline_limit时直接写入日志，否则保存到ArtifactStore，日志只记录引用。
+    """
+
+    def __init__(self, store: Optional[ArtifactStore], config: Dict[str, Any] = None):
+        config = config or {}
+        self.store = store
+        self.sample_rate = config.get('sample_rate', 0.1)
+        self.inline_limit = config.get('inline_limit', 500)
+
+    def sampled(self, key: str) -> bool:
+        if self.sample_rate >= 1:
+            return True
+        # 采样结果按天变化，长期运行时每个分类都有机会被采中
+        seed = f"{date.today().isoformat()}|{key}"
+        return zlib.crc32(seed.encode('utf-8')) % 10000 < self.sample_rate * 10000
+
+    def dump(self, logger: logging.Logger, label: str, payload: str, key: Optional[str] = None) -> Optional[str]:
+        """记录一段内容，返回artifact引用；未采中或直接写入日志时返回None"""
+        payload = payload or ''
+        if self.store is None or not self.sampled(key if key is not None else payload):
+            logger.debug(f"{label}: {len(payload)} 字符（未采样）")
+            return None
+        if len(payload) <= self.inline_limit:
+            logger.info(f"{label}: {payload}")
+            return None
+        ref = self.store.put(payload)
+        logger.info(f"{label}: {len(payload)} 字符，已保存为artifact {ref}")
+        return ref
+
+
+def dump_payload(logger: logging.Logger, label: str, payload: str, key: Optional[str] = None) -> Optional[str]:
+    """使用setup_logging配置的采样规则记录大段内容"""
+    dumper = _dumper or PayloadDumper(None)
+    return dumper.dump(logger, label, payload, key)
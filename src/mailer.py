@@ -6,7 +6,7 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
-from typing import Dict, List
+from typing import Dict, List, Any
 import os
 import re
 from datetime import datetime
@@ -16,23 +16,31 @@ class Mailer:
         self.config = config
         self.logger = logging.getLogger(__name__)
         
-    def send_daily_report(self, content: str, date: str) -> bool:
-        """发送每日报告"""
+    def send_daily_report(self, content: str, date: str, images: List[Dict[str, Any]] = None,
+                          title: str = '谛听日报') -> bool:
+        """发送每日报告
+        
+        Args:
+            content: 报告HTML
+            date: 报告日期，周报、月报为日期区间
+            images: 正文以cid:引用的图片；不传时附加media/images目录下的全部图片
+            title: 正文标题，如"谛听周报"
+        """
         try:
             self.logger.info("开始准备发送每日报告")
             
-            # 创建邮件
-            msg = MIMEMultipart('alternative')
+            # 创建邮件，正文引用内嵌图片时使用multipart/related
+            msg = MIMEMultipart('related' if images is not None else 'alternative')
             msg['Subject'] = self.config['subject_template'].format(date=date)
             msg['From'] = self.config['username']
             msg['To'] = ', '.join(self.config['recipients'])
             
             # 添加HTML内容
-            html_content = self._format_html_content(content)
+            html_content = self._format_html_content(content, date, title)
             msg.attach(MIMEText(html_content, 'html'))
             
             # 添加图片附件
-            self._attach_images(msg)
+            self._attach_images(msg, images)
             
             # 连接SMTP服务器并发送
             smtp_server = self.config['smtp_server']
@@ -78,13 +86,13 @@ class Mailer:
             self.logger.error(f"准备邮件时发生错误: {str(e)}")
             return False
             
-    def _format_html_content(self, content: str) -> str:
+    def _format_html_content(self, content: str, date: str = None, title: str = '谛听日报') -> str:
         """格式化HTML内容"""
         try:
             self.logger.info("开始格式化邮件HTML内容")
             
             # 准备替换内容
-            date = datetime.now().strftime('%Y-%m-%d')
+            date = date or datetime.now().strftime('%Y-%m-%d')
             footer_text = "本邮件由谛听自动生成发送。如需退订，请回复\"退订\"。"
             
             # 读取模板文件
@@ -102,6 +110,7 @@ class Mailer:
             # 使用字符串替换而不是格式化
             formatted_content = (
                 template
+                .replace('{title}', title)
                 .replace('{date}', date)
                 .replace('{content}', content)
                 .replace('{footer_text}', footer_text)
@@ -122,7 +131,7 @@ class Mailer:
     </style>
 </head>
 <body>
-    <h1>谛听日报 - {date}</h1>
+    <h1>{title} - {date}</h1>
     <div>{content}</div>
     <footer><p>{footer_text}</p></footer>
 </body>
@@ -181,7 +190,7 @@ class Mailer:
     </style>
 </head>
 <body>
-    <h1>谛听日报 - {date}</h1>
+    <h1>{title} - {date}</h1>
     <div class="content">
         {content}
     </div>
@@ -191,8 +200,23 @@ class Mailer:
 </body>
 </html>"""
             
-    def _attach_images(self, msg: MIMEMultipart) -> None:
-        """添加图片附件"""
+    def _attach_images(self, msg: MIMEMultipart, images: List[Dict[str, Any]] = None) -> None:
+        """添加图片附件
+        
+        Args:
+            msg: 邮件
+            images: 包含cid、data、subtype、filename的图片列表；不传时附加media/images目录下的全部图片
+        """
+        if images is not None:
+            for image in images:
+                img = MIMEImage(image['data'], _subtype=image['subtype'])
+                img.add_header('Content-ID', f"<{image['cid']}>")
+                img.add_header('Content-Disposition', 'inline', filename=image['filename'])
+                msg.attach(img)
+            if images:
+                self.logger.info(f"添加内嵌图片 {len(images)} 张，共 {sum(len(image['data']) for image in images)} 字节")
+            return
+            
         image_dir = 'media/images'
         if not os.path.exists(image_dir):
             return
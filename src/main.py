@@ -5,32 +5,123 @@ import os
 import logging
 import schedule
 import time
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import yaml
 from dotenv import load_dotenv
 import argparse
+import json
 import sys
 
-from .rss_parser import RSSParser
+from .rss_parser import RSSParser, time_window_cutoff
 from .content_processor import ContentProcessor
 from .summarizer import Summarizer
 from .mailer import Mailer
+from .profiles import load_profiles, merge_sources
+from .distributed import ShardCoordinator, SQLiteWorkQueue, process_shard
+from .item_store import ItemStore
+from .poller import SourcePoller
+from .report_images import ReportImageRenderer
+from .archive import Archive
+from .digest import DigestBuilder, PERIOD_NAMES, period_range
+from .log_utils import setup_logging
+from .source_health import SourceHealth
+from .url_normalizer import UrlNormalizer
+from .cassette import Cassette
+from .deadline import StageTimings, RunDeadline, DeadlineScheduler
+from .full_text import FullTextFetcher
 
 # 加载环境变量
 load_dotenv()
 
 class DiTing:
-    def __init__(self):
+    def __init__(self, cassette=None):
         self.config = self._load_config()
         self._setup_logging()
         
+        # 录制或回放外部I/O时固定运行时间、隔离本地缓存，回放时不写入任何运行状态
+        self.cassette = cassette
+        self.persist_state = not (cassette and cassette.mode == 'replay')
+        if cassette:
+            self._isolate_state(cassette)
+        
+        # 源健康记录：按源自适应超时，连续失败的源熔断跳过
+        health_config = self.config.get('source_health', {})
+        self.source_health = SourceHealth(
+            health_config.get('path', os.path.join('data', 'source_health.json')),
+            health_config
+        ) if health_config.get('enabled', True) else None
+        
+        # 链接规范化：解析包装链接、去掉跟踪参数，跳转结果缓存在本地
+        url_config = self.config.get('url_normalization', {})
+        url_normalizer = UrlNormalizer(url_config) if url_config.get('enabled', True) else None
+        if url_normalizer:
+            url_normalizer.purge()
+        
         # 初始化组件
-        self.rss_parser = RSSParser()
+        self.rss_parser = RSSParser(self.source_health, url_normalizer)
         self.content_processor = ContentProcessor()
-        self.summarizer = Summarizer(self.config['dashscope']['api_key'])
+        self.summarizer = Summarizer(self.config['dashscope']['api_key'], self.config.get('summarizer'))
         self.mailer = Mailer(self.config['email'])
+        # 报告中的图片以cid:内嵌在对应新闻下
+        self.image_renderer = ReportImageRenderer(self.config.get('report_images'))
+        
+        # 配置了distributed时按分片在多个worker上执行抓取和处理
+        distributed_config = self.config.get('distributed')
+        self.coordinator = ShardCoordinator(distributed_config, {
+            key: self.config.get(key) or {} for key in ('url_normalization', 'full_text')
+        }) if distributed_config else None
+        
+        # 存档每次运行处理后的新闻和分类摘要，供检索和周报使用
+        archive_config = self.config.get('archive', {})
+        self.archive = Archive(archive_config.get('path', os.path.join('data', 'archive.db'))) \
+            if archive_config.get('enabled') else None
+        
+        # 服务模式下启用后台轮询时，日报只读取已入库的新闻
+        self.item_store = None
+        self.poller = None
+        
+        # 全文抓取器，有源开启fetch_full_text时才创建
+        self.full_text = None
+        
+        # 截止时间模式：按送达时间和各阶段的历史耗时倒推开始时间，到时发送已完成的内容
+        deadline_config = self.config.get('deadline', {})
+        self.stage_timings = None
+        self.deadline_scheduler = None
+        if deadline_config.get('enabled'):
+            self.stage_timings = StageTimings(
+                deadline_config.get('path', os.path.join('data', 'stage_timings.json')),
+                deadline_config
+            )
+            self.deadline_scheduler = DeadlineScheduler(
+                deadline_config.get('deliver_at', self.config.get('schedule', {}).get('daily_report', '08:00')),
+                self.stage_timings,
+                deadline_config
+            )
         
         self.logger = logging.getLogger(__name__)
+        if self.coordinator and self.source_health:
+            # 健康记录文件由各进程整体覆盖写入，worker之间会互相覆盖，分片执行时不使用
+            self.logger.warning("分片执行时不使用源健康记录，各源使用固定超时且不熔断")
+        
+    def _isolate_state(self, cassette):
+        """录制和回放时关闭源健康记录，跳转和全文缓存改用临时目录，保证两次运行发出相同的请求；
+        回放时用量台账和批处理记录也放在临时目录，并关闭存档和截止时间"""
+        state_dir = cassette.state_dir
+        self.config['source_health'] = dict(self.config.get('source_health') or {}, enabled=False)
+        for key, name in (('url_normalization', 'redirects.db'), ('full_text', 'full_text.db')):
+            self.config[key] = dict(self.config.get(key) or {}, cache_path=os.path.join(state_dir, name))
+        # 分片worker在其他进程中发出请求，无法录制和回放
+        self.config.pop('distributed', None)
+        if cassette.mode != 'replay':
+            return
+        summarizer_config = dict(self.config.get('summarizer') or {})
+        if summarizer_config.get('usage'):
+            summarizer_config['usage'] = dict(summarizer_config['usage'], path=os.path.join(state_dir, 'usage.db'))
+        if summarizer_config.get('batch'):
+            summarizer_config['batch'] = dict(summarizer_config['batch'], dir=os.path.join(state_dir, 'batches'))
+        self.config['summarizer'] = summarizer_config
+        self.config.pop('archive', None)
+        self.config.pop('deadline', None)
         
     def _load_config(self):
         """加载配置文件"""
@@ -39,49 +130,118 @@ class DiTing:
             return yaml.safe_load(f)
             
     def _setup_logging(self):
-        """设置日志"""
-        log_config = self.config['logging']
-        os.makedirs(os.path.dirname(log_config['file']), exist_ok=True)
-        
-        logging.basicConfig(
-            level=getattr(logging, log_config['level']),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_config['file'], encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """设置日志：异步写入按大小轮转的日志文件，大段内容采样后保存为artifact"""
+        self.log_listener = setup_logging(self.config['logging'])
+        
+    def _load_sources(self):
+        """加载RSS源配置"""
+        sources_path = os.path.join('config', 'sources.yaml')
+        with open(sources_path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f)
+            
+    def _load_last_run(self):
+        """读取上次成功运行的时间（UTC）"""
+        state_path = os.path.join('data', 'state.json')
+        if not os.path.exists(state_path):
+            return None
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return datetime.strptime(json.load(f)['last_run'], '%Y-%m-%dT%H:%M:%S')
+        except Exception as e:
+            self.logger.warning(f"读取运行状态失败: {str(e)}")
+            return None
+            
+    def _save_last_run(self, run_time):
+        """记录本次成功运行的时间（UTC）"""
+        state_path = os.path.join('data', 'state.json')
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump({'last_run': run_time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+            
+    def _collect_news(self, sources, rules, since=None, deadline=None):
+        """抓取并处理给定的RSS源，返回处理后的新闻列表；deadline（时间戳）到时跳过剩余的源"""
+        if self.poller:
+            return self.item_store.pending_items([source['url'] for source in sources])
+        if self.coordinator:
+            return self.coordinator.collect(sources, rules, since, deadline)
+        if self.source_health:
+            self.source_health.start_run()
+        news = process_shard(sources, rules, self.rss_parser, self.content_processor, since, deadline,
+                             self._full_text_fetcher(sources))
+        if self.source_health:
+            self.source_health.log_run_summary()
+        return news
+        
+    def _full_text_fetcher(self, sources):
+        """有源开启fetch_full_text时返回全文抓取器"""
+        if self.full_text is None and any(source.get('fetch_full_text') for source in sources):
+            self.full_text = FullTextFetcher(self.config.get('full_text'))
+            self.full_text.purge()
+        return self.full_text
         
-    def process_daily_news(self):
-        """处理每日新闻"""
+    def process_daily_news(self, deadline=None):
+        """处理每日新闻
+        
+        Args:
+            deadline: 送达时间（本地时间），给出时各阶段按历史耗时分配时间预算，
+                到时未完成的分类改用抽取式摘要
+        """
         try:
             self.logger.info("开始处理每日新闻")
+            run = RunDeadline(time.mktime(deadline.timetuple()) if deadline else None, self.stage_timings)
+            if deadline:
+                self.logger.info(f"本次日报需在 {deadline.strftime('%Y-%m-%d %H:%M')} 前送达")
             
             # 获取RSS源配置
-            sources_path = os.path.join('config', 'sources.yaml')
-            with open(sources_path, 'r', encoding='utf-8') as f:
-                sources_config = yaml.safe_load(f)
-            
-            # 获取所有新闻
-            all_news = []
-            for source in sources_config['sources']:
-                try:
-                    news_items = self.rss_parser.parse(source)
-                    processed_items = self.content_processor.process(
-                        news_items,
-                        source['type'],
-                        sources_config['rules']
-                    )
-                    all_news.extend(processed_items)
-                except Exception as e:
-                    self.logger.error(f"处理源 {source['name']} 时出错: {str(e)}")
-            
-            # 生成摘要
-            summary = self.summarizer.generate_summary(all_news)
-            
-            # 发送邮件
-            date_str = datetime.now().strftime('%Y-%m-%d')
-            self.mailer.send_daily_report(summary, date_str)
+            sources_config = self._load_sources()
+            
+            # 每次运行使用新的摘要缓存、token用量统计、图片数量上限和图片编码缓存
+            self.summarizer.start_run()
+            self.content_processor.start_report()
+            self.image_renderer.start_report()
+            
+            # 时间窗口：只保留上次运行之后或最近N小时内的条目
+            run_time = datetime.utcnow()
+            last_run = self._load_last_run()
+            if self.cassette:
+                run_time = self.cassette.pin('run_time', run_time)
+                last_run = self.cassette.pin('last_run', last_run)
+                self.rss_parser.now = run_time
+            since = time_window_cutoff(sources_config['rules'].get('time_window'), last_run, run_time)
+            if since:
+                self.logger.info(f"只处理 {since.strftime('%Y-%m-%d %H:%M:%S')} (UTC) 之后发布的新闻")
+            
+            profiles = load_profiles(self.config, sources_config['sources'])
+            if profiles:
+                all_news, sent = self._process_profiles(profiles, sources_config['rules'], since, run)
+            else:
+                # 获取所有新闻
+                with run.stage('collect') as stage_deadline:
+                    all_news = self._collect_news(sources_config['sources'], sources_config['rules'], since,
+                                                  stage_deadline)
+                
+                # 生成摘要
+                with run.stage('summarize') as stage_deadline:
+                    summary = self.summarizer.generate_summary(all_news, stage_deadline)
+                self._log_degraded()
+                with run.stage('render'):
+                    summary, images = self.image_renderer.render(summary, all_news)
+                date_str = datetime.now().strftime('%Y-%m-%d')
+                self._archive_summaries(date_str)
+                
+                # 发送邮件
+                with run.stage('send'):
+                    sent = self.mailer.send_daily_report(summary, date_str, images)
+                
+            # 排序阶段写入的簇编号随新闻一起存档
+            self._archive_items(all_news)
+            self.summarizer.log_run_usage()
+            
+            # 发送成功后才把入库的新闻标记为已推送，失败时留到下次
+            if self.item_store and sent and self.persist_state:
+                self.item_store.mark_reported(all_news)
+            if sent and self.persist_state:
+                self._save_last_run(run_time)
             
             self.logger.info("每日新闻处理完成")
             
@@ -89,13 +249,202 @@ class DiTing:
             self.logger.error(f"处理每日新闻时发生错误: {str(e)}")
             raise  # 重新抛出异常，确保错误状态能被捕获
             
+    def _process_profiles(self, profiles, rules, since=None, run=None):
+        """多profile模式：共享抓取和处理，按profile分别生成摘要并发送
+        
+        各profile的摘要、图片和发送交替进行，截止时间模式下都在summarize阶段的预算内完成；
+        图片和发送的耗时累计后从summarize阶段中扣除，作为render和send阶段分别记录。
+        """
+        run = run or RunDeadline()
+        # 所有profile的源合并后只抓取一次
+        with run.stage('collect') as stage_deadline:
+            all_news = self._collect_news(merge_sources(profiles), rules, since, stage_deadline)
+        date_str = datetime.now().strftime('%Y-%m-%d')
+        
+        nested = {'render': 0.0, 'send': 0.0}
+        with run.stage('summarize', nested) as stage_deadline:
+            all_sent = self._send_profiles(profiles, all_news, date_str, stage_deadline, nested)
+        return all_news, all_sent
+        
+    def _send_profiles(self, profiles, all_news, date_str, deadline=None, spent=None):
+        """按profile分别生成摘要并发送，返回是否全部发送成功；spent累计图片和发送的耗时"""
+        spent = spent if spent is not None else {'render': 0.0, 'send': 0.0}
+        all_sent = True
+        for profile in profiles:
+            try:
+                items = profile.select(all_news)
+                self.logger.info(f"开始处理profile {profile.name}，共 {len(items)} 条新闻")
+                
+                # 相同分类、相同新闻集合的摘要会命中Summarizer的缓存
+                summary = self.summarizer.generate_summary(items, deadline, profile.name)
+                self._log_degraded(profile.name)
+                started = time.time()
+                summary, images = self.image_renderer.render(summary, items)
+                spent['render'] += time.time() - started
+                self._archive_summaries(date_str, profile.name)
+                started = time.time()
+                sent = Mailer(profile.email_config).send_daily_report(summary, date_str, images)
+                spent['send'] += time.time() - started
+                if not sent:
+                    all_sent = False
+            except Exception as e:
+                self.logger.error(f"处理profile {profile.name} 时出错: {str(e)}")
+                all_sent = False
+        return all_sent
+        
+    def _log_degraded(self, profile=''):
+        """记录因截止时间降级的分类"""
+        degraded = self.summarizer.last_degraded
+        if degraded:
+            prefix = f"profile {profile} " if profile else ''
+            self.logger.warning(
+                f"{prefix}以下分类未能在送达时间前完成: "
+                f"{'，'.join(f'{category}({mode})' for category, mode in degraded.items())}"
+            )
+        
+    def _archive_items(self, items):
+        """存档本次处理的新闻"""
+        if not self.archive:
+            return
+        try:
+            self.archive.add_items(items)
+        except Exception as e:
+            self.logger.error(f"存档新闻失败: {str(e)}")
+            
+    def _archive_summaries(self, date_str, profile=''):
+        """存档最近一次生成的分类摘要"""
+        if not self.archive or not self.summarizer.last_summaries:
+            return
+        try:
+            self.archive.add_summaries(date_str, self.summarizer.last_summaries, profile)
+        except Exception as e:
+            self.logger.error(f"存档分类摘要失败: {str(e)}")
+            
+    def process_deferred(self):
+        """收取已完成的批处理摘要，作为补充摘要发送给提交时的profile"""
+        try:
+            summaries, job_ids = self.summarizer.collect_deferred()
+            if not summaries:
+                # 已结束的任务中没有可补发的内容，不再重复收取
+                self.summarizer.ack_deferred(job_ids)
+                return False
+                
+            batch_config = self.config['summarizer']['batch']
+            profiles = load_profiles(self.config, self._load_sources()['sources'])
+            email_configs = {profile.name: profile.email_config for profile in profiles}
+            date_str = datetime.now().strftime('%Y-%m-%d')
+            
+            sent = True
+            for profile_name, summary in summaries.items():
+                if profile_name and profile_name not in email_configs:
+                    self.logger.warning(f"profile {profile_name} 已不存在，补充摘要改为发送给默认收件人")
+                email_config = dict(email_configs.get(profile_name, self.config['email']))
+                email_config['subject_template'] = batch_config.get('followup_subject', '谛听补充摘要 - {date}')
+                if not Mailer(email_config).send_daily_report(summary, date_str, []):
+                    sent = False
+                    
+            # 全部发送成功后才标记任务完成，失败时下次重新收取
+            if sent:
+                self.summarizer.ack_deferred(job_ids)
+            return sent
+            
+        except Exception as e:
+            self.logger.error(f"发送补充摘要时发生错误: {str(e)}")
+            return False
+            
+    def process_digest(self, period, end=None):
+        """根据存档的每日摘要生成并发送周报或月报
+        
+        Args:
+            period: week 或 month
+            end: 汇总区间的最后一天，默认为昨天
+        """
+        if not self.archive:
+            self.logger.error("生成周报/月报需要开启archive存档")
+            return False
+            
+        end = end or date.today() - timedelta(days=1)
+        start, end = period_range(period, end)
+        date_str = f"{start.isoformat()} 至 {end.isoformat()}"
+        title = f"谛听{PERIOD_NAMES[period]}"
+        self.logger.info(f"开始生成{PERIOD_NAMES[period]}，区间 {date_str}")
+        
+        digest_config = self.config.get('digest', {})
+        builder = DigestBuilder(self.archive, self.summarizer)
+        sources_config = self._load_sources()
+        profiles = load_profiles(self.config, sources_config['sources'])
+        targets = [(profile.name, profile.email_config) for profile in profiles] or [('', self.config['email'])]
+        
+        all_sent = True
+        for profile_name, email_config in targets:
+            digests = builder.build(period, end, profile_name)
+            if not digests:
+                continue
+            email_config = dict(email_config)
+            email_config['subject_template'] = digest_config.get(
+                f"{period}_subject", f"{title} - {{date}}"
+            )
+            summary = self.summarizer.sections_to_html(list(digests.values()))
+            if not Mailer(email_config).send_daily_report(summary, date_str, [], title):
+                all_sent = False
+        return all_sent
+        
+    def _monthly_digest(self):
+        """服务模式下每天检查一次，每月1日发送上个月的月报"""
+        if date.today().day == 1:
+            self.process_digest('month')
+            
+    def _start_polling(self):
+        """启动按源自适应间隔的后台轮询"""
+        polling_config = self.config['polling']
+        sources_config = self._load_sources()
+        profiles = load_profiles(self.config, sources_config['sources'])
+        sources = merge_sources(profiles) if profiles else sources_config['sources']
+        
+        self.item_store = ItemStore(polling_config.get('store_path', os.path.join('data', 'items.db')))
+        self.item_store.purge(polling_config.get('retention_days', 7))
+        self.poller = SourcePoller(
+            self.rss_parser,
+            self.content_processor,
+            self.item_store,
+            sources,
+            sources_config['rules'],
+            polling_config,
+            self._full_text_fetcher(sources)
+        )
+        
+        # 先同步完成一轮抓取，保证首次推送有数据
+        self.poller.poll_all()
+        self.poller.start()
+            
     def run_service(self):
         """以服务模式运行（用于systemd）"""
         # 设置定时任务
         schedule_time = self.config['schedule']['daily_report']
-        schedule.every().day.at(schedule_time).do(self.process_daily_news)
+        if self.deadline_scheduler:
+            # 每分钟检查一次，按历史耗时倒推的开始时间随记录变化
+            schedule.every(1).minutes.do(self._deadline_tick)
+            deliver_at = '%02d:%02d' % self.deadline_scheduler.deliver_at
+            self.logger.info(f"谛听服务已启动，将保证每天 {deliver_at} 前送达资讯摘要")
+        else:
+            schedule.every().day.at(schedule_time).do(self.process_daily_news)
+            self.logger.info(f"谛听服务已启动，将在每天 {schedule_time} 推送资讯摘要")
+        
+        # 周报、月报
+        digest_config = self.config.get('digest', {})
+        if digest_config.get('weekly'):
+            weekday, at = digest_config['weekly'].split()
+            getattr(schedule.every(), weekday).at(at).do(self.process_digest, 'week')
+        if digest_config.get('monthly'):
+            schedule.every().day.at(digest_config['monthly']).do(self._monthly_digest)
+        
+        # 定期收取批处理摘要
+        batch_config = (self.config.get('summarizer') or {}).get('batch')
+        if batch_config:
+            schedule.every(batch_config.get('followup_minutes', 30)).minutes.do(self.process_deferred)
         
-        self.logger.info(f"谛听服务已启动，将在每天 {schedule_time} 推送资讯摘要")
+        if self.config.get('polling', {}).get('enabled'):
+            self._start_polling()
         
         # 立即执行一次
         try:
@@ -108,11 +457,39 @@ class DiTing:
             schedule.run_pending()
             time.sleep(60)
             
+    def _deadline_tick(self):
+        """截止时间模式下到了倒推的开始时间就生成日报"""
+        deadline = self.deadline_scheduler.due(datetime.now())
+        if deadline:
+            self.process_daily_news(deadline)
+            
+    def close(self):
+        """程序退出前释放摘要生成使用的线程，保存源健康记录"""
+        self.summarizer.close()
+        if self.source_health:
+            self.source_health.flush()
+        
+    def run_worker(self):
+        """以worker模式运行，从共享任务队列领取分片任务"""
+        distributed_config = self.config.get('distributed', {})
+        queue = SQLiteWorkQueue(
+            distributed_config.get('queue_path', os.path.join('data', 'queue.db')),
+            distributed_config.get('lease_seconds', 600)
+        )
+        queue.serve()
+        
+    def run_followup(self):
+        """收取并发送批处理摘要一次（用于crontab）"""
+        self.logger.info("开始收取批处理摘要")
+        self.process_deferred()
+        
     def run_once(self):
         """执行一次任务（用于crontab）"""
         self.logger.info("开始执行单次任务")
         try:
-            self.process_daily_news()
+            # 截止时间模式下以最近的送达时间为截止时间
+            deadline = self.deadline_scheduler.deadline_for(datetime.now()) if self.deadline_scheduler else None
+            self.process_daily_news(deadline)
             self.logger.info("单次任务执行完成")
             return True
         except Exception as e:
@@ -121,20 +498,47 @@ class DiTing:
 
 def main():
     parser = argparse.ArgumentParser(description='DiTing RSS聚合器')
-    parser.add_argument('--mode', choices=['service', 'once'], default='once',
-                      help='运行模式：service（服务模式）或once（单次执行）')
+    parser.add_argument('--mode', choices=['service', 'once', 'worker', 'followup', 'digest'], default='once',
+                      help='运行模式：service（服务模式）、once（单次执行）、worker（分片任务worker）、'
+                           'followup（发送已完成的批处理摘要）或digest（根据存档生成周报/月报）')
+    parser.add_argument('--period', choices=['week', 'month'], default='week',
+                      help='digest模式的汇总周期')
+    parser.add_argument('--end', help='digest模式汇总区间的最后一天，格式YYYY-MM-DD，默认为昨天')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', metavar='PATH',
+                                help='once模式下把所有HTTP响应、模型调用和SMTP会话录制到压缩的cassette文件')
+    cassette_group.add_argument('--replay', metavar='PATH', help='once模式下从cassette文件回放外部I/O，不访问网络')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                      help='回放加速倍数，1为按录制时的耗时，0为不等待')
     args = parser.parse_args()
     
+    diting = None
     try:
+        if args.mode == 'once' and (args.record or args.replay):
+            cassette = Cassette(args.replay or args.record, 'replay' if args.replay else 'record', args.replay_speed)
+            with cassette:
+                diting = DiTing(cassette)
+                success = diting.run_once()
+            sys.exit(0 if success else 1)
         diting = DiTing()
         if args.mode == 'service':
             diting.run_service()
+        elif args.mode == 'worker':
+            diting.run_worker()
+        elif args.mode == 'followup':
+            diting.run_followup()
+        elif args.mode == 'digest':
+            end = datetime.strptime(args.end, '%Y-%m-%d').date() if args.end else None
+            sys.exit(0 if diting.process_digest(args.period, end) else 1)
         else:
             success = diting.run_once()
             sys.exit(0 if success else 1)
     except Exception as e:
         logging.error(f"程序执行失败: {str(e)}")
         sys.exit(1)
+    finally:
+        if diting:
+            diting.close()
 
 if __name__ == "__main__":
     main() 
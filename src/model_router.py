@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Any, Optional
+
+
+class ModelCallError(Exception):
+    """模型调用失败，路由层据此切换到下一个档位"""
+
+
+class ModelTier:
+    """一个模型档位：模型名称及其调用参数"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.name = config['name']
+        self.model = config['model']
+        self.max_tokens = config.get('max_tokens', 1500)
+        self.timeout = config.get('timeout', 90)
+        self.temperature = config.get('temperature', 0.7)
+        self.top_p = config.get('top_p', 0.8)
+
+    def __repr__(self) -> str:
+        return f"ModelTier({self.name}, {self.model})"
+
+
+class CircuitBreaker:
+    """单个档位的熔断器
+
+    连续失败达到阈值后熔断，冷却期内不再调用该档位；冷却期结束后只放行一次试探调用（半开），
+    试探进行中其他调用继续跳过该档位，试探成功则恢复，失败则继续熔断。
+    试探超过一个冷却期仍没有结果时视为丢失，重新放行一次试探。
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 300):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None
+        self._lock = threading.Lock()
+
+    def _ready(self, now: float) -> bool:
+        if self.opened_at is None:
+            return True
+        if now - self.opened_at < self.cooldown:
+            return False
+        return self.probe_at is None or now - self.probe_at >= self.cooldown
+
+    def available(self) -> bool:
+        """档位当前是否可以调用，不占用试探机会，用于排列档位顺序"""
+        with self._lock:
+            return self._ready(time.time())
+
+    def allow(self) -> bool:
+        """即将调用档位时检查；半开状态下占用唯一的试探机会"""
+        with self._lock:
+            now = time.time()
+            if not self._ready(now):
+                return False
+            if self.opened_at is not None:
+                self.probe_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.probe_at = None
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+
+class ModelRouter:
+    """模型路由
+
+    按分类或提示词长度选择档位顺序，主档位超过hedge_after秒未返回时
+    向更快的档位发送一个相同的请求，取先成功的结果；
+    调用失败或超时则依次降级到后续档位，熔断中的档位直接跳过。
+    """
+
+    def __init__(self, config: Dict[str, Any], default_tier: Dict[str, Any]):
+        tiers = config.get('tiers') or [default_tier]
+        self.tiers = {tier['name']: ModelTier(tier) for tier in tiers}
+        self.default_order = config.get('default') or [tier['name'] for tier in tiers]
+        self.category_order = config.get('categories', {})
+        self.large_prompt = config.get('large_prompt', {})
+        self.hedge_after = config.get('hedge_after')
+        self.hedge_tier = config.get('hedge_tier')
+
+        breaker_config = config.get('breaker', {})
+        self.breakers = {
+            name: CircuitBreaker(
+                breaker_config.get('failure_threshold', 3),
+                breaker_config.get('cooldown', 300)
+            )
+            for name in self.tiers
+        }
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=config.get('max_workers', 4))
+
+        for name in self._all_referenced():
+            if name not in self.tiers:
+                raise ValueError(f"模型路由引用了不存在的档位: {name}")
+
+    def _all_referenced(self) -> List[str]:
+        names = list(self.default_order)
+        for order in self.category_order.values():
+            names.extend(order)
+        names.extend(self.large_prompt.get('tiers', []))
+        if self.hedge_tier:
+            names.append(self.hedge_tier)
+        return names
+
+    def route(self, category: str, prompt_chars: int, prefer: Optional[str] = None) -> List[ModelTier]:
+        """返回本次调用的档位顺序，已熔断的档位排除在外
+
+        指定prefer时只使用该档位；该档位处于熔断状态时按正常顺序选择，避免调用直接失败。
+        """
+        if prefer:
+            if self.breakers[prefer].available():
+                return [self.tiers[prefer]]
+            self.logger.warning(f"指定的档位 {prefer} 处于熔断状态，{category} 类按正常顺序选择档位")
+
+        if self.large_prompt.get('chars') and prompt_chars >= self.large_prompt['chars']:
+            order = self.large_prompt.get('tiers', self.default_order)
+        else:
+            order = self.category_order.get(category, self.default_order)
+
+        tiers = []
+        for name in order:
+            if self.breakers[name].available():
+                tiers.append(self.tiers[name])
+            else:
+                self.logger.info(f"档位 {name} 处于熔断状态，跳过")
+        return tiers
+
+    def call(self, category: str, prompt_chars: int, invoke: Callable[[ModelTier], str],
+             prefer: Optional[str] = None) -> str:
+        """按路由顺序调用模型，全部失败时抛出ModelCallError"""
+        tiers = self.route(category, prompt_chars, prefer)
+        if not tiers:
+            raise ModelCallError(f"{category} 类没有可用的模型档位")
+
+        last_error = None
+        for index, tier in enumerate(tiers):
+            # 排列顺序之后其他调用可能已占用了试探机会
+            if not self.breakers[tier.name].allow():
+                self.logger.info(f"档位 {tier.name} 正在试探恢复，跳过")
+                continue
+            try:
+                return self._call_with_hedge(category, tier, invoke, hedged=(index == 0))
+            except Exception as e:
+                last_error = e
+                self.logger.warning(f"{category} 类使用档位 {tier.name} 失败: {str(e)}，尝试下一个档位")
+        if last_error is None:
+            raise ModelCallError(f"{category} 类没有可用的模型档位")
+        raise ModelCallError(f"{category} 类所有模型档位均失败: {str(last_error)}")
+
+    def _call_with_hedge(self, category: str, tier: ModelTier, invoke: Callable[[ModelTier], str],
+                         hedged: bool) -> str:
+        """调用一个档位，必要时发送对冲请求"""
+        started = time.time()
+        futures = {self._executor.submit(invoke, tier): tier}
+
+        hedge = self._hedge_for(tier) if hedged else None
+        if hedge is not None:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done and self.breakers[hedge.name].allow():
+                self.logger.info(f"{category} 类档位 {tier.name} 超过 {self.hedge_after} 秒未返回，向档位 {hedge.name} 发送对冲请求")
+                futures[self._executor.submit(invoke, hedge)] = hedge
+
+        last_error = None
+        pending = set(futures)
+        while pending:
+            remaining = max(tier.timeout - (time.time() - started), 0)
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                for future in pending:
+                    self.breakers[futures[future].name].record_failure()
+                raise ModelCallError(f"档位 {tier.name} 超过 {tier.timeout} 秒未返回")
+            for future in done:
+                used = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    self.breakers[used.name].record_failure()
+                    continue
+                self.breakers[used.name].record_success()
+                self.logger.info(f"{category} 类由档位 {used.name} 生成，耗时 {time.time() - started:.1f} 秒")
+                return result
+        raise ModelCallError(str(last_error))
+
+    def _hedge_for(self, tier: ModelTier) -> Optional[ModelTier]:
+        if not self.hedge_after or not self.hedge_tier or self.hedge_tier == tier.name:
+            return None
+        if not self.breakers[self.hedge_tier].available():
+            return None
+        return self.tiers[self.hedge_tier]
+
+    def close(self) -> None:
+        """关闭调用线程池，已提交的调用照常完成"""
+        self._executor.shutdown(wait=False)
+
+    def status(self) -> Dict[str, str]:
+        """各档位的熔断状态"""
+        return {name: ('open' if breaker.is_open else 'closed') for name, breaker in self.breakers.items()}
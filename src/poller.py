@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+from .rss_parser import RSSParser, time_window_cutoff
+from .content_processor import ContentProcessor
+from .item_store import ItemStore
+from .full_text import FullTextFetcher
+
+
+class SourcePoller:
+    """按源自适应间隔的后台轮询器
+
+    每个源有自己的轮询间隔：根据观测到的新条目速率学习得到，
+    并以源声明的ttl、sy:updatePeriod和Cache-Control为下限。
+    新条目经过内容处理后写入ItemStore，生成日报时直接读取。
+    """
+
+    # 新条目到达速率的EWMA平滑系数
+    RATE_ALPHA = 0.3
+    # 没有新条目时的间隔退避倍数
+    BACKOFF = 1.5
+
+    def __init__(self, rss_parser: RSSParser, content_processor: ContentProcessor, store: ItemStore,
+                 sources: List[Dict[str, Any]], rules: Dict[str, Any], config: Dict[str, Any],
+                 full_text: Optional[FullTextFetcher] = None):
+        self.rss_parser = rss_parser
+        self.content_processor = content_processor
+        self.store = store
+        self.sources = sources
+        self.rules = rules
+        self.min_interval = config.get('min_interval', 300)
+        self.max_interval = config.get('max_interval', 21600)
+        self.default_interval = config.get('default_interval', 1800)
+        # 期望每次轮询平均拿到的新条目数，决定学习到的间隔
+        self.target_items = config.get('target_items_per_poll', 1)
+        self.workers = config.get('workers', 4)
+        # 开启fetch_full_text的源，新条目在内容处理前补充全文
+        self.full_text = full_text
+        self.logger = logging.getLogger(__name__)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_source(self, source: Dict[str, Any]) -> int:
+        """轮询单个源，返回新增条数"""
+        state = self.store.load_source_state(source['url'])
+        # 已入库的条目会被去重，这里只用时间窗口挡掉明显过期的条目
+        since = time_window_cutoff(self.rules.get('time_window'))
+        items, meta = self.rss_parser.fetch(source, state.get('etag'), state.get('modified'), since=since)
+        if meta.get('skipped'):
+            # 熔断中的源没有观测数据，保持原间隔
+            state['next_poll'] = time.time() + state.get('interval', self.default_interval)
+            self.store.save_source_state(source['url'], state)
+            return 0
+
+        # 已入库的条目不再重复做内容处理
+        seen = self.store.has_items(items)
+        new_items = [item for item, exists in zip(items, seen) if not exists]
+        added = 0
+        if new_items:
+            if self.full_text and source.get('fetch_full_text'):
+                self.full_text.fill(new_items)
+            processed = self.content_processor.process(new_items, source['type'], self.rules)
+            added = self.store.add_items(processed)
+
+        now = time.time()
+        state = self._update_state(state, meta, len(new_items), now)
+        self.store.save_source_state(source['url'], state)
+        self.logger.info(
+            f"轮询源 {source['name']} 完成，新增 {added} 条，下次轮询间隔 {state['interval']:.0f} 秒"
+        )
+        return added
+
+    def _update_state(self, state: Dict[str, Any], meta: Dict[str, Any], new_count: int, now: float) -> Dict[str, Any]:
+        """根据本次结果更新源的到达速率和轮询间隔"""
+        last_poll = state.get('last_poll')
+        interval = state.get('interval', self.default_interval)
+        rate = state.get('rate')
+
+        if last_poll is not None and now > last_poll:
+            observed = new_count / (now - last_poll)
+            rate = observed if rate is None else self.RATE_ALPHA * observed + (1 - self.RATE_ALPHA) * rate
+
+        if rate:
+            interval = self.target_items / rate
+        elif last_poll is not None:
+            interval = interval * self.BACKOFF
+
+        # 源声明的刷新提示作为下限
+        hint = max(meta.get('ttl', 0), meta.get('update_period', 0), meta.get('max_age', 0))
+        interval = min(max(interval, hint, self.min_interval), self.max_interval)
+
+        state.update({
+            'last_poll': now,
+            'next_poll': now + interval,
+            'interval': interval,
+            'rate': rate,
+        })
+        for key in ('etag', 'modified'):
+            if meta.get(key):
+                state[key] = meta[key]
+        return state
+
+    def due_sources(self, now: float) -> List[Dict[str, Any]]:
+        """返回已到轮询时间的源"""
+        return [source for source in self.sources
+                if self.store.load_source_state(source['url']).get('next_poll', 0) <= now]
+
+    def poll_all(self) -> int:
+        """立即轮询全部源，返回新增条数"""
+        return self._poll(self.sources)
+
+    def _poll(self, sources: List[Dict[str, Any]]) -> int:
+        health = getattr(self.rss_parser, 'health', None)
+        if health:
+            health.start_run()
+        added = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for result in executor.map(self._safe_poll, sources):
+                added += result
+        if health:
+            health.log_run_summary()
+        return added
+
+    def _safe_poll(self, source: Dict[str, Any]) -> int:
+        try:
+            return self.poll_source(source)
+        except Exception as e:
+            self.logger.error(f"轮询源 {source['name']} 时出错: {str(e)}")
+            return 0
+
+    def start(self) -> None:
+        """启动后台轮询线程"""
+        self._thread = threading.Thread(target=self._run, name='source-poller', daemon=True)
+        self._thread.start()
+        self.logger.info(f"后台轮询已启动，共 {len(self.sources)} 个源")
+
+    def stop(self) -> None:
+        """停止后台轮询线程"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            due = self.due_sources(time.time())
+            if due:
+                self._poll(due)
+            self._stop.wait(10)
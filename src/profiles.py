@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+from typing import Dict, List, Any, Optional
+
+
+class Profile:
+    """多租户模式下的单个订阅配置
+
+    每个profile声明自己的信息源、分类、过滤规则和收件人，
+    抓取和内容处理在所有profile之间共享，只在最后按profile筛选。
+    """
+
+    def __init__(self, config: Dict[str, Any], sources: List[Dict[str, Any]], email_config: Dict[str, Any]):
+        self.name = config['name']
+        self.sources = self._resolve_sources(config.get('sources'), sources)
+        self.source_urls = set(source['url'] for source in self.sources)
+        categories = config.get('categories')
+        self.categories = set(categories) if categories else None
+        self.content_filters = config.get('content_filters', [])
+
+        # 邮件配置在全局配置的基础上覆盖收件人和标题模板
+        self.email_config = dict(email_config)
+        self.email_config['recipients'] = config.get('recipients', email_config.get('recipients', []))
+        if 'subject_template' in config:
+            self.email_config['subject_template'] = config['subject_template']
+
+    def _resolve_sources(self, declared: Optional[List[Any]], sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """将profile声明的源解析为完整的源配置
+
+        声明项可以是sources.yaml中的源名称，也可以是完整的源配置；
+        未声明时使用sources.yaml中的全部源。
+        """
+        if not declared:
+            return list(sources)
+
+        by_name = {source['name']: source for source in sources}
+        resolved = []
+        for entry in declared:
+            if isinstance(entry, dict):
+                resolved.append(entry)
+            elif entry in by_name:
+                resolved.append(by_name[entry])
+            else:
+                raise ValueError(f"profile {self.name} 引用了不存在的源: {entry}")
+        return resolved
+
+    def select(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """从共享的新闻列表中筛选出本profile关心的新闻"""
+        selected = []
+        for item in items:
+            if item.get('source_url') not in self.source_urls:
+                continue
+            if self.categories is not None and item.get('category', 'general') not in self.categories:
+                continue
+            if self._should_filter(item):
+                continue
+            selected.append(item)
+        return selected
+
+    def _should_filter(self, item: Dict[str, Any]) -> bool:
+        """检查是否命中profile自己的过滤规则"""
+        for filter_rule in self.content_filters:
+            pattern = filter_rule['pattern']
+            if (pattern in item.get('title', '') or
+                pattern in item.get('content', '')):
+                return True
+        return False
+
+
+def load_profiles(config: Dict[str, Any], sources: List[Dict[str, Any]]) -> List[Profile]:
+    """从config.yaml加载profile列表，未配置时返回空列表"""
+    return [Profile(profile, sources, config['email']) for profile in config.get('profiles', [])]
+
+
+def merge_sources(profiles: List[Profile]) -> List[Dict[str, Any]]:
+    """合并所有profile的信息源，同一URL只保留一份
+
+    同一URL的源只抓取和处理一次，分类、是否抓取全文等配置无法按profile区分，
+    除名称外有不一致的配置时抛出ValueError。
+    """
+    merged = {}
+    owners = {}
+    for profile in profiles:
+        for source in profile.sources:
+            existing = merged.get(source['url'])
+            if existing is None:
+                merged[source['url']] = source
+                owners[source['url']] = profile.name
+                continue
+            conflicts = sorted(key for key in set(existing) | set(source)
+                               if key != 'name' and existing.get(key) != source.get(key))
+            if conflicts:
+                raise ValueError(
+                    f"profile {owners[source['url']]} 和 {profile.name} 中的源 {source['url']} "
+                    f"配置不一致: {', '.join(conflicts)}"
+                )
+    logging.getLogger(__name__).info(
+        f"{len(profiles)} 个profile共引用 {len(merged)} 个不重复的信息源"
+    )
+    return list(merged.values())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+import yaml
+
+from .archive import Archive
+from .item_store import encode_items, decode_items
+from .ranker import estimate_tokens
+from .summarizer import Summarizer, FAILED_SUMMARY
+
+_LINK = re.compile(r'\[链接\]\((\S+?)\)')
+_TITLE = re.compile(r'^标题：(.*)$', re.M)
+_REF = re.compile(r'^(?:引用编号：(\[R\d+\])|链接：(\S+))$', re.M)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """最近秩法的百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def check_structure(category: str, summary: str, item_count: int) -> Dict[str, Any]:
+    """检查摘要的结构：二级标题是否为分类名、其余非空行是否为列表项，以及链接数"""
+    lines = [line.strip() for line in summary.splitlines() if line.strip()]
+    header_ok = bool(lines) and lines[0] == f"## {category}"
+    body = lines[1:]
+    list_ok = bool(body) and all(line.startswith('- ') for line in body)
+    links = len(set(_LINK.findall(summary)))
+    return {
+        'header_ok': header_ok,
+        'list_ok': list_ok,
+        'links': links,
+        'link_coverage': links / item_count if item_count else 0.0
+    }
+
+
+def mock_invoke(summarizer: Summarizer):
+    """本地替身：按提示词中的标题和链接逐条生成列表项，受max_tokens限制，不调用外部服务"""
+    def invoke(category, messages, tier):
+        prompt = summarizer._message_text(messages[-1])
+        lines = [f"## {category}", '']
+        for title, (ref, link) in zip(_TITLE.findall(prompt), _REF.findall(prompt)):
+            line = f"- {title} {ref or f'[链接]({link})'}"
+            if estimate_tokens('\n'.join(lines + [line])) > tier.max_tokens:
+                break
+            lines.extend([line, ''])
+        output = '\n'.join(lines).strip()
+        summarizer._record_usage(category, tier, None, messages, output)
+        return output
+    return invoke
+
+
+def export_corpus(archive: Archive, since: Optional[datetime], until: Optional[datetime],
+                  per_category: int) -> List[Dict[str, Any]]:
+    """从存档中取出固定的新闻集合，每个分类最多per_category条"""
+    items = archive.search(since=since, until=until, limit=100000)
+    counts = {}
+    corpus = []
+    for item in items:
+        category = item.get('category', 'general')
+        if counts.get(category, 0) < per_category:
+            counts[category] = counts.get(category, 0) + 1
+            corpus.append(item)
+    return corpus
+
+
+class PromptBenchmark:
+    """提示词写法和调用参数的基准测试
+
+    在固定的新闻集合上，用每组候选配置（要求文本、max_tokens、temperature等）
+    逐个分类生成摘要并重复若干次，记录输入/输出token、耗时分布、输出长度和结构检查结果，
+    输出各组配置的对比表。可以调用真实接口，也可以使用本地替身。
+    """
+
+    def __init__(self, api_key: str, corpus: List[Dict[str, Any]], base_config: Dict[str, Any] = None,
+                 mock: bool = False):
+        self.api_key = api_key
+        self.base_config = base_config or {}
+        self.mock = mock
+        self.logger = logging.getLogger(__name__)
+
+        self.by_category = {}
+        for item in corpus:
+            self.by_category.setdefault(item.get('category', 'general'), []).append(item)
+
+    def _summarizer(self, variant: Dict[str, Any]) -> Summarizer:
+        config = dict(self.base_config)
+        config.update(variant.get('summarizer', {}))
+        tier = {'name': variant['name'], 'model': variant.get('model', 'qwen-turbo')}
+        for key in ('max_tokens', 'temperature', 'top_p', 'timeout'):
+            if key in variant:
+                tier[key] = variant[key]
+        config['routing'] = {'tiers': [tier]}
+        if variant.get('instructions_file'):
+            with open(variant['instructions_file'], 'r', encoding='utf-8') as f:
+                config['instructions'] = f.read()
+        elif variant.get('instructions'):
+            config['instructions'] = variant['instructions']
+        # 基准测试中不使用用量台账、预算和批处理
+        for key in ('usage', 'batch', 'fallback_backend'):
+            config.pop(key, None)
+        return Summarizer(self.api_key, config)
+
+    def run_variant(self, variant: Dict[str, Any], repeat: int = 1) -> Dict[str, Any]:
+        """运行一组配置，返回汇总指标"""
+        summarizer = self._summarizer(variant)
+        calls = []
+
+        def capture(category, tier, usage, messages, output):
+            input_tokens, output_tokens, cached_tokens, estimated = summarizer._usage_tokens(usage, messages, output)
+            calls.append({'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                          'cached_tokens': cached_tokens, 'estimated': estimated})
+
+        summarizer._record_usage = capture
+        if self.mock:
+            summarizer._invoke_model = mock_invoke(summarizer)
+
+        runs = []
+        for _ in range(repeat):
+            for category, items in self.by_category.items():
+                started = time.time()
+                summary = summarizer._generate_category_summary(category, [dict(item) for item in items])
+                latency = time.time() - started
+                result = {'category': category, 'latency': latency, 'chars': len(summary),
+                          'failed': summary.endswith(FAILED_SUMMARY)}
+                result.update(check_structure(category, summary, len(items)))
+                runs.append(result)
+                self.logger.info(f"{variant['name']} {category} 类耗时 {latency:.2f} 秒，输出 {len(summary)} 字符")
+
+        succeeded = [run for run in runs if not run['failed']]
+        latencies = [run['latency'] for run in succeeded]
+        count = len(succeeded) or 1
+        return {
+            'name': variant['name'],
+            'runs': len(runs),
+            'failures': len(runs) - len(succeeded),
+            'calls': len(calls),
+            'input_tokens': sum(call['input_tokens'] for call in calls) / (len(calls) or 1),
+            'output_tokens': sum(call['output_tokens'] for call in calls) / (len(calls) or 1),
+            'cached_tokens': sum(call['cached_tokens'] for call in calls) / (len(calls) or 1),
+            'estimated': any(call['estimated'] for call in calls),
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p90': percentile(latencies, 0.9),
+            'latency_max': max(latencies) if latencies else 0.0,
+            'chars': sum(run['chars'] for run in succeeded) / count,
+            'header_ok': sum(run['header_ok'] for run in succeeded) / count,
+            'list_ok': sum(run['list_ok'] for run in succeeded) / count,
+            'link_coverage': sum(run['link_coverage'] for run in succeeded) / count,
+        }
+
+    def run(self, variants: List[Dict[str, Any]], repeat: int = 1) -> List[Dict[str, Any]]:
+        return [self.run_variant(variant, repeat) for variant in variants]
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    """把各组配置的指标排成对比表，token为每次调用的平均值，带*的为估算值"""
+    header = ['配置', '调用', '失败', '输入tokens', '输出tokens', '缓存命中', 'p50秒', 'p90秒', '最大秒',
+              '输出字符', '标题正确', '列表正确', '链接覆盖']
+    rows = [header]
+    for result in results:
+        mark = '*' if result['estimated'] else ''
+        rows.append([
+            result['name'], str(result['calls']), str(result['failures']),
+            f"{result['input_tokens']:.0f}{mark}", f"{result['output_tokens']:.0f}{mark}",
+            f"{result['cached_tokens']:.0f}",
+            f"{result['latency_p50']:.2f}", f"{result['latency_p90']:.2f}", f"{result['latency_max']:.2f}",
+            f"{result['chars']:.0f}", f"{result['header_ok']:.0%}", f"{result['list_ok']:.0%}",
+            f"{result['link_coverage']:.0%}"
+        ])
+    return '\n'.join('| ' + ' | '.join(row) + ' |' for row in rows[:1] + [['---'] * len(header)] + rows[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='谛听提示词基准测试')
+    subparsers = parser.add_subparsers(dest='command')
+
+    export_parser = subparsers.add_parser('export', help='从存档导出固定的新闻集合')
+    export_parser.add_argument('--archive', default=os.path.join('data', 'archive.db'), help='存档数据库路径')
+    export_parser.add_argument('--since', help='起始日期（含），格式YYYY-MM-DD')
+    export_parser.add_argument('--until', help='结束日期（含），格式YYYY-MM-DD')
+    export_parser.add_argument('--per-category', type=int, default=15, help='每个分类最多导出的条数')
+    export_parser.add_argument('--output', required=True, help='新闻集合文件')
+
+    run_parser = subparsers.add_parser('run', help='运行基准测试')
+    run_parser.add_argument('--corpus', required=True, help='export导出的新闻集合文件')
+    run_parser.add_argument('--variants', required=True, help='候选配置文件（YAML）')
+    run_parser.add_argument('--repeat', type=int, default=1, help='每个分类重复的次数')
+    run_parser.add_argument('--mock', action='store_true', help='使用本地替身，不调用真实接口')
+    run_parser.add_argument('--config', default=os.path.join('config', 'config.yaml'), help='读取API密钥的配置文件')
+    run_parser.add_argument('--output', help='把完整结果写入JSON文件')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == 'export':
+        since = datetime.strptime(args.since, '%Y-%m-%d') if args.since else None
+        until = datetime.strptime(args.until, '%Y-%m-%d') + timedelta(days=1) if args.until else None
+        corpus = export_corpus(Archive(args.archive), since, until, args.per_category)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(encode_items(corpus))
+        print(f"已导出 {len(corpus)} 条新闻到 {args.output}")
+    elif args.command == 'run':
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            corpus = decode_items(f.read())
+        with open(args.variants, 'r', encoding='utf-8') as f:
+            variants_config = yaml.safe_load(f)
+
+        api_key = ''
+        if not args.mock:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                api_key = yaml.safe_load(f)['dashscope']['api_key']
+
+        benchmark = PromptBenchmark(api_key, corpus, variants_config.get('base'), args.mock)
+        results = benchmark.run(variants_config['variants'], args.repeat)
+        print(format_table(results))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
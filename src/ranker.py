@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Set
+
+_ASCII_WORD = re.compile(r'[a-zA-Z][a-zA-Z0-9\-]+|\d+(?:\.\d+)?%?')
+_CJK_RUN = re.compile(r'[\u4e00-\u9fff]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """简单分词：英文按单词，中文按相邻两字切分"""
+    tokens = [word.lower() for word in _ASCII_WORD.findall(text or '')]
+    for run in _CJK_RUN.findall(text or ''):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数：汉字约1个token，其他字符约4个字符1个token"""
+    text = text or ''
+    cjk = sum(len(run) for run in _CJK_RUN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class SalienceRanker:
+    """调用大模型前的本地排序与筛选
+
+    综合时效、源权重、TF-IDF显著性和相似新闻簇的大小为每条新闻打分，
+    相似新闻只保留得分最高的一条，最后按得分在top_k和token预算内截取。
+    """
+
+    DEFAULT_WEIGHTS = {
+        'recency': 0.3,
+        'source': 0.2,
+        'salience': 0.3,
+        'cluster': 0.2,
+    }
+
+    def __init__(self, config: Dict[str, Any]):
+        self.top_k = config.get('top_k', 15)
+        self.token_budget = config.get('token_budget', 4000)
+        self.half_life_hours = config.get('half_life_hours', 24)
+        self.cluster_threshold = config.get('cluster_threshold', 0.5)
+        self.weights = dict(self.DEFAULT_WEIGHTS, **config.get('weights', {}))
+        self.logger = logging.getLogger(__name__)
+
+    def select(self, category: str, items: List[Dict[str, Any]], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """返回排序并截取后的新闻列表，top_k覆盖配置中的条数上限"""
+        top_k = top_k or self.top_k
+        items = [item for item in items if item]
+        if not items:
+            return items
+
+        clusters = self._cluster(items)
+        scores = self._score(items, clusters)
+
+        # 每个簇只保留得分最高的一条
+        representatives = {}
+        for index, cluster_id in enumerate(clusters):
+            best = representatives.get(cluster_id)
+            if best is None or scores[index] > scores[best]:
+                representatives[cluster_id] = index
+
+        selected = []
+        used_tokens = 0
+        for index in sorted(representatives.values(), key=lambda i: scores[i], reverse=True):
+            if len(selected) >= top_k:
+                break
+            item = items[index]
+            cost = estimate_tokens(f"{item.get('title', '')}{item.get('content', '')}")
+            if selected and used_tokens + cost > self.token_budget:
+                continue
+            item['cluster_id'] = f"{category}-{clusters[index]}"
+            item['cluster_size'] = clusters.count(clusters[index])
+            selected.append(item)
+            used_tokens += cost
+
+        self.logger.info(
+            f"{category} 类新闻排序筛选: {len(items)} 条 -> {len(selected)} 条，"
+            f"合并相似新闻 {len(items) - len(representatives)} 条，估算 {used_tokens} tokens"
+        )
+        return selected
+
+    def _cluster(self, items: List[Dict[str, Any]]) -> List[int]:
+        """按标题词集合的Jaccard相似度把相似新闻归为一簇，返回每条新闻的簇编号"""
+        title_tokens = [set(tokenize(item.get('title', ''))) for item in items]
+        clusters = list(range(len(items)))
+        for i in range(len(items)):
+            for j in range(i):
+                if clusters[j] != j:
+                    continue
+                if self._jaccard(title_tokens[i], title_tokens[j]) >= self.cluster_threshold:
+                    clusters[i] = j
+                    break
+        return clusters
+
+    def _jaccard(self, a: Set[str], b: Set[str]) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    def _score(self, items: List[Dict[str, Any]], clusters: List[int]) -> List[float]:
+        """计算每条新闻的综合得分"""
+        recency = [self._recency(item) for item in items]
+        source = self._normalize([float(item.get('source_weight', 1.0)) for item in items])
+        salience = self._normalize(self._tfidf(items))
+        cluster_sizes = Counter(clusters)
+        cluster = self._normalize([float(cluster_sizes[c]) for c in clusters])
+
+        return [
+            self.weights['recency'] * recency[i]
+            + self.weights['source'] * source[i]
+            + self.weights['salience'] * salience[i]
+            + self.weights['cluster'] * cluster[i]
+            for i in range(len(items))
+        ]
+
+    def _recency(self, item: Dict[str, Any]) -> float:
+        """按半衰期衰减的时效得分，发布时间未知时取中间值"""
+        published = item.get('published')
+        if not isinstance(published, datetime):
+            return 0.5
+        age_hours = max((datetime.utcnow() - published).total_seconds() / 3600, 0)
+        return math.pow(0.5, age_hours / self.half_life_hours)
+
+    def _tfidf(self, items: List[Dict[str, Any]]) -> List[float]:
+        """每条新闻的TF-IDF显著性：词项TF-IDF之和按长度归一"""
+        docs = [tokenize(f"{item.get('title', '')} {item.get('title', '')} {item.get('content', '')}")
+                for item in items]
+        df = Counter()
+        for doc in docs:
+            df.update(set(doc))
+        total = len(docs)
+
+        scores = []
+        for doc in docs:
+            if not doc:
+                scores.append(0.0)
+                continue
+            tf = Counter(doc)
+            weight = sum(count * math.log((1 + total) / (1 + df[term])) for term, count in tf.items())
+            scores.append(weight / math.sqrt(len(doc)))
+        return scores
+
+    def _normalize(self, values: List[float]) -> List[float]:
+        low, high = min(values), max(values)
+        if high == low:
+            return [1.0 for _ in values]
+        return [(value - low) / (high - low) for value in values]
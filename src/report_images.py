@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import html
+import logging
+import math
+import os
+from io import BytesIO
+from typing import Dict, List, Any, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageStat, features
+
+# Pillow编码器名称和对应的MIME子类型
+_ENCODERS = {
+    'jpeg': ('JPEG', 'jpeg'),
+    'webp': ('WEBP', 'webp'),
+    'avif': ('AVIF', 'avif'),
+}
+
+
+def psnr(original: Image.Image, encoded: Image.Image) -> float:
+    """两张同尺寸RGB图片之间的峰值信噪比（dB）"""
+    diff = ImageChops.difference(original, encoded)
+    mse = sum(value * value for value in ImageStat.Stat(diff).rms) / 3
+    if mse == 0:
+        return float('inf')
+    return 10 * math.log10(255 * 255 / mse)
+
+
+class ReportImageRenderer:
+    """把处理后的图片以cid:引用嵌入报告HTML
+
+    每张图片插入到包含其新闻链接的列表项中，只附加被引用的图片；
+    编码时在满足质量目标（PSNR）的前提下，从允许的格式和质量中选体积最小的一种。
+    配置为联系表的分类（如摄影）把所有图片拼成一张网格图放在分类标题下。
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.logger = logging.getLogger(__name__)
+        self.formats = [name for name in config.get('formats', ['jpeg', 'webp']) if self._supported(name)]
+        self.qualities = sorted(config.get('qualities', [85, 75, 65, 55]), reverse=True)
+        self.min_psnr = config.get('min_psnr', 35)
+        self.max_width = config.get('max_width', 600)
+        self.max_per_item = config.get('max_per_item', 1)
+        self.contact_sheet_categories = set(config.get('contact_sheet_categories', []))
+        self.sheet_columns = config.get('sheet_columns', 3)
+        self.sheet_cell = config.get('sheet_cell', 200)
+        # 编码结果缓存，只在一次报告的多个profile之间复用，start_report时清空
+        self._cache = {}
+
+    def _supported(self, name: str) -> bool:
+        if name not in _ENCODERS:
+            self.logger.warning(f"不支持的图片格式: {name}")
+            return False
+        if name != 'jpeg' and not features.check(name):
+            self.logger.warning(f"当前Pillow不支持 {name} 编码，已跳过")
+            return False
+        return True
+
+    def start_report(self) -> None:
+        """开始新的一份报告：清空上一次的编码结果，服务模式长期运行时缓存不会无限增长"""
+        self._cache.clear()
+
+    def render(self, report_html: str, items: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """在报告HTML中插入图片引用
+
+        Returns:
+            (插入图片后的HTML, 需要附加的图片列表)，图片为包含cid、data、subtype、filename的字典
+        """
+        images = []
+        by_category = {}
+        for item in items:
+            if item and item.get('media', {}).get('images'):
+                by_category.setdefault(item.get('category', 'general'), []).append(item)
+
+        for category, category_items in by_category.items():
+            if category in self.contact_sheet_categories:
+                report_html = self._render_sheet(report_html, category, category_items, images)
+            else:
+                for item in category_items:
+                    report_html = self._render_item(report_html, item, images)
+
+        if images:
+            total = sum(len(image['data']) for image in images)
+            self.logger.info(f"报告嵌入 {len(images)} 张图片，共 {total} 字节")
+        return report_html, images
+
+    def _render_item(self, report_html: str, item: Dict[str, Any], images: List[Dict[str, Any]]) -> str:
+        """把新闻的图片插入到包含其链接的列表项末尾"""
+        link = item.get('link')
+        if not link:
+            return report_html
+        # markdown2输出的href中&不转义，其他HTML可能转义为&amp;，两种写法都查找
+        position = -1
+        for href in (f'href="{html.escape(link)}"', f'href="{link}"'):
+            position = report_html.find(href)
+            if position >= 0:
+                break
+        if position < 0:
+            return report_html
+        end = report_html.find('</li>', position)
+        if end < 0:
+            return report_html
+
+        tags = []
+        for path in item['media']['images'][:self.max_per_item]:
+            image = self._encode(path)
+            if image is None:
+                continue
+            if all(attached['cid'] != image['cid'] for attached in images):
+                images.append(image)
+            tags.append(f'<br><img src="cid:{image["cid"]}" alt="{html.escape(item.get("title", ""))}" '
+                        f'style="max-width:100%;height:auto">')
+        return report_html[:end] + ''.join(tags) + report_html[end:]
+
+    def _render_sheet(self, report_html: str, category: str, items: List[Dict[str, Any]],
+                      images: List[Dict[str, Any]]) -> str:
+        """把分类的所有图片拼成一张联系表，插入到分类标题之后"""
+        heading = f"<h2>{html.escape(category)}</h2>"
+        position = report_html.find(heading)
+        if position < 0:
+            return report_html
+
+        paths = []
+        for item in items:
+            paths.extend(item['media']['images'][:self.max_per_item])
+        sheet = self._contact_sheet(paths)
+        if sheet is None:
+            return report_html
+
+        image = self._encode_image(sheet, f"sheet-{category}")
+        images.append(image)
+        tag = f'<p><img src="cid:{image["cid"]}" alt="{html.escape(category)}" style="max-width:100%;height:auto"></p>'
+        position += len(heading)
+        return report_html[:position] + tag + report_html[position:]
+
+    def _contact_sheet(self, paths: List[str]) -> Optional[Image.Image]:
+        thumbnails = []
+        for path in paths:
+            try:
+                with Image.open(path) as img:
+                    img.draft('RGB', (self.sheet_cell, self.sheet_cell))
+                    img = img.convert('RGB')
+                    img.thumbnail((self.sheet_cell, self.sheet_cell))
+                    thumbnails.append(img)
+            except Exception as e:
+                self.logger.error(f"读取图片 {path} 失败: {str(e)}")
+        if not thumbnails:
+            return None
+
+        columns = min(self.sheet_columns, len(thumbnails))
+        rows = (len(thumbnails) + columns - 1) // columns
+        sheet = Image.new('RGB', (columns * self.sheet_cell, rows * self.sheet_cell), 'white')
+        for index, thumbnail in enumerate(thumbnails):
+            x = (index % columns) * self.sheet_cell + (self.sheet_cell - thumbnail.width) // 2
+            y = (index // columns) * self.sheet_cell + (self.sheet_cell - thumbnail.height) // 2
+            sheet.paste(thumbnail, (x, y))
+        return sheet
+
+    def _encode(self, path: str) -> Optional[Dict[str, Any]]:
+        """读取并编码一张图片，同一文件在多个profile之间只编码一次"""
+        try:
+            cache_key = (path, os.path.getmtime(path))
+            if cache_key not in self._cache:
+                with Image.open(path) as img:
+                    img.draft('RGB', (self.max_width, self.max_width))
+                    img = img.convert('RGB')
+                    if img.width > self.max_width:
+                        img.thumbnail((self.max_width, self.max_width * 4))
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    self._cache[cache_key] = self._encode_image(img, name)
+            return self._cache[cache_key]
+        except Exception as e:
+            self.logger.error(f"编码图片 {path} 失败: {str(e)}")
+            return None
+
+    def _encode_image(self, img: Image.Image, name: str) -> Dict[str, Any]:
+        """在满足质量目标的编码中选体积最小的一种，都不满足时使用最高质量的JPEG"""
+        best = None
+        for format_name in self.formats:
+            encoder, subtype = _ENCODERS[format_name]
+            # 质量从高到低尝试，保留满足PSNR目标的最小体积
+            for quality in self.qualities:
+                buffer = BytesIO()
+                img.save(buffer, encoder, quality=quality)
+                data = buffer.getvalue()
+                with Image.open(BytesIO(data)) as decoded:
+                    score = psnr(img, decoded.convert('RGB'))
+                if score < self.min_psnr:
+                    break
+                if best is None or len(data) < len(best[0]):
+                    best = (data, subtype)
+
+        if best is None:
+            buffer = BytesIO()
+            img.save(buffer, 'JPEG', quality=self.qualities[0])
+            best = (buffer.getvalue(), 'jpeg')
+
+        data, subtype = best
+        digest = hashlib.md5(data).hexdigest()[:12]
+        extension = 'jpg' if subtype == 'jpeg' else subtype
+        return {
+            'cid': f"{name}-{digest}@diting",
+            'data': data,
+            'subtype': subtype,
+            'filename': f"{name}.{extension}"
+        }
@@ -2,77 +2,295 @@
 # -*- coding: utf-8 -*-
 
 import feedparser
+from feedparser.datetimes import _parse_date as feedparser_parse_date
 import logging
-from datetime import datetime
+import re
+import time
+from datetime import datetime, timedelta, timezone
 import requests
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+
+from .feed_stream import FeedStreamReader
+from .source_health import SourceHealth
+from .url_normalizer import UrlNormalizer
+
+
+def time_window_cutoff(window: Dict[str, Any], last_run: Optional[datetime] = None,
+                       now: Optional[datetime] = None) -> Optional[datetime]:
+    """根据时间窗口配置计算截止时间（UTC）
+
+    Args:
+        window: 时间窗口配置，支持 hours 和 since_last_run
+        last_run: 上次成功运行的时间（UTC）
+        now: 当前时间（UTC），默认为系统时间；回放录制的运行时使用录制时的时间
+
+    Returns:
+        早于该时间的条目应被丢弃；未配置窗口时返回None
+    """
+    if not window:
+        return None
+    if window.get('since_last_run') and last_run:
+        return last_run
+    if window.get('hours'):
+        return (now or datetime.utcnow()) - timedelta(hours=window['hours'])
+    return None
 
 class RSSParser:
-    def __init__(self):
+    # sy:updatePeriod 对应的秒数
+    UPDATE_PERIODS = {
+        'hourly': 3600,
+        'daily': 86400,
+        'weekly': 604800,
+        'monthly': 2592000,
+        'yearly': 31536000
+    }
+    
+    # 常见的日期格式，按命中频率排列；每个源命中的格式会被缓存并优先尝试
+    DATE_FORMATS = [
+        '%a, %d %b %Y %H:%M:%S %z',
+        '%a, %d %b %Y %H:%M:%S %Z',
+        '%Y-%m-%dT%H:%M:%S%z',
+        '%Y-%m-%dT%H:%M:%S.%f%z',
+        '%Y-%m-%dT%H:%M:%SZ',
+        '%Y-%m-%d %H:%M:%S',
+        '%Y-%m-%d %H:%M',
+        '%Y-%m-%d',
+        '%Y/%m/%d %H:%M:%S',
+        '%Y年%m月%d日 %H:%M',
+        '%Y年%m月%d日',
+    ]
+    
+    # 单个RSS文档的默认字节上限，源配置中的max_bytes可以覆盖
+    MAX_BYTES = 5 * 1024 * 1024
+    
+    # 没有健康记录时的请求超时（秒）
+    TIMEOUT = 30
+    
+    def __init__(self, health: Optional[SourceHealth] = None, url_normalizer: Optional[UrlNormalizer] = None):
         self.logger = logging.getLogger(__name__)
+        # 配置了健康记录时按源自适应超时，并跳过熔断中的源
+        self.health = health
+        # 配置了链接规范化时解析包装链接并去掉跟踪参数
+        self.url_normalizer = url_normalizer
+        # 每个源上次解析成功的日期格式
+        self._date_formats = {}
+        # 计算源时间窗口使用的当前时间（UTC），为None时使用系统时间
+        self.now = None
         
-    def parse(self, source: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def parse(self, source: Dict[str, Any], since: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """解析RSS源
         
         Args:
             source: RSS源配置信息
+            since: 只保留该时间（UTC）之后发布的条目
             
         Returns:
             解析后的新闻列表
         """
-        try:
-            self.logger.info(f"开始解析RSS源: {source['name']}")
-            
-            # 获取RSS内容
-            response = requests.get(source['url'], timeout=30)
-            feed = feedparser.parse(response.content)
-            
-            # 处理每个条目
-            news_items = []
-            for entry in feed.entries:
-                try:
-                    item = {
-                        'title': entry.get('title', ''),
-                        'link': entry.get('link', ''),
-                        'description': entry.get('description', ''),
-                        'content': entry.get('content', [{}])[0].get('value', entry.get('description', '')),
-                        'published': self._parse_date(entry.get('published', '')),
-                        'source_name': source['name'],
-                        'source_type': source['type'],
-                        'category': source.get('category', 'general'),
-                        'media': self._extract_media(entry)
-                    }
-                    news_items.append(item)
-                except Exception as e:
-                    self.logger.error(f"处理RSS条目时出错: {str(e)}")
-                    continue
+        news_items, _ = self.fetch(source, since=since)
+        return news_items
+        
+    def fetch(self, source: Dict[str, Any], etag: str = None, modified: str = None,
+              since: Optional[datetime] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """解析RSS源，同时返回源的元信息
+        
+        Args:
+            source: RSS源配置信息
+            etag: 上次响应的ETag，用于条件请求
+            modified: 上次响应的Last-Modified，用于条件请求
+            since: 只保留该时间（UTC）之后发布的条目，源配置中的time_window优先
             
-            self.logger.info(f"RSS源 {source['name']} 解析完成，共获取 {len(news_items)} 条新闻")
-            return news_items
+        Returns:
+            (新闻列表, 元信息)，元信息包含ttl、sy:updatePeriod、Cache-Control等刷新提示，
+            熔断中被跳过的源skipped为True
+        """
+        meta = {'not_modified': False}
+        if self.health and not self.health.allow(source):
+            meta['skipped'] = True
+            return [], meta
             
+        timeout = self.health.timeout(source['url']) if self.health else self.TIMEOUT
+        started = time.time()
+        try:
+            news_items = self._fetch(source, meta, etag, modified, since, timeout)
         except Exception as e:
             self.logger.error(f"解析RSS源 {source['name']} 时发生错误: {str(e)}")
+            if self.health:
+                self.health.record_failure(source, str(e), time.time() - started)
+            return [], meta
+            
+        if self.health:
+            self.health.record_success(source, time.time() - started, len(news_items), meta['not_modified'])
+        # 跳转解析不计入源的响应时间
+        if self.url_normalizer and news_items:
+            self.url_normalizer.normalize_items(news_items)
+        return news_items, meta
+        
+    def _fetch(self, source: Dict[str, Any], meta: Dict[str, Any], etag: Optional[str], modified: Optional[str],
+               since: Optional[datetime], timeout: float) -> List[Dict[str, Any]]:
+        """下载并解析RSS源，元信息写入meta，请求失败时抛出异常"""
+        self.logger.info(f"开始解析RSS源: {source['name']}")
+        
+        # 获取RSS内容，超时同时限制单次读取和整个下载过程
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if modified:
+            headers['If-Modified-Since'] = modified
+        deadline = time.time() + timeout
+        response = requests.get(source['url'], timeout=timeout, headers=headers, stream=True)
+        meta.update(self._response_meta(response))
+        if response.status_code == 304:
+            self.logger.info(f"RSS源 {source['name']} 未更新")
+            meta['not_modified'] = True
+            response.close()
             return []
+        if response.status_code >= 400:
+            response.close()
+            raise requests.exceptions.HTTPError(f"HTTP {response.status_code}")
+            
+        # 源级别的时间窗口覆盖全局窗口
+        if source.get('time_window'):
+            since = time_window_cutoff(source['time_window'], now=self.now) or since
+            
+        # 流式下载，条目足够、出现连续过期条目或超时时提前结束
+        reader = FeedStreamReader(
+            source.get('max_bytes', self.MAX_BYTES),
+            source.get('max_entries'),
+            since,
+            source.get('old_entry_tolerance', 3),
+            deadline
+        )
+        document = reader.read(response)
+        if reader.timed_out and reader.entries == 0:
+            raise requests.exceptions.Timeout(f"{timeout:.0f} 秒内未下载到完整条目")
+        feed = feedparser.parse(document)
+        meta.update(self._feed_meta(feed))
+        keep_undated = (source.get('time_window') or {}).get('keep_undated', True)
+        
+        # 处理每个条目
+        news_items = []
+        skipped = 0
+        for entry in feed.entries:
+            try:
+                # 先解析日期，过期条目在构造新闻之前就丢弃
+                published = self._parse_date(entry, source['name'])
+                if since is not None:
+                    if published is None and not keep_undated:
+                        skipped += 1
+                        continue
+                    if published is not None and published < since:
+                        skipped += 1
+                        continue
+                        
+                item = {
+                    'title': entry.get('title', ''),
+                    'link': entry.get('link', ''),
+                    'description': entry.get('description', ''),
+                    'content': entry.get('content', [{}])[0].get('value', entry.get('description', '')),
+                    'published': published,
+                    'source_name': source['name'],
+                    'source_url': source['url'],
+                    'source_type': source['type'],
+                    'source_weight': source.get('weight', 1.0),
+                    'category': source.get('category', 'general'),
+                    'media': self._extract_media(entry)
+                }
+                news_items.append(item)
+            except Exception as e:
+                self.logger.error(f"处理RSS条目时出错: {str(e)}")
+                continue
+        
+        self.logger.info(f"RSS源 {source['name']} 解析完成，共获取 {len(news_items)} 条新闻，丢弃过期条目 {skipped} 条")
+        return news_items
             
-    def _parse_date(self, date_str: str) -> datetime:
-        """解析日期字符串"""
+    def _response_meta(self, response) -> Dict[str, Any]:
+        """从HTTP响应头中提取缓存相关信息"""
+        meta = {}
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            if headers.get('ETag'):
+                meta['etag'] = headers['ETag']
+            if headers.get('Last-Modified'):
+                meta['modified'] = headers['Last-Modified']
+            match = re.search(r'max-age=(\d+)', headers.get('Cache-Control', ''))
+            if match:
+                meta['max_age'] = int(match.group(1))
+        except Exception:
+            pass
+        return meta
+        
+    def _feed_meta(self, feed) -> Dict[str, Any]:
+        """从feed中提取刷新间隔提示，统一换算为秒"""
+        meta = {}
+        channel = feed.get('feed', {})
         try:
-            return datetime(*feedparser._parse_date(date_str)[:6])
-        except:
-            return datetime.now()
+            # RSS 2.0 <ttl>，单位为分钟
+            if channel.get('ttl'):
+                meta['ttl'] = int(channel['ttl']) * 60
+            # RSS 1.0 syndication模块 <sy:updatePeriod>/<sy:updateFrequency>
+            period = channel.get('sy_updateperiod')
+            if period in self.UPDATE_PERIODS:
+                frequency = int(channel.get('sy_updatefrequency') or 1)
+                meta['update_period'] = self.UPDATE_PERIODS[period] / max(frequency, 1)
+        except (TypeError, ValueError):
+            pass
+        return meta
+        
+    def _parse_date(self, entry: Dict[str, Any], source_name: str) -> Optional[datetime]:
+        """解析条目的发布时间，统一返回UTC时间
+        
+        优先使用feedparser已经解析好的published_parsed/updated_parsed，
+        其次用该源缓存的日期格式解析原始字符串，最后交给feedparser的通用解析。
+        无法解析时返回None，而不是把旧条目当成新条目。
+        """
+        for key in ('published_parsed', 'updated_parsed'):
+            parsed = entry.get(key)
+            if parsed:
+                return datetime(*parsed[:6])
+                
+        date_str = (entry.get('published') or entry.get('updated') or '').strip()
+        if not date_str:
+            return None
+            
+        cached_format = self._date_formats.get(source_name)
+        formats = [cached_format] if cached_format else []
+        formats += [fmt for fmt in self.DATE_FORMATS if fmt != cached_format]
+        for fmt in formats:
+            try:
+                parsed = datetime.strptime(date_str, fmt)
+            except ValueError:
+                continue
+            self._date_formats[source_name] = fmt
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return parsed
+            
+        parsed = feedparser_parse_date(date_str)
+        if parsed:
+            return datetime(*parsed[:6])
+            
+        self.logger.debug(f"无法解析源 {source_name} 的日期: {date_str}")
+        return None
             
     def _extract_media(self, entry: Dict[str, Any]) -> Dict[str, List[str]]:
         """提取媒体内容"""
         media = {
             'images': [],
-            'videos': []
+            'videos': [],
+            'image_sizes': {}  # 图片URL到声明宽高的映射，供下载前筛选
         }
         
+        def add_image(url, width=None, height=None):
+            media['images'].append(url)
+            if width and height:
+                media['image_sizes'][url] = (width, height)
+        
         # 提取封面图片
         if hasattr(entry, 'media_content'):
             for content in entry.media_content:
                 if content.get('type', '').startswith('image/'):
-                    media['images'].append(content['url'])
+                    add_image(content['url'], content.get('width'), content.get('height'))
                 elif content.get('type', '').startswith('video/'):
                     media['videos'].append(content['url'])
                     
@@ -80,7 +298,7 @@ class RSSParser:
         if hasattr(entry, 'media_thumbnail'):
             for thumbnail in entry.media_thumbnail:
                 if 'url' in thumbnail:
-                    media['images'].append(thumbnail['url'])
+                    add_image(thumbnail['url'], thumbnail.get('width'), thumbnail.get('height'))
                     
         # 从内容中提取图片URL
         if 'content' in entry and entry.content:
@@ -88,6 +306,6 @@ class RSSParser:
             soup = BeautifulSoup(entry.content[0].value, 'html.parser')
             for img in soup.find_all('img'):
                 if img.get('src'):
-                    media['images'].append(img['src'])
+                    add_image(img['src'], img.get('width'), img.get('height'))
                     
         return media 
\ No newline at end of file
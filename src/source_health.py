@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+
+class SourceHealth:
+    """RSS源的健康记录
+
+    每个源记录请求耗时的EWMA、连续失败次数、上次成功时间和平均条目数，持久化到JSON文件；
+    请求结果只更新内存中的记录，每次运行结束时（log_run_summary）或调用flush时统一写入。
+    请求超时按源的历史耗时自适应；连续失败达到阈值后熔断，冷却期内直接跳过，
+    冷却期结束后放行一次试探请求，失败则冷却期翻倍。
+    """
+
+    def __init__(self, path: str, config: Dict[str, Any] = None):
+        config = config or {}
+        self.path = path
+        self.alpha = config.get('alpha', 0.3)
+        self.timeout_multiplier = config.get('timeout_multiplier', 4)
+        self.min_timeout = config.get('min_timeout', 5)
+        self.max_timeout = config.get('max_timeout', 30)
+        self.failure_threshold = config.get('failure_threshold', 3)
+        self.cooldown = config.get('cooldown', 600)
+        self.max_cooldown = config.get('max_cooldown', 86400)
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._records = self._load()
+        self._dirty = False
+        self._run = []
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"读取源健康记录失败: {str(e)}")
+            return {}
+
+    def flush(self) -> None:
+        """记录有变化时写入文件"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._save()
+            self._dirty = False
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._records, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def record(self, url: str) -> Dict[str, Any]:
+        """返回源的健康记录副本"""
+        with self._lock:
+            return dict(self._records.get(url, {}))
+
+    def timeout(self, url: str) -> float:
+        """源的请求超时：历史耗时EWMA的若干倍，限制在[min_timeout, max_timeout]内，没有历史时使用上限"""
+        latency = self.record(url).get('latency')
+        if latency is None:
+            return self.max_timeout
+        return min(max(latency * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+
+    def allow(self, source: Dict[str, Any]) -> bool:
+        """源是否可以请求：熔断的源在冷却期内跳过"""
+        record = self.record(source['url'])
+        open_until = record.get('open_until')
+        if open_until is None or time.time() >= open_until:
+            return True
+        self._add_run(source, 'skipped')
+        self.logger.info(
+            f"RSS源 {source['name']} 连续失败 {record.get('error_streak', 0)} 次，熔断中，"
+            f"{open_until - time.time():.0f} 秒后重新试探"
+        )
+        return False
+
+    def record_success(self, source: Dict[str, Any], latency: float, items: int,
+                       not_modified: bool = False) -> None:
+        """记录一次成功的请求"""
+        with self._lock:
+            record = self._records.setdefault(source['url'], {})
+            record['name'] = source['name']
+            record['latency'] = self._ewma(record.get('latency'), latency)
+            # 未更新的响应没有条目，不计入平均条目数
+            if not not_modified:
+                record['avg_items'] = self._ewma(record.get('avg_items'), items)
+            record['successes'] = record.get('successes', 0) + 1
+            record['error_streak'] = 0
+            record['open_until'] = None
+            record['last_success'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+            self._dirty = True
+        self._add_run(source, 'not_modified' if not_modified else 'ok', latency, items)
+
+    def record_failure(self, source: Dict[str, Any], error: str, latency: Optional[float] = None) -> None:
+        """记录一次失败的请求，连续失败达到阈值后熔断"""
+        with self._lock:
+            record = self._records.setdefault(source['url'], {})
+            record['name'] = source['name']
+            record['failures'] = record.get('failures', 0) + 1
+            record['error_streak'] = record.get('error_streak', 0) + 1
+            record['last_error'] = error
+            record['last_error_at'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+            excess = record['error_streak'] - self.failure_threshold
+            if excess >= 0:
+                # 每次试探失败冷却期翻倍
+                cooldown = min(self.cooldown * 2 ** excess, self.max_cooldown)
+                record['open_until'] = time.time() + cooldown
+                self.logger.warning(f"RSS源 {source['name']} 连续失败 {record['error_streak']} 次，熔断 {cooldown:.0f} 秒")
+            self._dirty = True
+        self._add_run(source, 'failed', latency, 0, error)
+
+    def _ewma(self, previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return round(value, 3)
+        return round(self.alpha * value + (1 - self.alpha) * previous, 3)
+
+    def start_run(self) -> None:
+        """开始一次运行，清空本次运行的请求记录"""
+        with self._lock:
+            self._run = []
+
+    def _add_run(self, source: Dict[str, Any], status: str, latency: Optional[float] = None,
+                 items: int = 0, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._run.append({
+                'name': source['name'],
+                'url': source['url'],
+                'status': status,
+                'latency': latency,
+                'items': items,
+                'error': error
+            })
+
+    def run_summary(self) -> Dict[str, Any]:
+        """本次运行的源健康汇总：各状态的源数量、最慢的源和失败、跳过的源"""
+        with self._lock:
+            run = list(self._run)
+        counts = {}
+        for entry in run:
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        timed = [entry for entry in run if entry['latency'] is not None]
+        return {
+            'counts': counts,
+            'total_latency': round(sum(entry['latency'] for entry in timed), 3),
+            'slowest': sorted(timed, key=lambda entry: entry['latency'], reverse=True)[:5],
+            'failed': [entry for entry in run if entry['status'] == 'failed'],
+            'skipped': [entry for entry in run if entry['status'] == 'skipped']
+        }
+
+    def log_run_summary(self) -> None:
+        """保存健康记录，并把本次运行的源健康汇总写入日志"""
+        self.flush()
+        summary = self.run_summary()
+        counts = summary['counts']
+        if not counts:
+            return
+        self.logger.info(
+            f"源健康汇总：成功 {counts.get('ok', 0)} 个，未更新 {counts.get('not_modified', 0)} 个，"
+            f"失败 {counts.get('failed', 0)} 个，熔断跳过 {counts.get('skipped', 0)} 个，"
+            f"请求总耗时 {summary['total_latency']:.1f} 秒"
+        )
+        if summary['slowest']:
+            slowest = '，'.join(f"{entry['name']} {entry['latency']:.1f}秒" for entry in summary['slowest'])
+            self.logger.info(f"最慢的源：{slowest}")
+        for entry in summary['failed']:
+            self.logger.warning(f"失败的源：{entry['name']}（{entry['error']}）")
+        if summary['skipped']:
+            self.logger.warning(f"熔断跳过的源：{'，'.join(entry['name'] for entry in summary['skipped'])}")
+
+    def records(self) -> List[Dict[str, Any]]:
+        """全部源的健康记录，按连续失败次数和耗时排序"""
+        with self._lock:
+            records = [dict(record, url=url) for url, record in self._records.items()]
+        return sorted(records, key=lambda record: (-record.get('error_streak', 0), -(record.get('latency') or 0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看谛听RSS源健康记录')
+    parser.add_argument('--path', default=os.path.join('data', 'source_health.json'), help='健康记录文件路径')
+    args = parser.parse_args()
+
+    health = SourceHealth(args.path)
+    now = time.time()
+    for record in health.records():
+        latency = f"{record['latency']:.2f}秒" if record.get('latency') is not None else '-'
+        avg_items = f"{record['avg_items']:.1f}" if record.get('avg_items') is not None else '-'
+        status = '熔断中' if record.get('open_until') and record['open_until'] > now else '正常'
+        print(f"[{status}] {record.get('name', '')} 耗时 {latency} 平均条目 {avg_items} "
+              f"连续失败 {record.get('error_streak', 0)} 上次成功 {record.get('last_success') or '-'}\n"
+              f"    {record['url']}")
+        if record.get('error_streak'):
+            print(f"    最近错误: {record.get('last_error')}")
+
+
+if __name__ == '__main__':
+    main()
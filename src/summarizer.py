@@ -3,11 +3,25 @@
 
 import logging
 import json
+import os
+import queue
+import re
+import threading
+import time
 import requests
 import sys
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Any, Iterator, Optional
 import markdown2  # 添加markdown转换库
 
+from .model_router import ModelRouter, ModelTier, ModelCallError
+from .ranker import SalienceRanker, estimate_tokens
+from .summary_backends import SummaryBackend, DashScopeBackend, ExtractiveBackend
+from .batch import BatchQueue, DashScopeBatchClient, LocalBatchClient
+from .log_utils import dump_payload
+from .token_budget import TokenLedger, BudgetController
+from .link_validator import LinkValidator, items_from_markdown
+
 # 检查Python版本
 PY_VERSION = sys.version_info
 USE_DASHSCOPE_SDK = PY_VERSION >= (3, 8)
@@ -25,12 +39,119 @@ if USE_DASHSCOPE_SDK:
 else:
     DASHSCOPE_IMPORT_ERROR = "Python版本不支持DashScope SDK"
 
+# 分类摘要未能生成时的占位文本，不作为摘要存档
+FAILED_SUMMARY = "摘要生成失败，请稍后重试。"
+DEFERRED_SUMMARY = "本分类摘要将稍后单独推送。"
+# 截止时间前未完成、改用抽取式摘要的分类末尾附加的说明
+DEGRADED_NOTE = "（本分类未能在送达时间前完成，以上为自动抽取的要点。）"
+
+# 提示词的固定前缀放在system消息中，所有分类共用，只随链接写法变化；
+# 分类名和新闻内容放在其后的user消息中，前缀可以命中服务端的上下文缓存
+SUMMARY_INSTRUCTIONS = """你是一个专业的新闻编辑，负责总结用户提供的某一类新闻的要点。
+
+要求：
+1. 用简洁的语言概括新闻的主要内容
+2. 突出重要信息和关键数据
+3. 保持客观中立的态度
+4. 按重要性排序
+5. 使用规范的Markdown格式
+6. 遵循以下格式规范：
+   - 使用二级标题(##)标记分类名
+   - 重要新闻使用无序列表(-)
+   - 关键数据或重要引用使用粗体(**)标记
+   - 每条新闻之间使用空行分隔
+   - {link_rule}
+
+请生成一个格式规范的摘要，示例格式如下：
+## 分类名
+
+- 第一条重要新闻概述，**关键数据**，核心信息，原始链接
+
+- 第二条新闻概述，包含**重要引用**或数据，原始链接
+
+[其他新闻概述...]"""
+
+DIGEST_INSTRUCTIONS = """你是一个专业的新闻编辑，负责把用户提供的某一类新闻在一段时间内的分段摘要整理为一份汇总摘要。
+
+要求：
+1. 合并不同日期中重复或持续报道的同一事件，说明事件的进展
+2. 按重要性排序，只保留最值得关注的内容
+3. 保持客观中立的态度
+4. 使用规范的Markdown格式，使用二级标题(##)标记分类名，每条新闻使用无序列表(-)
+5. {link_rule}"""
+
+class StreamStalledError(Exception):
+    """流式响应在规定时间内没有新的数据"""
+
+
 class Summarizer:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, config: Dict[str, Any] = None):
         self.api_key = api_key
+        self.config = config or {}
         self.logger = logging.getLogger(__name__)
         self.api_url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
         
+        # 流式输出：边生成边接收，长时间无数据视为卡住并重试
+        self.stream = self.config.get('stream', False)
+        self.stall_timeout = self.config.get('stall_timeout', 20)
+        self.stream_retries = self.config.get('stream_retries', 1)
+        
+        # 模型路由：按分类/提示词长度选择档位，支持对冲请求、降级和熔断
+        self.router = ModelRouter(self.config.get('routing', {}), self._default_tier())
+        
+        # 调用前的本地排序筛选，以及用短引用编号代替提示词中的长链接
+        selection_config = self.config.get('selection')
+        self.ranker = SalienceRanker(selection_config) if selection_config else None
+        self.shorten_links = self.config.get('shorten_links', False)
+        
+        # 摘要要求可以替换（如提示词基准测试中的候选写法），需包含{link_rule}占位符
+        self.instructions = self.config.get('instructions', SUMMARY_INSTRUCTIONS)
+        
+        # 生成后在本地校验链接，代替让模型自行复查
+        validation_config = self.config.get('link_validation', {})
+        self.link_validator = LinkValidator(validation_config) if validation_config.get('enabled', True) else None
+        
+        # 显式上下文缓存：把system消息中的固定前缀标记为可缓存
+        self.context_cache = self.config.get('context_cache', False)
+        
+        # 摘要后端：默认使用通义千问，失败时可退回本地抽取式摘要
+        self.backends = {}
+        self.register_backend(DashScopeBackend(self))
+        self.register_backend(ExtractiveBackend(self.config.get('extractive')))
+        self.backend_name = self.config.get('backend', 'dashscope')
+        self.fallback_backend = self.config.get('fallback_backend')
+        if self.backend_name not in self.backends:
+            raise ValueError(f"不支持的摘要后端: {self.backend_name}")
+        
+        # 可延后的分类走批处理接口，不占用早报的关键路径
+        batch_config = self.config.get('batch')
+        self.batch = BatchQueue(batch_config, self._batch_client(batch_config)) if batch_config else None
+        self.batch_wait = (batch_config or {}).get('wait', 0)
+        
+        # token用量台账和预算控制：预算紧张时逐级缩短内容、减少新闻数、改用低价档位或抽取式摘要
+        usage_config = self.config.get('usage')
+        self.ledger = TokenLedger(usage_config.get('path', os.path.join('data', 'usage.db'))) if usage_config else None
+        budget_config = (usage_config or {}).get('budget')
+        self.budget = BudgetController(self.ledger, budget_config) if budget_config else None
+        if self.budget and self.budget.cheap_tier and self.budget.cheap_tier not in self.router.tiers:
+            raise ValueError(f"预算配置引用了不存在的档位: {self.budget.cheap_tier}")
+        
+        # 分类摘要缓存，键为(分类, 新闻集合)，多profile之间复用
+        self._summary_cache = {}
+        # 已提交批处理、尚未收取的分类：键同上 -> (任务编号, custom_id)，其他profile命中时登记为接收方
+        self._batch_pending = {}
+        # 截止时间模式下正在后台生成的分类：键同上 -> future，相同分类和新闻集合只调用一次模型；
+        # 每次clear_cache后_generation加一，上一次运行的生成结果不再写入缓存
+        self.generation_workers = self.config.get('deadline_workers', 4)
+        self._generation_executor = None
+        self._inflight = {}
+        self._generation = 0
+        self._inflight_lock = threading.Lock()
+        # 最近一次generate_summary生成的分类摘要：分类 -> (Markdown摘要, 新闻列表)，供存档使用
+        self.last_summaries = {}
+        # 最近一次generate_summary中因截止时间降级的分类：分类 -> extractive或failed
+        self.last_degraded = {}
+        
         # 记录使用的API方式
         if USE_DASHSCOPE_SDK:
             self.logger.info("使用DashScope SDK进行API调用")
@@ -40,8 +161,18 @@ class Summarizer:
             else:
                 self.logger.info(f"Python版本 {sys.version.split()[0]} 不支持DashScope SDK，将使用HTTP API")
         
-    def generate_summary(self, news_items: List[Dict[str, Any]]) -> str:
-        """生成新闻摘要"""
+    def generate_summary(self, news_items: List[Dict[str, Any]], deadline: Optional[float] = None,
+                         profile: str = '') -> str:
+        """生成新闻摘要
+        
+        Args:
+            news_items: 新闻列表
+            deadline: 截止时间（时间戳），剩余时间按新闻条数分给各分类，到时未完成的分类改用抽取式摘要；
+                为None时不限制
+            profile: profile名称，延后分类的补充摘要发送给该profile
+        """
+        self.last_summaries = {}
+        self.last_degraded = {}
         try:
             if not news_items:
                 self.logger.warning("没有需要处理的新闻")
@@ -59,22 +190,45 @@ class Summarizer:
             
             self.logger.info(f"新闻分类统计: {', '.join([f'{k}({len(v)}条)' for k, v in news_by_category.items()])}")
             
-            # 生成每个分类的摘要
-            summaries = []
+            # 生成每个分类的摘要，每完成一个分类就转换为HTML
+            html_sections = []
+            deferred = []
+            # 尚未生成（未命中缓存）的分类的新闻条数，用于分配截止时间前的剩余时间
+            remaining_items = sum(
+                len(items) for category, items in news_by_category.items()
+                if not (self.batch and self.batch.is_deferred(category))
+                and self._cache_key(category, items) not in self._summary_cache
+            )
             for category, items in news_by_category.items():
+                if self.batch and self.batch.is_deferred(category):
+                    deferred.append((category, items))
+                    continue
                 self.logger.info(f"开始生成 {category} 类新闻摘要，共 {len(items)} 条新闻")
-                category_summary = self._generate_category_summary(category, items)
+                category_deadline = deadline
+                if deadline is not None and self._cache_key(category, items) not in self._summary_cache:
+                    # 按新闻条数分配剩余时间，一个分类过慢不会占用其他分类的时间；先完成的分类剩下的时间留给后面的分类
+                    category_deadline = time.time() + max(0.0, deadline - time.time()) * len(items) / remaining_items
+                    remaining_items -= len(items)
+                category_summary = self._get_category_summary(category, items, category_deadline)
                 if category_summary:  # 只添加非空摘要
-                    summaries.append(category_summary)
+                    html_sections.append(self._convert_to_html(category_summary))
+                
+            # 可延后的分类在其他分类完成后统一提交批处理
+            if deferred:
+                html_sections.extend(self._defer_categories(deferred, deadline, profile))
+                
+            for category, items in news_by_category.items():
+                if category in self.last_degraded:
+                    continue
+                category_summary = self._summary_cache.get(self._cache_key(category, items))
+                if category_summary and not category_summary.endswith((FAILED_SUMMARY, DEFERRED_SUMMARY)):
+                    self.last_summaries[category] = (category_summary, items)
                 
             # 组合所有摘要
-            if not summaries:
+            if not html_sections:
                 return "无法生成摘要，请查看日志了解详细信息。"
             
-            final_summary = "\n\n".join(summaries)
-            
-            # 将Markdown转换为HTML
-            html_summary = self._convert_to_html(final_summary)
+            html_summary = "\n".join(html_sections)
             self.logger.info(f"摘要生成完成并转换为HTML，总长度: {len(html_summary)} 字符")
             
             return html_summary
@@ -83,6 +237,271 @@ class Summarizer:
             self.logger.error(f"生成摘要时发生错误: {str(e)}")
             return "摘要生成失败，请查看日志了解详细信息。"
 
+    def summarize_digest(self, category: str, label: str, parts: List[Any]) -> str:
+        """把一个区间内的多份分类摘要再总结为一份汇总摘要，失败时抛出异常
+        
+        Args:
+            category: 新闻分类
+            label: 区间描述，如"2024-01-01 至 2024-01-07"
+            parts: (日期或区间, Markdown摘要)列表
+        """
+        refs = {} if self.shorten_links else None
+        prompt = self._prepare_digest_prompt(category, label, parts, refs)
+        messages = self._build_messages(prompt, self._digest_prefix(refs is not None))
+        self.logger.info(f"准备调用通义千问API生成 {category} 类 {label} 汇总摘要")
+        summary = self.router.call(
+            category,
+            len(prompt),
+            lambda tier: self._invoke_model(category, messages, tier),
+            self._budget_tier(category, prompt)
+        )
+        summary = self._expand_references(summary, refs) if refs else summary
+        if self.link_validator:
+            # 汇总摘要只能引用分段摘要中出现过的链接
+            summary, _ = self.link_validator.validate(category, summary, items_from_markdown(
+                [part_summary for _, part_summary in parts]))
+        return summary
+        
+    def sections_to_html(self, sections: List[str]) -> str:
+        """把多个分类的Markdown摘要转换为HTML并拼接"""
+        return "\n".join(self._convert_to_html(section) for section in sections)
+        
+    def clear_cache(self) -> None:
+        """清空分类摘要缓存"""
+        with self._inflight_lock:
+            self._generation += 1
+            self._inflight.clear()
+            self._summary_cache.clear()
+        self._batch_pending.clear()
+        
+    def start_run(self) -> None:
+        """开始新的一次运行：清空摘要缓存，token用量归入新的运行"""
+        self.clear_cache()
+        if self.budget:
+            self.budget.start_run()
+        elif self.ledger:
+            self.ledger.start_run()
+            
+    def log_run_usage(self) -> None:
+        """把本次运行的token用量写入日志"""
+        if not self.ledger:
+            return
+        try:
+            total = self.ledger.totals(run_id=self.ledger.run_id)[0]
+            if not total['calls']:
+                return
+            by_category = self.ledger.totals(run_id=self.ledger.run_id, group_by='category')
+            details = '，'.join(
+                f"{row['category']} {row['input_tokens']}+{row['output_tokens']}" for row in by_category
+            )
+            self.logger.info(
+                f"本次运行调用大模型 {total['calls']} 次，输入 {total['input_tokens']} tokens"
+                f"（缓存命中 {total['cached_tokens']}），输出 {total['output_tokens']} tokens（{details}）"
+            )
+        except Exception as e:
+            self.logger.error(f"统计token用量失败: {str(e)}")
+            
+    def collect_deferred(self):
+        """收取之前提交的批处理任务中已完成的摘要
+        
+        Returns:
+            (profile名称 -> HTML摘要, 任务编号列表)，单profile模式的名称为空字符串，
+            没有已完成的任务时为空字典；摘要送达后需调用ack_deferred
+        """
+        if not self.batch:
+            return {}, []
+        results = self.batch.poll()
+        by_profile = {}
+        for result in results:
+            if result['summary'] is None:
+                summary = self._missing_batch_summary(result)
+                if summary is None:
+                    continue
+            else:
+                summary = self._batch_summary(result)
+            html = self._convert_to_html(summary)
+            for profile in result.get('profiles') or ['']:
+                by_profile.setdefault(profile, []).append(html)
+        return {profile: "\n".join(sections) for profile, sections in by_profile.items()}, \
+            sorted(set(result['job_id'] for result in results))
+        
+    def close(self) -> None:
+        """释放模型路由和后台生成摘要的线程"""
+        self.router.close()
+        if self._generation_executor:
+            self._generation_executor.shutdown(wait=False)
+        
+    def ack_deferred(self, job_ids: List[str]) -> None:
+        """标记批处理摘要已送达"""
+        if self.batch and job_ids:
+            self.batch.mark_collected(job_ids)
+            
+    def _batch_client(self, batch_config: Dict[str, Any]):
+        """创建批处理客户端，local为本地替身，逐条同步调用模型"""
+        if not batch_config:
+            return None
+        if batch_config.get('client') == 'local':
+            return LocalBatchClient(self._complete_batch_request)
+        return DashScopeBatchClient(self.api_key, batch_config)
+        
+    def _complete_batch_request(self, body: Dict[str, Any]) -> str:
+        """本地批处理替身的请求处理函数"""
+        messages = body['messages']
+        return self.router.call(
+            'batch',
+            sum(len(message['content']) for message in messages),
+            lambda tier: self._invoke_model('batch', messages, tier)
+        )
+        
+    def _defer_categories(self, deferred: List[Any], deadline: Optional[float] = None,
+                          profile: str = '') -> List[str]:
+        """把可延后的分类提交批处理，返回本次报告中这些分类的HTML
+        
+        在wait秒内（不超过截止时间）完成的结果直接合并进报告，任务已结束但缺少结果的分类同步生成；
+        未完成的分类留一条说明，结果之后由collect_deferred收取，作为补充摘要发送给profile。
+        """
+        sections = {}
+        submitted = {}
+        for category, items in deferred:
+            cache_key = self._cache_key(category, items)
+            if cache_key in self._summary_cache:
+                sections[category] = self._summary_cache[cache_key]
+                if cache_key in self._batch_pending:
+                    self.batch.add_profile(*self._batch_pending[cache_key], profile)
+                continue
+            original_items = items
+            if self.ranker:
+                items = self.ranker.select(category, items)
+            refs = {} if self.shorten_links else None
+            prompt = self._prepare_prompt(category, items, refs)
+            # 批处理请求不使用显式缓存
+            messages = self._build_messages(prompt, self._summary_prefix(refs is not None), cache=False)
+            custom_id = self.batch.add(category, messages, refs, profile, items)
+            submitted[custom_id] = (category, cache_key, original_items)
+            
+        if submitted:
+            job_id = self.batch.flush()
+            if job_id is None:
+                # 提交失败时同步生成，保证报告完整
+                self.logger.warning("批处理提交失败，可延后的分类改为同步生成")
+                return [self._convert_to_html(self._get_category_summary(category, items, deadline))
+                        for category, items in deferred]
+                
+            wait = self.batch_wait
+            if deadline is not None:
+                wait = max(0, min(wait, deadline - time.time()))
+            results = self.batch.wait(job_id, wait) if wait else []
+            for result in results:
+                if result['summary'] is None:
+                    continue
+                category, cache_key, _ = submitted.pop(result['custom_id'])
+                sections[category] = self._summary_cache[cache_key] = self._batch_summary(result)
+            if submitted and (results or not self.batch.pending(job_id)):
+                # 有结果说明任务已结束，仍缺少结果的分类不会再有补充摘要，改为同步生成
+                for category, cache_key, items in submitted.values():
+                    self.logger.warning(f"{category} 类批处理没有返回结果，改为同步生成")
+                    sections[category] = self._get_category_summary(category, items, deadline)
+                submitted = {}
+            if results and not submitted:
+                self.batch.mark_collected([job_id])
+            for custom_id, (category, cache_key, _) in submitted.items():
+                self.logger.info(f"{category} 类摘要已提交批处理，稍后单独推送")
+                sections[category] = self._summary_cache[cache_key] = f"## {category}\n\n{DEFERRED_SUMMARY}"
+                self._batch_pending[cache_key] = (job_id, custom_id)
+                
+        return [self._convert_to_html(sections[category]) for category, _ in deferred]
+        
+    def _batch_summary(self, result: Dict[str, Any]) -> str:
+        """批处理结果还原引用编号，并按提交时保存的新闻校验链接"""
+        refs = result.get('refs')
+        summary = self._expand_references(result['summary'], refs) if refs else result['summary']
+        # 旧版本提交的任务没有保存新闻，无法校验
+        if self.link_validator and result.get('items'):
+            summary, _ = self.link_validator.validate(result['category'], summary, result['items'])
+        return summary
+        
+    def _missing_batch_summary(self, result: Dict[str, Any]) -> Optional[str]:
+        """批处理没有返回结果的分类按提交时保存的新闻同步生成；旧版本提交的任务没有保存新闻，返回None"""
+        category = result['category']
+        if not result.get('items'):
+            self.logger.error(f"{category} 类批处理没有返回结果，且任务中没有保存新闻，无法补发")
+            return None
+        self.logger.warning(f"{category} 类批处理没有返回结果，改为同步生成")
+        return self._generate_category_summary(category, result['items'])
+        
+    def _cache_key(self, category: str, items: List[Dict[str, Any]]):
+        return (category, tuple(sorted(
+            (item.get('link', ''), item.get('title', '')) for item in items if item
+        )))
+        
+    def _get_category_summary(self, category: str, items: List[Dict[str, Any]],
+                              deadline: Optional[float] = None) -> str:
+        """获取分类摘要，相同分类和新闻集合只生成一次
+        
+        给出deadline时，到时未完成的分类改用抽取式摘要；未完成的生成在后台继续，
+        完成后写入缓存。之后的profile遇到同一分类和新闻集合时等待同一次生成，不再重复调用模型。
+        """
+        cache_key = self._cache_key(category, items)
+        if cache_key in self._summary_cache:
+            self.logger.info(f"{category} 类摘要命中缓存，跳过生成")
+            return self._summary_cache[cache_key]
+            
+        if deadline is None and cache_key not in self._inflight:
+            category_summary = self._generate_category_summary(category, items)
+            self._summary_cache[cache_key] = category_summary
+            return category_summary
+            
+        future = self._submit_generation(category, items, cache_key)
+        try:
+            category_summary = future.result(timeout=None if deadline is None else max(0.0, deadline - time.time()))
+        except FutureTimeoutError:
+            return self._degraded_summary(category, items)
+        except Exception as e:
+            self.logger.error(f"{category} 类摘要生成失败: {str(e)}")
+            return self._degraded_summary(category, items)
+        self._summary_cache[cache_key] = category_summary
+        return category_summary
+        
+    def _submit_generation(self, category: str, items: List[Dict[str, Any]], cache_key) -> Any:
+        """在后台生成分类摘要，相同分类和新闻集合正在生成时返回同一个future"""
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            if future is not None:
+                self.logger.info(f"{category} 类摘要正在生成，等待同一次调用的结果")
+                return future
+            if self._generation_executor is None:
+                self._generation_executor = ThreadPoolExecutor(max_workers=self.generation_workers)
+            generation = self._generation
+            future = self._generation_executor.submit(self._generate_category_summary, category, items)
+            self._inflight[cache_key] = future
+        future.add_done_callback(lambda done: self._generation_done(category, cache_key, generation, done))
+        return future
+        
+    def _generation_done(self, category: str, cache_key, generation: int, future) -> None:
+        """后台生成结束：仍是同一次运行且生成成功时写入缓存"""
+        error = future.exception()
+        with self._inflight_lock:
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+            if generation != self._generation:
+                return
+            if error is None:
+                self._summary_cache.setdefault(cache_key, future.result())
+        if error is not None:
+            self.logger.error(f"{category} 类摘要后台生成失败: {str(error)}")
+        
+    def _degraded_summary(self, category: str, items: List[Dict[str, Any]]) -> str:
+        """截止时间前未完成的分类使用抽取式摘要，并在末尾注明"""
+        self.logger.warning(f"{category} 类摘要未能在截止时间前完成，改用抽取式摘要")
+        try:
+            summary = self.backends['extractive'].summarize(category, items)
+        except Exception as e:
+            self.logger.error(f"{category} 类抽取式摘要生成失败: {str(e)}")
+            self.last_degraded[category] = 'failed'
+            return f"## {category}\n\n{FAILED_SUMMARY}"
+        self.last_degraded[category] = 'extractive'
+        return f"{summary}\n\n{DEGRADED_NOTE}"
+        
     def _convert_to_html(self, markdown_text: str) -> str:
         """将Markdown文本转换为HTML"""
         try:
@@ -97,72 +516,187 @@ class Summarizer:
             self.logger.error(f"Markdown转HTML失败: {str(e)}")
             return markdown_text
             
+    def register_backend(self, backend: SummaryBackend) -> None:
+        """注册摘要后端，可通过summarizer.backend或fallback_backend选用"""
+        self.backends[backend.name] = backend
+        
     def _generate_category_summary(self, category: str, items: List[Dict[str, Any]]) -> str:
         """生成单个分类的新闻摘要"""
         try:
-            # 准备提示词
-            prompt = self._prepare_prompt(category, items)
-            messages = [
-                {'role': 'system', 'content': 'You are a helpful assistant.'},
-                {'role': 'user', 'content': prompt}
-            ]
-            
-            self.logger.info(f"准备调用通义千问API生成 {category} 类摘要")
-            self.logger.info(f"dump prompt {prompt}")
-
-            if USE_DASHSCOPE_SDK:
-                return self._generate_using_sdk(category, messages)
-            else:
-                return self._generate_using_http(category, messages)
+            plan = self._budget_plan(category, items)
+            
+            # 按显著性筛选，只把最值得总结的新闻交给摘要后端；预算紧张时按比例减少条数
+            top_k = None
+            if plan and plan['top_k_factor']:
+                top_k = max(1, int((self.ranker.top_k if self.ranker else len(items)) * plan['top_k_factor']))
+            if self.ranker:
+                items = self.ranker.select(category, items, top_k)
+            elif top_k:
+                items = [item for item in items if item][:top_k]
+                
+            if plan and plan['max_content_chars']:
+                # 截断的是副本，原始新闻仍完整存档
+                limit = plan['max_content_chars']
+                items = [dict(item, content=(item.get('content') or '')[:limit]) for item in items if item]
+                
+            backend_name = (plan and plan['backend']) or self.backend_name
+            summary = self.backends[backend_name].summarize(category, items)
+            if self.link_validator:
+                summary, _ = self.link_validator.validate(category, summary, items)
+            return summary
                 
         except Exception as e:
             self.logger.error(f"生成分类摘要时出错: {str(e)}")
-            return f"## {category}\n\n摘要生成失败，请稍后重试。"
+            
+            # 主后端失败时使用备用后端，保证报告仍有内容
+            fallback = self.backends.get(self.fallback_backend)
+            if fallback is not None and fallback.name != self.backend_name:
+                try:
+                    self.logger.info(f"{category} 类改用 {fallback.name} 后端生成摘要")
+                    return fallback.summarize(category, items)
+                except Exception as fallback_error:
+                    self.logger.error(f"备用后端生成摘要时出错: {str(fallback_error)}")
+            return f"## {category}\n\n{FAILED_SUMMARY}"
+            
+    def _generate_with_llm(self, category: str, items: List[Dict[str, Any]]) -> str:
+        """调用通义千问生成摘要，失败时抛出异常"""
+        # 准备提示词
+        refs = {} if self.shorten_links else None
+        prompt = self._prepare_prompt(category, items, refs)
+        messages = self._build_messages(prompt, self._summary_prefix(refs is not None))
+        
+        self.logger.info(f"准备调用通义千问API生成 {category} 类摘要")
+        dump_payload(self.logger, f"{category} 类提示词", prompt, key=category)
+
+        # 由路由层选择档位，失败时降级到后续档位
+        summary = self.router.call(
+            category,
+            len(prompt),
+            lambda tier: self._invoke_model(category, messages, tier),
+            self._budget_tier(category, prompt)
+        )
+        return self._expand_references(summary, refs) if refs else summary
+        
+    def _budget_plan(self, category: str, items: List[Dict[str, Any]]):
+        """按分类新闻的估算用量取得预算降级方案，未配置预算时返回None"""
+        if not self.budget:
+            return None
+        estimated = sum(estimate_tokens(f"{item.get('title', '')}{item.get('content', '')}") for item in items if item)
+        if self.ranker:
+            estimated = min(estimated, self.ranker.token_budget)
+        return self.budget.plan(category, estimated)
+        
+    def _budget_tier(self, category: str, prompt: str):
+        """预算紧张时改用的低价档位，不需要时返回None"""
+        if not self.budget:
+            return None
+        tier = self.budget.tier(estimate_tokens(prompt))
+        if tier:
+            self.logger.info(f"{category} 类因token预算改用档位 {tier}")
+        return tier
+        
+    def _record_usage(self, category: str, tier: ModelTier, usage: Any,
+                      messages: List[Dict[str, str]], output: str) -> None:
+        """记录一次调用的token用量，接口未返回usage时按文本长度估算"""
+        if not self.ledger:
+            return
+        input_tokens, output_tokens, cached_tokens, estimated = self._usage_tokens(usage, messages, output)
+        try:
+            # 先累计内存计数，再写台账，避免首次读取当天用量时重复计入
+            if self.budget:
+                self.budget.add(input_tokens + output_tokens)
+            self.ledger.record(category, tier.model, input_tokens, output_tokens, estimated, cached_tokens)
+        except Exception as e:
+            self.logger.error(f"记录token用量失败: {str(e)}")
+        
+    def _usage_tokens(self, usage: Any, messages: List[Dict[str, Any]], output: str):
+        """从接口返回的usage中取得(输入, 输出, 缓存命中, 是否估算)，没有usage时按文本长度估算"""
+        if isinstance(usage, dict) and usage.get('input_tokens') is not None:
+            cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+            return usage['input_tokens'], usage.get('output_tokens') or 0, cached_tokens, False
+        input_tokens = sum(estimate_tokens(self._message_text(message)) for message in messages)
+        return input_tokens, estimate_tokens(output), 0, True
+        
+    def _build_messages(self, prompt: str, prefix: str = None, cache: bool = True) -> List[Dict[str, Any]]:
+        """固定前缀作为system消息，可变内容作为user消息"""
+        system = prefix or 'You are a helpful assistant.'
+        if cache and self.context_cache:
+            system = [{'type': 'text', 'text': system, 'cache_control': {'type': 'ephemeral'}}]
+        return [
+            {'role': 'system', 'content': system},
+            {'role': 'user', 'content': prompt}
+        ]
+        
+    def _message_text(self, message: Dict[str, Any]) -> str:
+        content = message['content']
+        if isinstance(content, list):
+            return ''.join(part.get('text', '') for part in content)
+        return content
+        
+    def _default_tier(self) -> Dict[str, Any]:
+        """未配置路由时使用的档位，与SDK/HTTP两种调用方式原有的模型保持一致"""
+        if USE_DASHSCOPE_SDK:
+            return {'name': 'default', 'model': 'qwen-turbo-2025-04-28', 'max_tokens': 3000}
+        return {'name': 'default', 'model': 'qwen-turbo', 'max_tokens': 1500}
+        
+    def _invoke_model(self, category: str, messages: List[Dict[str, str]], tier: ModelTier) -> str:
+        """使用指定档位调用模型，失败时抛出ModelCallError"""
+        if USE_DASHSCOPE_SDK:
+            return self._generate_using_sdk(category, messages, tier)
+        else:
+            return self._generate_using_http(category, messages, tier)
     
-    def _generate_using_sdk(self, category: str, messages: List[Dict[str, str]]) -> str:
+    def _generate_using_sdk(self, category: str, messages: List[Dict[str, str]], tier: ModelTier) -> str:
         """使用SDK生成摘要"""
+        if self.stream:
+            return self._with_stream_retries(category, self._stream_using_sdk, messages, tier)
         try:
             response = Generation.call(
-                model='qwen-turbo-2025-04-28',
+                model=tier.model,
                 messages=messages,
                 api_key=self.api_key,
                 result_format='message',
-                max_tokens=3000,
-                temperature=0.7,
-                top_p=0.8,
+                max_tokens=tier.max_tokens,
+                temperature=tier.temperature,
+                top_p=tier.top_p,
+                request_timeout=tier.timeout,
             )
-            
-            if response.status_code == 200:
-                summary = response.output.choices[0].message.content
-                self.logger.info(f"{category} 类摘要生成成功，响应内容: {summary}")
-                return summary
-            else:
-                self.logger.error(f"API调用失败: {response.code} - {response.message}")
-                return f"## {category}\n\n摘要生成失败，请稍后重试。"
         except Exception as e:
             self.logger.error(f"SDK调用出错: {str(e)}")
-            return f"## {category}\n\n摘要生成失败，SDK调用异常。"
+            raise ModelCallError(f"SDK调用异常: {str(e)}")
+            
+        if response.status_code == 200:
+            summary = response.output.choices[0].message.content
+            self._record_usage(category, tier, getattr(response, 'usage', None), messages, summary)
+            self.logger.info(f"{category} 类摘要生成成功，长度: {len(summary)} 字符")
+            dump_payload(self.logger, f"{category} 类模型响应", summary, key=category)
+            return summary
+        else:
+            self.logger.error(f"API调用失败: {response.code} - {response.message}")
+            raise ModelCallError(f"API调用失败: {response.code}")
     
-    def _generate_using_http(self, category: str, messages: List[Dict[str, str]]) -> str:
+    def _generate_using_http(self, category: str, messages: List[Dict[str, str]], tier: ModelTier) -> str:
         """使用HTTP API生成摘要"""
+        if self.stream:
+            return self._with_stream_retries(category, self._stream_using_http, messages, tier)
         try:
             # 准备请求头
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json",
-                "X-DashScope-Algorithm": "qwen-turbo"
+                "X-DashScope-Algorithm": tier.model
             }
             
             # 准备请求体
             data = {
-                "model": "qwen-turbo",
+                "model": tier.model,
                 "input": {
                     "messages": messages
                 },
                 "parameters": {
-                    "max_tokens": 1500,
-                    "temperature": 0.7,
-                    "top_p": 0.8,
+                    "max_tokens": tier.max_tokens,
+                    "temperature": tier.temperature,
+                    "top_p": tier.top_p,
                     "result_format": "message"
                 }
             }
@@ -172,30 +706,244 @@ class Summarizer:
                 self.api_url,
                 headers=headers,
                 json=data,
-                timeout=90
+                timeout=tier.timeout
             )
             
-            # 处理响应
-            if response.status_code == 200:
-                result = response.json()
-                if "output" in result and "choices" in result["output"]:
-                    summary = result["output"]["choices"][0]["message"]["content"]
-                    self.logger.info(f"{category} 类摘要生成成功，长度: {len(summary)} 字符")
-                    self.logger.info(f"dump summary: {summary}")
-                    return summary
-                else:
-                    self.logger.error(f"API响应格式异常: {result}")
-                    return f"## {category}\n\n摘要生成失败，API响应格式异常。"
-            else:
-                self.logger.error(f"API调用失败: {response.status_code} - {response.text}")
-                return f"## {category}\n\n摘要生成失败，请稍后重试。"
-                
         except requests.exceptions.RequestException as e:
             self.logger.error(f"HTTP请求异常: {str(e)}")
-            return f"## {category}\n\n摘要生成失败，HTTP请求异常。"
+            raise ModelCallError(f"HTTP请求异常: {str(e)}")
+            
+        # 处理响应
+        if response.status_code == 200:
+            result = response.json()
+            if "output" in result and "choices" in result["output"]:
+                summary = result["output"]["choices"][0]["message"]["content"]
+                self._record_usage(category, tier, result.get("usage"), messages, summary)
+                self.logger.info(f"{category} 类摘要生成成功，长度: {len(summary)} 字符")
+                dump_payload(self.logger, f"{category} 类模型响应", summary, key=category)
+                return summary
+            else:
+                self.logger.error(f"API响应格式异常: {result}")
+                raise ModelCallError("API响应格式异常")
+        else:
+            self.logger.error(f"API调用失败: {response.status_code} - {response.text}")
+            raise ModelCallError(f"API调用失败: {response.status_code}")
+            
+    def _with_stream_retries(self, category: str, stream_func, messages: List[Dict[str, str]], tier: ModelTier) -> str:
+        """执行流式生成，卡住或出错时重试"""
+        for attempt in range(self.stream_retries + 1):
+            try:
+                summary = stream_func(category, messages, tier)
+                self.logger.info(f"{category} 类摘要流式生成成功，长度: {len(summary)} 字符")
+                dump_payload(self.logger, f"{category} 类模型响应", summary, key=category)
+                return summary
+            except StreamStalledError:
+                self.logger.warning(f"{category} 类摘要流式响应超过 {self.stall_timeout} 秒无数据，第 {attempt + 1} 次尝试失败")
+            except Exception as e:
+                self.logger.error(f"{category} 类摘要流式生成出错: {str(e)}")
+        raise ModelCallError(f"{category} 类摘要流式生成失败")
+        
+    def _iter_with_stall_timeout(self, iterator: Iterator[Any], timeout: Optional[float] = None,
+                                 close=None) -> Iterator[Any]:
+        """逐个返回迭代器的元素，超过stall_timeout秒没有新元素时抛出StreamStalledError
+        
+        timeout为整个流的总时长上限，超过时抛出TimeoutError。卡住或超时后关闭底层的流：
+        close为关闭底层连接的函数，未提供时关闭迭代器本身；读取线程收到下一个元素后也会停止读取。
+        """
+        chunks = queue.Queue()
+        done = object()
+        stop = threading.Event()
+        deadline = time.monotonic() + timeout if timeout else None
+        
+        def pump():
+            try:
+                for chunk in iterator:
+                    if stop.is_set():
+                        break
+                    chunks.put(chunk)
+                chunks.put(done)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                self._close_stream(iterator)
+                
+        def abort(error):
+            stop.set()
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    self.logger.debug(f"关闭流式响应出错: {str(e)}")
+            else:
+                self._close_stream(iterator)
+            return error
+                
+        threading.Thread(target=pump, daemon=True).start()
+        while True:
+            wait_time = self.stall_timeout
+            if deadline is not None:
+                wait_time = min(wait_time, max(deadline - time.monotonic(), 0))
+            try:
+                chunk = chunks.get(timeout=wait_time)
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise abort(TimeoutError(f"流式响应超过 {timeout} 秒未完成"))
+                raise abort(StreamStalledError())
+            if chunk is done:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+            
+    def _close_stream(self, iterator: Iterator[Any]) -> None:
+        """关闭生成器，释放其持有的连接；生成器正在另一个线程中执行时由读取线程在结束后关闭"""
+        close = getattr(iterator, 'close', None)
+        if close is None:
+            return
+        try:
+            close()
+        except ValueError:
+            pass
+        except Exception as e:
+            self.logger.debug(f"关闭流式响应出错: {str(e)}")
             
-    def _prepare_prompt(self, category: str, items: List[Dict[str, Any]]) -> str:
-        """准备提示词"""
+    def _stream_using_sdk(self, category: str, messages: List[Dict[str, str]], tier: ModelTier) -> str:
+        """使用SDK流式生成摘要，incremental_output下每个分片只包含新增内容"""
+        responses = Generation.call(
+            model=tier.model,
+            messages=messages,
+            api_key=self.api_key,
+            result_format='message',
+            max_tokens=tier.max_tokens,
+            temperature=tier.temperature,
+            top_p=tier.top_p,
+            stream=True,
+            incremental_output=True,
+        )
+        
+        parts = []
+        usage = None
+        for response in self._iter_with_stall_timeout(responses, tier.timeout):
+            if response.status_code != 200:
+                raise RuntimeError(f"API调用失败: {response.code} - {response.message}")
+            parts.append(response.output.choices[0].message.content or '')
+            # 每个分片的usage是截至当前的累计值
+            usage = getattr(response, 'usage', None) or usage
+        summary = ''.join(parts)
+        self._record_usage(category, tier, usage, messages, summary)
+        return summary
+        
+    def _stream_using_http(self, category: str, messages: List[Dict[str, str]], tier: ModelTier) -> str:
+        """使用HTTP SSE流式生成摘要"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "X-DashScope-Algorithm": tier.model,
+            "X-DashScope-SSE": "enable"
+        }
+        data = {
+            "model": tier.model,
+            "input": {
+                "messages": messages
+            },
+            "parameters": {
+                "max_tokens": tier.max_tokens,
+                "temperature": tier.temperature,
+                "top_p": tier.top_p,
+                "result_format": "message",
+                "incremental_output": True
+            }
+        }
+        
+        # 读超时作用于每次读取，相当于流的卡顿检测；整个流的时长由tier.timeout限制
+        try:
+            response = requests.post(
+                self.api_url,
+                headers=headers,
+                json=data,
+                stream=True,
+                timeout=(10, self.stall_timeout)
+            )
+        except requests.exceptions.ReadTimeout:
+            raise StreamStalledError()
+            
+        with response:
+            if response.status_code != 200:
+                raise RuntimeError(f"API调用失败: {response.status_code} - {response.text}")
+                
+            parts = []
+            usage = None
+            try:
+                lines = response.iter_lines(decode_unicode=True)
+                for line in self._iter_with_stall_timeout(lines, tier.timeout, close=response.close):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    result = json.loads(line[len('data:'):])
+                    usage = result.get("usage") or usage
+                    if "output" in result and "choices" in result["output"]:
+                        parts.append(result["output"]["choices"][0]["message"].get("content", ''))
+                    elif "code" in result:
+                        raise RuntimeError(f"API调用失败: {result.get('code')} - {result.get('message')}")
+            except requests.exceptions.ConnectionError as e:
+                # 流式读取过程中的读超时会以ConnectionError的形式抛出
+                if 'timed out' in str(e):
+                    raise StreamStalledError()
+                raise
+            summary = ''.join(parts)
+            self._record_usage(category, tier, usage, messages, summary)
+            return summary
+            
+    def _expand_references(self, summary: str, refs: Dict[str, str]) -> str:
+        """将摘要中的[R1]等引用编号还原为原始链接"""
+        def replace(match):
+            url = refs.get(match.group(1))
+            return f"[链接]({url})" if url else match.group(0)
+        # 兼容模型输出的 [R1]、[R1](R1) 和 【R1】 几种写法
+        return re.sub(r'[\[【](R\d+)[\]】](?:\(R\d+\))?', replace, summary)
+        
+    def _prepare_digest_prompt(self, category: str, label: str, parts: List[Any],
+                               refs: Dict[str, str] = None) -> str:
+        """准备汇总摘要提示词的可变部分，refs非空时把摘要中的链接替换为引用编号"""
+        def shorten(match):
+            ref_id = f"R{len(refs) + 1}"
+            refs[ref_id] = match.group(1)
+            return f"[{ref_id}]"
+            
+        texts = []
+        for part_label, summary in parts:
+            if refs is not None:
+                summary = re.sub(r'\[链接\]\((\S+?)\)', shorten, summary)
+            texts.append(f"【{part_label}】\n{summary}")
+            
+        separator = "="*50
+        return f"""请把以下{label}期间{category}类新闻的分段摘要整理为一份汇总摘要。
+
+以下是分段摘要：
+
+{separator}
+{chr(10).join(texts)}
+{separator}"""
+        
+    def _describe_video(self, meta: Dict[str, Any]) -> str:
+        """视频元数据的简短描述"""
+        parts = []
+        if meta.get('duration'):
+            minutes, seconds = divmod(int(meta['duration']), 60)
+            parts.append(f"时长{minutes}分{seconds}秒" if minutes else f"时长{seconds}秒")
+        if meta.get('width') and meta.get('height'):
+            parts.append(f"分辨率{meta['width']}x{meta['height']}")
+        if meta.get('frames'):
+            parts.append(f"已抽取{len(meta['frames'])}张关键帧")
+        return '，'.join(parts) or '元数据未知'
+        
+    def _prepare_prompt(self, category: str, items: List[Dict[str, Any]], refs: Dict[str, str] = None) -> str:
+        """准备提示词的可变部分，固定的要求和格式规范见_summary_prefix
+        
+        Args:
+            category: 新闻分类
+            items: 新闻列表
+            refs: 传入时用短引用编号代替链接，并把编号到链接的映射写入其中
+        """
         news_texts = []
         for item in items:
             if not item:  # 跳过空项
@@ -203,44 +951,45 @@ class Summarizer:
             text = f"标题：{item.get('title', '无标题')}\n"
             text += f"来源：{item.get('source_name', '未知来源')}\n"
             text += f"内容：{item.get('content', '无内容')}\n"
-            text += f"链接：{item.get('link', '无链接')}\n"
+            if refs is not None and item.get('link'):
+                ref_id = f"R{len(refs) + 1}"
+                refs[ref_id] = item['link']
+                text += f"引用编号：[{ref_id}]\n"
+            else:
+                text += f"链接：{item.get('link', '无链接')}\n"
             if item.get('media', {}).get('images'):
                 text += f"包含 {len(item['media']['images'])} 张图片\n"
-            if item.get('media', {}).get('videos'):
+            if item.get('media', {}).get('video_meta'):
+                for meta in item['media']['video_meta']:
+                    text += f"视频：{self._describe_video(meta)}\n"
+            elif item.get('media', {}).get('videos'):
                 text += f"包含 {len(item['media']['videos'])} 个视频\n"
             news_texts.append(text)
             
         separator = "="*50
-        prompt = f"""请你作为一个专业的新闻编辑，帮我总结以下{category}类新闻的要点。
-
-要求：
-1. 用简洁的语言概括新闻的主要内容
-2. 突出重要信息和关键数据
-3. 保持客观中立的态度
-4. 按重要性排序
-5. 使用规范的Markdown格式
-6. 遵循以下格式规范：
-   - 使用二级标题(##)标记分类名
-   - 重要新闻使用无序列表(-)
-   - 关键数据或重要引用使用粗体(**)标记
-   - 每条新闻之间使用空行分隔
-   - 需要用[链接]给出新闻的原始链接，如果无链接，则指出"原始链接缺失"
-7. 在完成摘要后，你应自己再检查一下摘要的内容是否完整，链接是否有误等
+        prompt = f"""请总结以下{category}类新闻的要点，二级标题使用“{category}”。
 
 以下是需要总结的新闻：
 
 {separator}
 {chr(10).join(news_texts)}
-{separator}
-
-请生成一个格式规范的摘要，示例格式如下：
-## {category}
-
-- 第一条重要新闻概述，**关键数据**，核心信息，原始链接
-
-- 第二条新闻概述，包含**重要引用**或数据，原始链接
-
-[其他新闻概述...]"""
+{separator}"""
         
         self.logger.debug(f"生成的提示词长度: {len(prompt)} 字符")
-        return prompt 
+        return prompt
+        
+    def _summary_prefix(self, use_refs: bool) -> str:
+        """分类摘要的固定前缀（要求、格式规范和示例），同一配置下逐字节不变，可以命中服务端的上下文缓存"""
+        if use_refs:
+            link_rule = "需要在每条新闻末尾原样给出其引用编号（如[R1]），如果无引用编号，则指出\"原始链接缺失\""
+        else:
+            link_rule = "需要用[链接]给出新闻的原始链接，如果无链接，则指出\"原始链接缺失\""
+        return self.instructions.format(link_rule=link_rule)
+        
+    def _digest_prefix(self, use_refs: bool) -> str:
+        """汇总摘要的固定前缀"""
+        if use_refs:
+            link_rule = "保留每条新闻末尾的引用编号（如[R1]），合并的新闻保留其中一个编号"
+        else:
+            link_rule = "保留每条新闻的[链接]，合并的新闻保留其中一个链接"
+        return DIGEST_INSTRUCTIONS.format(link_rule=link_rule)
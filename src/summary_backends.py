@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+import time
+from typing import Dict, List, Any
+
+from .ranker import tokenize
+
+# numpy为可选依赖，缺失时抽取式后端退化为取每条新闻的首句
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+_SENTENCE = re.compile(r'[^。！？!?；;\n]+?(?:[。！？!?；;]+|\.(?=\s|$)|(?=\n)|$)')
+
+
+class SummaryBackend:
+    """摘要后端接口
+
+    后端接收一个分类的新闻列表，返回与大模型输出结构相同的Markdown：
+    以 "## 分类名" 开头，每条新闻一个无序列表项。
+    """
+
+    name = ''
+
+    def summarize(self, category: str, items: List[Dict[str, Any]]) -> str:
+        raise NotImplementedError
+
+
+class DashScopeBackend(SummaryBackend):
+    """通义千问后端，实际调用由Summarizer的SDK/HTTP路径完成"""
+
+    name = 'dashscope'
+
+    def __init__(self, summarizer):
+        self.summarizer = summarizer
+
+    def summarize(self, category: str, items: List[Dict[str, Any]]) -> str:
+        return self.summarizer._generate_with_llm(category, items)
+
+
+class ExtractiveBackend(SummaryBackend):
+    """基于TextRank的抽取式摘要后端，只使用CPU，不依赖外部服务
+
+    把分类内所有新闻的句子放在一起，用TF-IDF向量的余弦相似度构图，
+    迭代计算每个句子的TextRank得分；新闻按其最佳句子的得分排序，
+    每条新闻输出得分最高的句子。
+    """
+
+    name = 'extractive'
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.max_items = config.get('max_items', 10)
+        self.sentences_per_item = config.get('sentences_per_item', 1)
+        # 参与计算的句子数上限，保证耗时有固定上界
+        self.max_sentences = config.get('max_sentences', 1500)
+        self.damping = config.get('damping', 0.85)
+        self.iterations = config.get('iterations', 30)
+        self.logger = logging.getLogger(__name__)
+
+    def summarize(self, category: str, items: List[Dict[str, Any]]) -> str:
+        started = time.time()
+        items = [item for item in items if item]
+
+        sentences = []
+        owners = []
+        for index, item in enumerate(items):
+            for sentence in self._split(item.get('content') or item.get('description') or ''):
+                if len(sentences) >= self.max_sentences:
+                    break
+                sentences.append(sentence)
+                owners.append(index)
+
+        scores = self._textrank(sentences) if NUMPY_AVAILABLE else [0.0] * len(sentences)
+
+        # 每条新闻取得分最高的若干句子
+        by_item = {}
+        for position, (owner, score) in enumerate(zip(owners, scores)):
+            by_item.setdefault(owner, []).append((score, -position, sentences[position]))
+
+        ranked = sorted(
+            range(len(items)),
+            key=lambda i: max(by_item[i])[0] if i in by_item else -1.0,
+            reverse=True
+        )
+
+        lines = [f"## {category}", ""]
+        for index in ranked[:self.max_items]:
+            item = items[index]
+            picked = sorted(by_item.get(index, []), reverse=True)[:self.sentences_per_item]
+            # 按原文顺序输出选中的句子
+            text = ''.join(sentence for _, _, sentence in sorted(picked, key=lambda p: -p[1]))
+            bullet = f"- **{item.get('title', '无标题')}**"
+            if text:
+                bullet += f"：{text}"
+            bullet += f" [链接]({item['link']})" if item.get('link') else "（原始链接缺失）"
+            lines.extend([bullet, ""])
+
+        self.logger.info(
+            f"{category} 类抽取式摘要完成，{len(items)} 条新闻 {len(sentences)} 个句子，"
+            f"耗时 {time.time() - started:.3f} 秒"
+        )
+        return "\n".join(lines).strip()
+
+    def _split(self, text: str) -> List[str]:
+        """切分句子，去掉过短的片段"""
+        return [s.strip() for s in _SENTENCE.findall(text) if len(s.strip()) >= 6]
+
+    def _textrank(self, sentences: List[str]) -> List[float]:
+        """计算每个句子的TextRank得分"""
+        count = len(sentences)
+        if count == 0:
+            return []
+        if count == 1:
+            return [1.0]
+
+        # 构造TF-IDF矩阵
+        vocabulary = {}
+        rows = []
+        for sentence in sentences:
+            row = {}
+            for token in tokenize(sentence):
+                column = vocabulary.setdefault(token, len(vocabulary))
+                row[column] = row.get(column, 0) + 1
+            rows.append(row)
+        matrix = np.zeros((count, max(len(vocabulary), 1)), dtype=np.float32)
+        for i, row in enumerate(rows):
+            for column, value in row.items():
+                matrix[i, column] = value
+        df = np.count_nonzero(matrix, axis=0)
+        matrix *= np.log((1 + count) / (1 + df)) + 1
+
+        # 余弦相似度作为边权，去掉自环
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        normalized = matrix / norms
+        similarity = normalized @ normalized.T
+        np.fill_diagonal(similarity, 0)
+
+        # 行归一化后做幂迭代
+        out_weight = similarity.sum(axis=1, keepdims=True)
+        out_weight[out_weight == 0] = 1
+        transition = similarity / out_weight
+        scores = np.full(count, 1.0 / count, dtype=np.float32)
+        for _ in range(self.iterations):
+            scores = (1 - self.damping) / count + self.damping * (transition.T @ scores)
+        return scores.tolist()
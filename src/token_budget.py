@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+class TokenLedger:
+    """大模型token用量台账
+
+    每次调用记录一行：分类、模型、输入/输出token数、输入中命中上下文缓存的token数，以及所属的运行编号。
+    接口未返回usage时按提示词和输出估算，并标记为估算值。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run_id = uuid.uuid4().hex
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS usage (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT NOT NULL,
+                    run_id TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    input_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    estimated INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_usage_time ON usage (created_at);
+                CREATE INDEX IF NOT EXISTS idx_usage_run ON usage (run_id);
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(usage)")]
+            if 'cached_tokens' not in columns:
+                conn.execute("ALTER TABLE usage ADD COLUMN cached_tokens INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def start_run(self) -> str:
+        """开始新的一次运行，之后的记录归入新的运行编号"""
+        self.run_id = uuid.uuid4().hex
+        return self.run_id
+
+    def record(self, category: str, model: str, input_tokens: int, output_tokens: int,
+               estimated: bool = False, cached_tokens: int = 0) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO usage (created_at, run_id, category, model, input_tokens, output_tokens, estimated, "
+                "cached_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.utcnow().strftime(_TIME_FORMAT), self.run_id, category, model,
+                 int(input_tokens), int(output_tokens), int(estimated), int(cached_tokens))
+            )
+
+    def totals(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               run_id: Optional[str] = None, group_by: Optional[str] = None) -> List[Dict[str, Any]]:
+        """汇总用量，group_by可为category或model，不分组时返回一行
+
+        Returns:
+            包含calls、input_tokens、output_tokens、cached_tokens（以及分组字段）的字典列表
+        """
+        if group_by not in (None, 'category', 'model'):
+            raise ValueError(f"不支持的分组字段: {group_by}")
+        clauses = []
+        params = []
+        for clause, value in (("created_at >= ?", since), ("created_at < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value.strftime(_TIME_FORMAT))
+        if run_id is not None:
+            clauses.append("run_id = ?")
+            params.append(run_id)
+
+        columns = ("COUNT(*), COALESCE(SUM(input_tokens), 0), COALESCE(SUM(output_tokens), 0), "
+                   "COALESCE(SUM(cached_tokens), 0)")
+        sql = f"SELECT {group_by + ', ' if group_by else ''}{columns} FROM usage"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if group_by:
+            sql += f" GROUP BY {group_by} ORDER BY SUM(input_tokens + output_tokens) DESC"
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        results = []
+        for row in rows:
+            result = {'calls': row[-4], 'input_tokens': row[-3], 'output_tokens': row[-2], 'cached_tokens': row[-1]}
+            if group_by:
+                result[group_by] = row[0]
+            results.append(result)
+        return results
+
+
+class BudgetController:
+    """token预算控制
+
+    按当天（UTC）和本次运行已用的token数加上即将发起的调用的估算值，计算预算压力，
+    压力越大降级越多，各级依次叠加：
+    - 缩短每条新闻交给模型的内容
+    - 减少每个分类保留的新闻数（top_k）
+    - 改用更便宜的模型档位
+    - 改用本地抽取式摘要，不再调用大模型
+    """
+
+    def __init__(self, ledger: TokenLedger, config: Dict[str, Any] = None):
+        config = config or {}
+        self.ledger = ledger
+        self.daily_tokens = config.get('daily_tokens')
+        self.run_tokens = config.get('run_tokens')
+        self.shrink_at = config.get('shrink_at', 0.5)
+        self.max_content_chars = config.get('max_content_chars', 300)
+        self.reduce_top_k_at = config.get('reduce_top_k_at', 0.7)
+        self.top_k_factor = config.get('top_k_factor', 0.5)
+        self.cheap_tier_at = config.get('cheap_tier_at', 0.85)
+        self.cheap_tier = config.get('cheap_tier')
+        self.extractive_at = config.get('extractive_at', 1.0)
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._day = None
+        self._day_used = 0
+        self._run_used = 0
+
+    def start_run(self) -> None:
+        """开始新的一次运行：重置本次运行的用量，从台账读取当天已用量"""
+        with self._lock:
+            self.ledger.start_run()
+            self._run_used = 0
+            self._day = None
+
+    def add(self, tokens: int) -> None:
+        """累计一次调用的用量（台账之外的内存计数，避免每次规划都查询数据库）"""
+        with self._lock:
+            self._refresh_day()
+            self._day_used += tokens
+            self._run_used += tokens
+
+    def _refresh_day(self) -> None:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        if self._day != today:
+            totals = self.ledger.totals(since=today, until=today + timedelta(days=1))
+            self._day = today
+            self._day_used = totals[0]['input_tokens'] + totals[0]['output_tokens']
+
+    def pressure(self, estimated_tokens: int = 0) -> float:
+        """预算压力：已用量加上估算用量占预算的比例，取当天和本次运行中较高的一个"""
+        with self._lock:
+            self._refresh_day()
+            ratios = [0.0]
+            if self.daily_tokens:
+                ratios.append((self._day_used + estimated_tokens) / self.daily_tokens)
+            if self.run_tokens:
+                ratios.append((self._run_used + estimated_tokens) / self.run_tokens)
+            return max(ratios)
+
+    def plan(self, category: str, estimated_tokens: int = 0) -> Dict[str, Any]:
+        """返回本次调用的降级方案
+
+        Returns:
+            字典，max_content_chars为每条新闻内容的长度上限，top_k_factor为保留新闻数的比例，
+            backend为改用的摘要后端；不需要降级的项为None。
+            是否改用低价档位按实际提示词的用量由tier()决定
+        """
+        pressure = self.pressure(estimated_tokens)
+        plan = {
+            'pressure': pressure,
+            'max_content_chars': self.max_content_chars if pressure >= self.shrink_at else None,
+            'top_k_factor': self.top_k_factor if pressure >= self.reduce_top_k_at else None,
+            'backend': 'extractive' if pressure >= self.extractive_at else None
+        }
+        if pressure >= self.shrink_at:
+            actions = [name for name, key in (('缩短内容', 'max_content_chars'), ('减少新闻数', 'top_k_factor'),
+                                              ('改用抽取式摘要', 'backend'))
+                       if plan[key] is not None]
+            self.logger.warning(f"{category} 类token预算压力 {pressure:.0%}，降级：{'、'.join(actions)}")
+        return plan
+
+    def tier(self, estimated_tokens: int = 0) -> Optional[str]:
+        """按实际提示词的估算用量决定是否改用低价档位，返回档位名称或None"""
+        if self.cheap_tier and self.pressure(estimated_tokens) >= self.cheap_tier_at:
+            return self.cheap_tier
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查询谛听token用量')
+    parser.add_argument('--path', default=os.path.join('data', 'usage.db'), help='用量台账路径')
+    parser.add_argument('--since', help='起始日期（含），格式YYYY-MM-DD，默认为今天')
+    parser.add_argument('--until', help='结束日期（含），格式YYYY-MM-DD')
+    parser.add_argument('--group-by', choices=['category', 'model'], default='category', help='分组字段')
+    args = parser.parse_args()
+
+    ledger = TokenLedger(args.path)
+    since = datetime.strptime(args.since, '%Y-%m-%d') if args.since else \
+        datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    until = datetime.strptime(args.until, '%Y-%m-%d') + timedelta(days=1) if args.until else None
+
+    for row in ledger.totals(since, until, group_by=args.group_by):
+        print(f"{row[args.group_by]}: 调用 {row['calls']} 次，输入 {row['input_tokens']} tokens"
+              f"（缓存命中 {row['cached_tokens']}），输出 {row['output_tokens']} tokens")
+    total = ledger.totals(since, until)[0]
+    print(f"合计: 调用 {total['calls']} 次，输入 {total['input_tokens']} tokens"
+          f"（缓存命中 {total['cached_tokens']}），输出 {total['output_tokens']} tokens")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import posixpath
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Dict, List, Any, Iterable
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+# 常见的跟踪参数，utm_开头的参数全部去掉
+TRACKING_PARAMS = {
+    'spm', 'fbclid', 'gclid', 'yclid', 'dclid', 'mc_cid', 'mc_eid', 'igshid', 'ref_src',
+    'share_token', 'wfr', 'scene', '_hsenc', '_hsmi', 'mkt_tok', 'vero_id'
+}
+TRACKING_PREFIXES = ('utm_',)
+
+# 默认需要解析跳转的包装链接域名
+REDIRECT_HOSTS = ['plink.anyfeeder.com', 'feedproxy.google.com', 't.co', 'bit.ly', 'dwz.cn', 'url.cn']
+
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+# 以这些字符开头的片段是单页应用的路由（#/article/1、#!/post/2），决定了页面内容，需要保留
+_ROUTE_FRAGMENT_PREFIXES = ('/', '!')
+
+
+def canonicalize(url: str, strip_params: Iterable[str] = ()) -> str:
+    """规范化URL：协议和域名小写、去掉默认端口和锚点片段、合并路径中的./..和重复斜杠、去掉跟踪参数
+
+    #/或#!开头的片段是前端路由，不同片段对应不同文章，予以保留。
+
+    无法解析的URL原样返回。
+    """
+    if not url:
+        return url
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+        return url
+
+    try:
+        port = parts.port
+    except ValueError:
+        return url
+    host = (parts.hostname or '').lower().rstrip('.')
+    if ':' in host:
+        host = f"[{host}]"
+    netloc = host if port is None or str(port) == _DEFAULT_PORTS[scheme] else f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else '')
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or '/'
+    trailing = path.endswith('/')
+    path = posixpath.normpath(path)
+    if path.startswith('//'):
+        path = '/' + path.lstrip('/')
+    if trailing and path != '/':
+        path += '/'
+
+    # 没有需要去掉的参数时保留原始查询串，避免改变参数的编码方式
+    extra = set(strip_params)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    kept = [(key, value) for key, value in params
+            if key.lower() not in TRACKING_PARAMS and key not in extra
+            and not key.lower().startswith(TRACKING_PREFIXES)]
+    query = urlencode(kept) if len(kept) != len(params) else parts.query
+    fragment = parts.fragment if parts.fragment.startswith(_ROUTE_FRAGMENT_PREFIXES) else ''
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+class UrlNormalizer:
+    """新闻链接的规范化与跳转解析
+
+    包装链接（如plink.anyfeeder.com）并发发送HEAD请求解析跳转链，结果连同解析时间保存在SQLite中，
+    有效期内直接使用缓存，每个包装链接只解析一次；最终链接再去掉跟踪参数、统一域名和路径写法，
+    同一篇文章在不同源中的链接因此一致，已见检查和去重都能命中，提示词也更短。
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.strip_params = set(config.get('strip_params', []))
+        self.redirect_hosts = set(config.get('redirect_hosts', REDIRECT_HOSTS))
+        self.resolve_all = config.get('resolve_all', False)
+        self.ttl = config.get('cache_ttl', 30 * 86400)
+        # 解析失败的链接也缓存，但很快过期
+        self.failure_ttl = config.get('failure_ttl', 3600)
+        self.timeout = config.get('timeout', 5)
+        self.max_redirects = config.get('max_redirects', 5)
+        self.workers = config.get('workers', 8)
+        self.cache_path = config.get('cache_path', os.path.join('data', 'redirects.db'))
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS redirects (
+                    url TEXT PRIMARY KEY,
+                    resolved TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.cache_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def needs_resolve(self, url: str) -> bool:
+        if not url:
+            return False
+        if self.resolve_all:
+            return True
+        host = (urlsplit(url).hostname or '').lower()
+        return host in self.redirect_hosts
+
+    def normalize_items(self, items: List[Dict[str, Any]]) -> None:
+        """原地规范化新闻链接，原始链接保存在original_link中"""
+        resolved = self.resolve_many([item.get('link') for item in items if self.needs_resolve(item.get('link'))])
+        for item in items:
+            link = item.get('link')
+            if not link:
+                continue
+            normalized = canonicalize(resolved.get(link, link), self.strip_params)
+            if normalized != link:
+                item['original_link'] = link
+                item['link'] = normalized
+
+    def resolve_many(self, urls: List[str]) -> Dict[str, str]:
+        """解析一批包装链接的最终地址，有效期内的结果直接读取缓存"""
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if not urls:
+            return {}
+        now = time.time()
+        results = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(urls), 500):
+                batch = urls[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f"SELECT url, resolved FROM redirects WHERE expires_at > ? AND url IN ({placeholders})",
+                    [now] + batch
+                ).fetchall()
+                results.update(dict(rows))
+
+        pending = [url for url in urls if url not in results]
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                resolved = list(executor.map(self._resolve, pending))
+            rows = []
+            for url, target in zip(pending, resolved):
+                results[url] = target or url
+                rows.append((url, target or url, now + (self.ttl if target else self.failure_ttl)))
+            with closing(self._connect()) as conn:
+                conn.executemany("INSERT OR REPLACE INTO redirects (url, resolved, expires_at) VALUES (?, ?, ?)", rows)
+            self.logger.info(f"解析跳转链接 {len(pending)} 个，命中缓存 {len(urls) - len(pending)} 个")
+        return results
+
+    def _resolve(self, url: str):
+        """跟随跳转链返回最终地址，失败时返回None；不支持HEAD的服务器改用GET，只读取响应头"""
+        session = requests.Session()
+        session.max_redirects = self.max_redirects
+        try:
+            response = session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code in (405, 501) or response.status_code >= 400 and not response.history:
+                response = session.get(url, allow_redirects=True, timeout=self.timeout, stream=True)
+                response.close()
+            if response.status_code >= 400:
+                return None
+            return response.url
+        except requests.exceptions.RequestException as e:
+            self.logger.debug(f"解析跳转链接 {url} 失败: {str(e)}")
+            return None
+        finally:
+            session.close()
+
+    def purge(self) -> None:
+        """删除已过期的缓存"""
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM redirects WHERE expires_at <= ?", (time.time(),))
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import socketserver
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Any, Optional
+
+import requests
+
+# ffmpeg优先使用imageio_ffmpeg（moviepy的依赖）自带的可执行文件，其次使用系统PATH中的ffmpeg
+try:
+    import imageio_ffmpeg
+    FFMPEG_EXE = imageio_ffmpeg.get_ffmpeg_exe()
+except Exception:
+    FFMPEG_EXE = shutil.which('ffmpeg')
+
+_DURATION = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+_VIDEO_STREAM = re.compile(r'Stream #.*?Video: ([^,\s]+).*?, (\d{2,5})x(\d{2,5})')
+_FORWARDED_HEADERS = ('Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges')
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class BudgetProxy:
+    """限额读取视频的本地HTTP代理
+
+    ffmpeg通过它读取远程视频，Range请求原样转发，因此探测和抽帧只读取需要的部分；
+    累计读取的字节数超过预算或超过截止时间后断开连接，ffmpeg随之结束。
+    """
+
+    def __init__(self, source_url: str, byte_budget: int, deadline: float, timeout: float = 10):
+        self.source_url = source_url
+        self.byte_budget = byte_budget
+        self.deadline = deadline
+        self.timeout = timeout
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                proxy._forward(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/video"
+
+    @property
+    def exhausted(self) -> bool:
+        return self.bytes_read >= self.byte_budget or time.time() >= self.deadline
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _forward(self, handler: BaseHTTPRequestHandler) -> None:
+        if self.exhausted:
+            handler.send_error(503)
+            return
+        headers = {}
+        if handler.headers.get('Range'):
+            headers['Range'] = handler.headers['Range']
+        try:
+            upstream = requests.get(self.source_url, headers=headers, stream=True, timeout=self.timeout)
+            with upstream:
+                handler.send_response(upstream.status_code)
+                for name in _FORWARDED_HEADERS:
+                    if upstream.headers.get(name):
+                        handler.send_header(name, upstream.headers[name])
+                handler.end_headers()
+                for chunk in upstream.iter_content(chunk_size=65536):
+                    with self._lock:
+                        self.bytes_read += len(chunk)
+                    handler.wfile.write(chunk)
+                    if self.exhausted:
+                        break
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg跳转时会主动关闭旧连接
+            pass
+        except requests.exceptions.RequestException:
+            handler.send_error(502)
+
+
+class VideoProcessor:
+    """视频元数据探测与关键帧抽取
+
+    每个视频在独立的时间和字节预算内处理：先用ffmpeg探测时长和分辨率，
+    再在均匀分布的时间点各抽取一帧保存到图片目录。多个视频在线程池中并行处理，
+    超出预算的视频只保留已得到的结果，不会拖住整次运行。
+    """
+
+    def __init__(self, config: Dict[str, Any] = None, output_dir: str = 'media/images'):
+        config = config or {}
+        self.max_videos = config.get('max_videos', 2)
+        self.keyframes = config.get('keyframes', 3)
+        self.frame_width = config.get('frame_width', 640)
+        self.time_budget = config.get('time_budget', 30)
+        self.byte_budget = config.get('byte_budget', 8 * 1024 * 1024)
+        self.output_dir = output_dir
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=config.get('workers', 2))
+
+    def process(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """处理一条新闻的视频，返回每个视频的元数据和关键帧路径"""
+        if not FFMPEG_EXE:
+            self.logger.warning("未找到ffmpeg，跳过视频处理")
+            return []
+
+        urls = list(dict.fromkeys(url for url in urls if url))[:self.max_videos]
+        futures = [self._executor.submit(self.process_video, url) for url in urls]
+        # 单个视频内部已受预算约束，这里再留出少量余量兜底
+        done, _ = wait(futures, timeout=self.time_budget + 5)
+        results = []
+        for future in futures:
+            if future in done and future.exception() is None and future.result():
+                results.append(future.result())
+        return results
+
+    def process_video(self, url: str) -> Optional[Dict[str, Any]]:
+        """在预算内探测一个视频并抽取关键帧"""
+        started = time.time()
+        deadline = started + self.time_budget
+        proxy = BudgetProxy(url, self.byte_budget, deadline)
+        try:
+            meta = self._probe(proxy, deadline)
+            if meta is None:
+                self.logger.warning(f"无法探测视频信息: {url}")
+                return None
+            meta['url'] = url
+            meta['frames'] = self._extract_frames(url, proxy, meta.get('duration'), deadline)
+            self.logger.info(
+                f"视频处理完成: {url}，时长 {meta.get('duration')} 秒，分辨率 {meta.get('width')}x{meta.get('height')}，"
+                f"关键帧 {len(meta['frames'])} 张，读取 {proxy.bytes_read} 字节，耗时 {time.time() - started:.1f} 秒"
+            )
+            return meta
+        finally:
+            proxy.close()
+
+    def _run(self, args: List[str], deadline: float) -> Optional[subprocess.CompletedProcess]:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        try:
+            return subprocess.run(
+                [FFMPEG_EXE, '-hide_banner', '-nostdin'] + args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=remaining
+            )
+        except subprocess.TimeoutExpired:
+            self.logger.warning("ffmpeg超出时间预算，已终止")
+            return None
+
+    def _probe(self, proxy: BudgetProxy, deadline: float) -> Optional[Dict[str, Any]]:
+        """用ffmpeg读取容器头，解析时长、编码和分辨率"""
+        result = self._run(['-i', proxy.url], deadline)
+        if result is None:
+            return None
+        output = result.stderr.decode('utf-8', errors='replace')
+        stream = _VIDEO_STREAM.search(output)
+        if not stream:
+            return None
+        meta = {'codec': stream.group(1), 'width': int(stream.group(2)), 'height': int(stream.group(3)), 'duration': None}
+        duration = _DURATION.search(output)
+        if duration:
+            hours, minutes, seconds = duration.groups()
+            meta['duration'] = round(int(hours) * 3600 + int(minutes) * 60 + float(seconds), 1)
+        return meta
+
+    def _extract_frames(self, url: str, proxy: BudgetProxy, duration: Optional[float], deadline: float) -> List[str]:
+        """在均匀分布的时间点各抽取一帧，时长未知时只取开头一帧"""
+        if duration:
+            points = [duration * (i + 1) / (self.keyframes + 1) for i in range(self.keyframes)]
+        else:
+            points = [0]
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = hashlib.md5(url.encode('utf-8')).hexdigest()[:16]
+        frames = []
+        for index, point in enumerate(points):
+            if proxy.exhausted:
+                self.logger.info(f"视频 {url} 达到预算，停止抽帧")
+                break
+            path = os.path.join(self.output_dir, f"{prefix}_{index}.jpg")
+            result = self._run([
+                '-ss', f"{point:.2f}", '-i', proxy.url,
+                '-frames:v', '1', '-vf', f"scale={self.frame_width}:-2", '-q:v', '4', '-y', path
+            ], deadline)
+            if result is not None and result.returncode == 0 and os.path.exists(path):
+                frames.append(path)
+        return frames
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from src.archive import Archive
+
+class TestArchive(unittest.TestCase):
+    """新闻存档测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.archive = Archive(os.path.join(self.temp_dir, 'archive.db'))
+        self.items = [
+            {'title': '国产芯片产业报告', 'content': '芯片产业规模持续增长', 'link': 'http://a.com/1',
+             'source_name': '源A', 'category': 'tech', 'cluster_id': 'tech-0',
+             'published': datetime(2024, 1, 1, 8, 0, 0)},
+            {'title': 'Rust 1.75 released', 'content': 'async fn in traits', 'link': 'http://b.com/2',
+             'source_name': '源B', 'category': 'tech', 'published': datetime(2024, 1, 3, 8, 0, 0)},
+            {'title': '摄影作品', 'content': '', 'link': 'http://c.com/3', 'source_name': '源A', 'category': 'photo'}
+        ]
+        self.archive.add_items(self.items, batch_size=2)
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_search(self):
+        """测试按关键词、来源和日期范围查询"""
+        results = self.archive.search(keyword='芯片产业')
+        self.assertEqual([item['link'] for item in results], ['http://a.com/1'])
+        self.assertEqual(results[0]['cluster_id'], 'tech-0')
+        self.assertEqual(results[0]['published'], datetime(2024, 1, 1, 8, 0, 0))
+
+        self.assertEqual(len(self.archive.search(keyword='Rust')), 1)
+        self.assertEqual(self.archive.search(keyword='不存在的词'), [])
+        self.assertEqual(len(self.archive.search(source='源A')), 2)
+        results = self.archive.search(since=datetime(2024, 1, 2), until=datetime(2024, 1, 4))
+        self.assertEqual([item['link'] for item in results], ['http://b.com/2'])
+
+    def test_update_existing(self):
+        """测试重复存档时更新而不是重复写入"""
+        self.items[1]['cluster_id'] = 'tech-1'
+        self.archive.add_items(self.items[1:2])
+        results = self.archive.search(keyword='Rust')
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['cluster_id'], 'tech-1')
+
+    def test_summaries(self):
+        """测试分类摘要存档和按日期查询"""
+        self.archive.add_summaries('2024-01-01', {'tech': ('## tech\n\n- 芯片', self.items[:2])})
+        self.archive.add_summaries('2024-01-02', {'tech': ('## tech\n\n- 其他', [])}, profile='team')
+        records = self.archive.summaries(since='2024-01-01', until='2024-01-02')
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['summary'], '## tech\n\n- 芯片')
+        self.assertEqual(len(records[0]['item_keys']), 2)
+        self.assertEqual(len(self.archive.summaries(profile='team')), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.batch import BatchQueue, LocalBatchClient
+from src.summarizer import Summarizer
+
+class TestBatch(unittest.TestCase):
+    """批处理摘要测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.items = [
+            {'title': '科技新闻', 'content': '内容', 'link': 'http://test.com/1', 'category': 'tech'},
+            {'title': '摄影作品', 'content': '内容', 'link': 'http://test.com/2', 'category': 'photo'}
+        ]
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def _summarizer(self, wait=0):
+        return Summarizer('test_api_key', {
+            'shorten_links': True,
+            'batch': {'client': 'local', 'categories': ['photo'], 'dir': self.temp_dir, 'wait': wait}
+        })
+
+    def test_queue_roundtrip(self):
+        """测试任务文件的提交、查询和标记完成"""
+        queue = BatchQueue({'dir': self.temp_dir}, LocalBatchClient(lambda body: body['messages'][-1]['content']))
+        queue.add('photo', [{'role': 'user', 'content': '摘要'}])
+        job_id = queue.flush()
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, f"{job_id}.jsonl")))
+
+        results = queue.poll()
+        self.assertEqual([(r['category'], r['summary']) for r in results], [('photo', '摘要')])
+        self.assertEqual(len(queue.poll()), 1)
+        queue.mark_collected([job_id])
+        self.assertEqual(queue.poll(), [])
+
+    def test_deferred_followup(self):
+        """测试可延后分类不进入日报，之后作为补充摘要收取"""
+        summarizer = self._summarizer()
+        with patch.object(summarizer, '_invoke_model', return_value='## photo\n\n- 作品 [R1]') as mock_invoke:
+            report = summarizer.generate_summary(self.items)
+            self.assertIn('稍后单独推送', report)
+            self.assertEqual(mock_invoke.call_count, 1)
+
+            summaries, job_ids = summarizer.collect_deferred()
+        self.assertEqual(list(summaries), [''])
+        self.assertIn('http://test.com/2', summaries[''])
+        summarizer.ack_deferred(job_ids)
+        self.assertEqual(summarizer.collect_deferred(), ({}, []))
+
+    def test_followup_profiles(self):
+        """测试补充摘要发送给提交时的profile，相同新闻集合的多个profile共用一个请求"""
+        summarizer = self._summarizer()
+        with patch.object(summarizer, '_invoke_model', return_value='## photo\n\n- 作品 [R1]') as mock_invoke:
+            summarizer.generate_summary(self.items, profile='team')
+            summarizer.generate_summary(self.items[1:], profile='family')
+            summarizer.generate_summary([dict(self.items[1], link='http://test.com/3')], profile='friends')
+            summaries, job_ids = summarizer.collect_deferred()
+        self.assertEqual(mock_invoke.call_count, 3)
+        self.assertEqual(sorted(summaries), ['family', 'friends', 'team'])
+        self.assertIn('http://test.com/2', summaries['family'])
+        self.assertIn('http://test.com/3', summaries['friends'])
+        self.assertEqual(len(job_ids), 2)
+
+    def test_batch_links_validated(self):
+        """测试批处理结果按提交时的新闻校验链接"""
+        summarizer = self._summarizer()
+        output = '## photo\n\n- 作品 [R1]\n- 编造的作品 [链接](http://fake.com/1)'
+        with patch.object(summarizer, '_invoke_model', return_value=output):
+            summarizer.generate_summary(self.items)
+            summaries, _ = summarizer.collect_deferred()
+        self.assertIn('http://test.com/2', summaries[''])
+        self.assertNotIn('fake.com', summaries[''])
+
+    def test_merge_within_wait(self):
+        """测试等待时间内完成的批处理结果直接合并进日报"""
+        summarizer = self._summarizer(wait=5)
+        with patch.object(summarizer, '_invoke_model', return_value='## photo\n\n- 作品 [R1]'):
+            report = summarizer.generate_summary(self.items)
+        self.assertIn('http://test.com/2', report)
+        self.assertNotIn('稍后单独推送', report)
+        self.assertEqual(summarizer.collect_deferred(), ({}, []))
+
+    def test_missing_results(self):
+        """测试任务结束但部分请求没有结果时，缺少的分类同步生成，任务不再作为补充摘要收取"""
+        summarizer = Summarizer('test_api_key', {
+            'batch': {'client': 'local', 'categories': ['photo', 'video'], 'dir': self.temp_dir, 'wait': 5}
+        })
+        items = self.items + [{'title': '视频', 'content': '内容', 'link': 'http://test.com/3', 'category': 'video'}]
+
+        def invoke(category, messages, tier):
+            if category == 'batch' and '视频' in messages[-1]['content']:
+                raise RuntimeError('请求失败')
+            return f"## {category}\n\n- 模型摘要"
+        with patch.object(summarizer, '_invoke_model', side_effect=invoke):
+            report = summarizer.generate_summary(items)
+        self.assertIn('batch', report)
+        self.assertIn('video', report)
+        self.assertNotIn('稍后单独推送', report)
+        self.assertEqual(summarizer.collect_deferred(), ({}, []))
+
+    def test_missing_followup(self):
+        """测试补充摘要中没有结果的分类按提交时的新闻同步生成"""
+        summarizer = Summarizer('test_api_key', {
+            'batch': {'client': 'local', 'categories': ['photo', 'video'], 'dir': self.temp_dir, 'wait': 0}
+        })
+        items = self.items + [{'title': '视频', 'content': '内容', 'link': 'http://test.com/3', 'category': 'video'}]
+
+        def invoke(category, messages, tier):
+            if category == 'batch' and '视频' in messages[-1]['content']:
+                raise RuntimeError('请求失败')
+            return f"## {category}\n\n- 模型摘要"
+        with patch.object(summarizer, '_invoke_model', side_effect=invoke) as mock_invoke:
+            summarizer.generate_summary(items)
+            summaries, job_ids = summarizer.collect_deferred()
+        self.assertIn('video', summaries[''])
+        self.assertIn('video', [call[0][0] for call in mock_invoke.call_args_list])
+
+    def test_failed_job_followup(self):
+        """测试批处理任务失败时，承诺的分类在补充摘要中同步生成"""
+        summarizer = self._summarizer()
+        with patch.object(summarizer, '_invoke_model', return_value='## photo\n\n- 作品 [R1]'):
+            report = summarizer.generate_summary(self.items)
+            self.assertIn('稍后单独推送', report)
+            with patch.object(LocalBatchClient, 'status', return_value=('failed', None)):
+                summaries, job_ids = summarizer.collect_deferred()
+        self.assertIn('http://test.com/2', summaries[''])
+        summarizer.ack_deferred(job_ids)
+        self.assertEqual(summarizer.collect_deferred(), ({}, []))
+
+if __name__ == '__main__':
+    unittest.main()
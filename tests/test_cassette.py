@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import shutil
+import smtplib
+import tempfile
+import unittest
+from datetime import datetime
+from email.mime.text import MIMEText
+from unittest.mock import patch, MagicMock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.cassette import Cassette
+from src.main import DiTing
+
+class TestCassette(unittest.TestCase):
+    """外部I/O录制与回放测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'run.jsonl.gz')
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def _fake_send(self, adapter, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers['Content-Type'] = 'application/xml; charset=utf-8'
+        response.url = request.url
+        response.request = request
+        response._content = f"<rss>{request.method} {request.body or ''}</rss>".encode('utf-8')
+        return response
+
+    def test_http_replay(self):
+        """测试录制的HTTP响应按URL和请求体回放，不再访问网络"""
+        run_time = datetime(2024, 1, 2, 3, 4, 5)
+        with patch.object(HTTPAdapter, 'send', self._fake_send):
+            with Cassette(self.path, 'record') as cassette:
+                self.assertEqual(cassette.pin('run_time', run_time), run_time)
+                requests.get('http://test.com/rss', stream=True)
+                requests.post('http://test.com/api', data='first')
+                requests.post('http://test.com/api', data='second')
+
+        offline = MagicMock(side_effect=AssertionError('回放时不应访问网络'))
+        with patch.object(HTTPAdapter, 'send', offline):
+            with Cassette(self.path, 'replay', speed=0) as cassette:
+                self.assertEqual(cassette.pin('run_time', datetime.utcnow()), run_time)
+                response = requests.get('http://test.com/rss', stream=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(b''.join(response.iter_content(chunk_size=4)), b'<rss>GET </rss>')
+                self.assertEqual(requests.post('http://test.com/api', data='second').text, '<rss>POST second</rss>')
+                self.assertEqual(requests.post('http://test.com/api', data='other').text, '<rss>POST first</rss>')
+                with self.assertRaises(requests.exceptions.ConnectionError):
+                    requests.get('http://test.com/missing')
+            self.assertEqual(cassette.stats['misses'], 1)
+        offline.assert_not_called()
+
+    def test_smtp_replay(self):
+        """测试SMTP会话的回放，包括录制时出现的错误，回放时不连接服务器"""
+        server = MagicMock()
+        server.login.side_effect = smtplib.SMTPAuthenticationError(535, b'authentication failed')
+        msg = MIMEText('正文')
+        msg['Subject'] = '测试'
+
+        with patch('smtplib.SMTP_SSL', MagicMock(return_value=server)):
+            with Cassette(self.path, 'record'):
+                with smtplib.SMTP_SSL('smtp.test.com', 465, timeout=30) as smtp:
+                    smtp.send_message(msg)
+                    with self.assertRaises(smtplib.SMTPAuthenticationError):
+                        smtp.login('user', 'password')
+
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            recorded = f.read()
+        self.assertIn('"user": "user"', recorded)
+        self.assertNotIn('password', recorded)
+
+        connect = MagicMock()
+        with patch('smtplib.SMTP_SSL', connect):
+            with Cassette(self.path, 'replay', speed=0):
+                with smtplib.SMTP_SSL('smtp.test.com', 465, timeout=30) as smtp:
+                    smtp.send_message(msg)
+                    with self.assertRaises(smtplib.SMTPAuthenticationError) as context:
+                        smtp.login('user', 'password')
+        self.assertEqual(context.exception.smtp_code, 535)
+        connect.assert_not_called()
+
+    @patch.object(DiTing, '_setup_logging')
+    @patch.object(DiTing, '_load_config')
+    def test_replay_isolates_state(self, mock_config, mock_logging):
+        """测试回放时关闭源健康记录，缓存和用量台账放在临时目录，不写入运行状态"""
+        mock_config.return_value = {
+            'dashscope': {'api_key': 'test_api_key'},
+            'email': {},
+            'summarizer': {'usage': {'path': os.path.join(self.temp_dir, 'usage.db')}},
+            'archive': {'enabled': True, 'path': os.path.join(self.temp_dir, 'archive.db')},
+            'distributed': {'workers': 2}
+        }
+        with gzip.open(self.path, 'wt', encoding='utf-8'):
+            pass
+
+        with Cassette(self.path, 'replay', speed=0) as cassette:
+            diting = DiTing(cassette)
+            self.assertFalse(diting.persist_state)
+            self.assertIsNone(diting.source_health)
+            self.assertIsNone(diting.archive)
+            self.assertIsNone(diting.coordinator)
+            self.assertTrue(diting.rss_parser.url_normalizer.cache_path.startswith(cassette.state_dir))
+            self.assertTrue(diting.config['summarizer']['usage']['path'].startswith(cassette.state_dir))
+            state_dir = cassette.state_dir
+        self.assertFalse(os.path.exists(state_dir))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'usage.db')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from src.deadline import StageTimings, RunDeadline, DeadlineScheduler
+from src.distributed import process_shard
+from src.summarizer import Summarizer, DEGRADED_NOTE
+
+class TestDeadline(unittest.TestCase):
+    """截止时间调度测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'stage_timings.json')
+        self.config = {'default_durations': {'collect': 100, 'summarize': 200, 'render': 50, 'send': 50},
+                       'margin': 60}
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_start_time_from_history(self):
+        """测试按历史耗时倒推开始时间，同一送达时间只触发一次"""
+        timings = StageTimings(self.path, self.config)
+        self.assertEqual(timings.total(), 400)
+        for seconds in (300, 100, 200, 900):
+            timings.record('collect', seconds)
+        self.assertEqual(StageTimings(self.path, dict(self.config, quantile=0.5)).estimate('collect'), 200)
+        self.assertEqual(timings.estimate('collect'), 900)
+
+        scheduler = DeadlineScheduler('08:00', timings, self.config)
+        deadline = datetime(2024, 1, 2, 8, 0)
+        # 900 + 200 + 50 + 50 + 60 秒
+        self.assertEqual(scheduler.start_at(deadline), datetime(2024, 1, 2, 7, 39))
+        self.assertIsNone(scheduler.due(datetime(2024, 1, 2, 7, 38)))
+        self.assertEqual(scheduler.due(datetime(2024, 1, 2, 7, 39)), deadline)
+        self.assertIsNone(scheduler.due(datetime(2024, 1, 2, 7, 45)))
+        self.assertEqual(scheduler.deadline_for(datetime(2024, 1, 2, 9, 0)), datetime(2024, 1, 3, 8, 0))
+
+    def test_stage_budget(self):
+        """测试剩余时间按各阶段预计耗时的比例分配"""
+        timings = StageTimings(self.path, self.config)
+        run = RunDeadline(time.time() + 400, timings)
+        self.assertAlmostEqual(run.stage_deadline('collect') - time.time(), 100, delta=1)
+        self.assertAlmostEqual(run.stage_deadline('summarize') - time.time(), 400 * 200 / 300, delta=1)
+        with run.stage('send'):
+            pass
+        self.assertLess(timings.estimate('send'), 1)
+
+        # 嵌套执行的阶段从外层阶段扣除并分别记录
+        nested = {'render': 0.0}
+        with run.stage('summarize', nested):
+            time.sleep(0.1)
+            nested['render'] += 0.08
+        self.assertAlmostEqual(timings.estimate('render'), 0.08, delta=0.001)
+        self.assertLess(timings.estimate('summarize'), 0.08)
+        self.assertIsNone(RunDeadline().stage_deadline('collect'))
+
+    def test_collect_deadline(self):
+        """测试抓取阶段到时跳过剩余的源"""
+        parser = MagicMock()
+        parser.parse.side_effect = lambda source, since: [{'title': source['name']}]
+        processor = MagicMock()
+        processor.process.side_effect = lambda items, source_type, rules: items
+        sources = [{'name': f'源{i}', 'url': f'http://test.com/{i}', 'type': 'text'} for i in range(3)]
+
+        self.assertEqual(len(process_shard(sources, {}, parser, processor, deadline=time.time() + 60)), 3)
+        self.assertEqual(process_shard(sources, {}, parser, processor, deadline=time.time() - 1), [])
+
+    def test_degraded_categories(self):
+        """测试到时未完成的分类改用抽取式摘要并注明，后台完成的结果写入缓存"""
+        summarizer = Summarizer('test_api_key', {'link_validation': {'enabled': False}})
+
+        def generate(category, items):
+            if category == 'photo':
+                time.sleep(0.5)
+            return f"## {category}\n\n- 模型摘要"
+        summarizer._generate_category_summary = generate
+
+        items = [{
+            'title': f'测试新闻{i}',
+            'content': '这是一条测试新闻的内容。',
+            'link': f'http://test.com/news/{i}',
+            'category': 'tech' if i < 2 else 'photo'
+        } for i in range(4)]
+        html = summarizer.generate_summary(items, time.time() + 0.2)
+
+        self.assertIn('模型摘要', html)
+        self.assertIn(DEGRADED_NOTE, html)
+        self.assertIn('测试新闻2', html)
+        self.assertEqual(summarizer.last_degraded, {'photo': 'extractive'})
+        self.assertEqual(list(summarizer.last_summaries), ['tech'])
+
+        time.sleep(0.5)
+        photo_items = [item for item in items if item['category'] == 'photo']
+        self.assertEqual(summarizer._summary_cache[summarizer._cache_key('photo', photo_items)],
+                         '## photo\n\n- 模型摘要')
+
+    def test_inflight_shared(self):
+        """测试到时未完成的生成被之后的profile复用，不重复调用；清空缓存后迟到的结果和异常都不写入缓存"""
+        summarizer = Summarizer('test_api_key', {'link_validation': {'enabled': False}})
+        calls = []
+
+        def generate(category, items):
+            calls.append(category)
+            time.sleep(0.3)
+            if category == 'broken':
+                raise RuntimeError('生成失败')
+            return f"## {category}\n\n- 模型摘要"
+        summarizer._generate_category_summary = generate
+
+        items = [{'title': '测试新闻', 'content': '这是一条测试新闻的内容。', 'link': 'http://test.com/1',
+                  'category': 'tech'}]
+        self.assertIn(DEGRADED_NOTE, summarizer.generate_summary(items, time.time() + 0.1))
+        self.assertIn('模型摘要', summarizer.generate_summary(items, time.time() + 1))
+        self.assertEqual(calls, ['tech'])
+
+        summarizer.generate_summary([dict(items[0], link='http://test.com/2')], time.time() + 0.1)
+        summarizer.generate_summary([dict(items[0], category='broken')], time.time() + 0.1)
+        summarizer.clear_cache()
+        time.sleep(0.4)
+        self.assertEqual(summarizer._summary_cache, {})
+        self.assertEqual(summarizer._inflight, {})
+        summarizer.close()
+
+    def test_batch_submit_failure(self):
+        """测试批处理提交失败时同步生成的分类同样受截止时间限制"""
+        summarizer = Summarizer('test_api_key', {
+            'link_validation': {'enabled': False},
+            'batch': {'client': 'local', 'categories': ['photo'], 'dir': self.temp_dir}
+        })
+        summarizer.batch.flush = MagicMock(return_value=None)
+
+        def generate(category, items):
+            time.sleep(1.0)
+            return f"## {category}\n\n- 模型摘要"
+        summarizer._generate_category_summary = generate
+
+        items = [{'title': '摄影作品', 'content': '内容', 'link': 'http://test.com/1', 'category': 'photo'}]
+        started = time.time()
+        html = summarizer.generate_summary(items, time.time() + 0.2)
+        self.assertLess(time.time() - started, 0.8)
+        self.assertIn(DEGRADED_NOTE, html)
+
+    def test_category_share(self):
+        """测试剩余时间按新闻条数分给各分类，排在前面的慢分类不占用后面分类的时间"""
+        summarizer = Summarizer('test_api_key', {'link_validation': {'enabled': False}})
+
+        def generate(category, items):
+            time.sleep(1.0 if category == 'photo' else 0.05)
+            return f"## {category}\n\n- 模型摘要"
+        summarizer._generate_category_summary = generate
+
+        items = [{
+            'title': f'测试新闻{i}',
+            'content': '这是一条测试新闻的内容。',
+            'link': f'http://test.com/news/{i}',
+            'category': 'photo' if i < 2 else 'tech'
+        } for i in range(4)]
+        summarizer.generate_summary(items, time.time() + 0.6)
+        self.assertEqual(summarizer.last_degraded, {'photo': 'extractive'})
+        self.assertEqual(list(summarizer.last_summaries), ['tech'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+
+from src.archive import Archive
+from src.digest import DigestBuilder
+from src.summarizer import Summarizer
+
+class TestDigest(unittest.TestCase):
+    """周报、月报测试"""
+
+    def setUp(self):
+        """测试前准备：存档10天的每日摘要"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.archive = Archive(os.path.join(self.temp_dir, 'archive.db'))
+        self.start = date(2024, 1, 1)
+        for offset in range(10):
+            day = (self.start + timedelta(days=offset)).isoformat()
+            self.archive.add_summaries(day, {'tech': (f"## tech\n\n- {day} 新闻 [链接](http://a.com/{offset})", [])})
+
+        self.summarizer = MagicMock()
+        self.summarizer.summarize_digest.side_effect = lambda category, label, parts: f"## {category}\n\n- {label}"
+        self.builder = DigestBuilder(self.archive, self.summarizer)
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_weekly_cache(self):
+        """测试周报只在每日摘要变化时重新生成"""
+        digests = self.builder.build('week', date(2024, 1, 7))
+        self.assertEqual(digests['tech'], '## tech\n\n- 2024-01-01 至 2024-01-07')
+        self.assertEqual(len(self.summarizer.summarize_digest.call_args[0][2]), 7)
+
+        self.builder.build('week', date(2024, 1, 7))
+        self.assertEqual(self.summarizer.summarize_digest.call_count, 1)
+
+        # 某天重新生成摘要后，使用最新的结果并重新汇总
+        self.archive.add_summaries('2024-01-03', {'tech': ('## tech\n\n- 更正', [])})
+        self.builder.build('week', date(2024, 1, 7))
+        self.assertEqual(self.summarizer.summarize_digest.call_count, 2)
+        self.assertIn(('2024-01-03', '## tech\n\n- 更正'), self.summarizer.summarize_digest.call_args[0][2])
+
+    def test_monthly_hierarchy(self):
+        """测试月报由各周汇总再汇总，未变化的周复用缓存"""
+        self.builder.build('week', date(2024, 1, 7))
+        self.summarizer.summarize_digest.reset_mock()
+
+        self.builder.build('month', date(2024, 1, 10))
+        labels = [call[0][1] for call in self.summarizer.summarize_digest.call_args_list]
+        self.assertEqual(labels, ['2024-01-08 至 2024-01-10', '2024-01-01 至 2024-01-10'])
+        self.assertEqual(len(self.summarizer.summarize_digest.call_args[0][2]), 2)
+
+    def test_digest_prompt_refs(self):
+        """测试汇总提示词用引用编号代替链接"""
+        refs = {}
+        prompt = Summarizer('test_api_key')._prepare_digest_prompt(
+            'tech', '2024-01-01 至 2024-01-07', [('2024-01-01', '- 新闻 [链接](http://a.com/0)')], refs
+        )
+        self.assertIn('- 新闻 [R1]', prompt)
+        self.assertEqual(refs, {'R1': 'http://a.com/0'})
+
+    def test_digest_links_validated(self):
+        """测试汇总摘要中不属于分段摘要的链接被去掉"""
+        summarizer = Summarizer('test_api_key')
+        output = '## tech\n\n- 芯片新闻 [链接](http://a.com/0)\n- 编造的新闻 [链接](http://fake.com/1)'
+        with patch.object(summarizer, '_invoke_model', return_value=output):
+            summary = summarizer.summarize_digest('tech', '2024-01-01 至 2024-01-07',
+                                                  [('2024-01-01', '- 芯片新闻 [链接](http://a.com/0)')])
+        self.assertIn('[链接](http://a.com/0)', summary)
+        self.assertNotIn('fake.com', summary)
+
+if __name__ == '__main__':
+    unittest.main()
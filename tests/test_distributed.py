@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from src.distributed import ShardCoordinator, split_shards, process_shard, _merge
+from src.item_store import encode_items, decode_items
+
+def _hanging_shard(sources, rules, since=None, **kwargs):
+    """源0所在的分片一直不返回，模拟卡住的worker"""
+    if any(source['name'] == '源0' for source in sources):
+        time.sleep(60)
+    return [{'title': source['name'], 'source_url': source['url']} for source in sources]
+
+class TestDistributed(unittest.TestCase):
+    """分片执行测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.sources = [
+            {'name': f'源{i}', 'url': f'http://test{i}.com/rss', 'type': 'text'}
+            for i in range(10)
+        ]
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_split_shards(self):
+        """测试分片稳定且不丢源"""
+        shards = split_shards(self.sources, 3)
+        self.assertEqual(sum(len(shard) for shard in shards), len(self.sources))
+        self.assertEqual(shards, split_shards(self.sources, 3))
+
+    def test_encode_decode(self):
+        """测试新闻列表序列化"""
+        items = [{'title': '测试', 'published': datetime(2024, 1, 1, 8, 30)}]
+        self.assertEqual(decode_items(encode_items(items)), items)
+
+    def test_sqlite_backend(self):
+        """测试SQLite队列后端合并结果并保持源顺序"""
+        def fake_process(sources, rules, since=None, deadline=None, worker_config=None):
+            self.assertEqual(worker_config, {'url_normalization': {'enabled': False}})
+            return [{'title': source['name'], 'source_url': source['url']} for source in sources]
+
+        coordinator = ShardCoordinator({
+            'workers': 3,
+            'backend': 'sqlite',
+            'queue_path': os.path.join(self.temp_dir, 'queue.db')
+        }, {'url_normalization': {'enabled': False}})
+        with patch('src.distributed.process_shard', side_effect=fake_process):
+            items = coordinator.collect(self.sources, {})
+
+        self.assertEqual([item['title'] for item in items], [source['name'] for source in self.sources])
+
+    @patch('src.distributed.process_shard', _hanging_shard)
+    def test_process_timeout(self):
+        """测试所有分片共用一个超时，卡住的worker被终止，不阻塞协调者"""
+        coordinator = ShardCoordinator({'workers': 3, 'backend': 'process', 'timeout': 1})
+        started = time.time()
+        items = coordinator.collect(self.sources, {})
+        self.assertLess(time.time() - started, 10)
+        titles = [item['title'] for item in items]
+        self.assertNotIn('源0', titles)
+        self.assertTrue(titles)
+
+    @patch('src.distributed.process_shard', _hanging_shard)
+    def test_collect_deadline(self):
+        """测试截止时间早于timeout时，协调者按截止时间停止等待"""
+        coordinator = ShardCoordinator({'workers': 3, 'backend': 'process', 'timeout': 600})
+        started = time.time()
+        items = coordinator.collect(self.sources, {}, deadline=time.time() + 1)
+        self.assertLess(time.time() - started, 10)
+        self.assertNotIn('源0', [item['title'] for item in items])
+
+    def test_merge_image_cap(self):
+        """测试合并时按源顺序执行每次报告的图片上限，视频关键帧不计"""
+        results = [
+            [{'source_url': 'http://test1.com/rss', 'media': {'images': ['c.jpg', 'd.jpg']}}],
+            [{'source_url': 'http://test0.com/rss', 'media': {'images': ['a.jpg', 'frame.jpg', 'b.jpg'],
+                                                              'video_meta': [{'frames': ['frame.jpg']}]}}]
+        ]
+        merged = _merge(self.sources, results, max_images=3)
+        self.assertEqual(merged[0]['media']['images'], ['a.jpg', 'frame.jpg', 'b.jpg'])
+        self.assertEqual(merged[1]['media']['images'], ['c.jpg'])
+
+    @patch('src.distributed.RSSParser')
+    def test_worker_components(self, mock_parser):
+        """测试worker进程按协调者传来的配置创建链接规范化和全文抓取组件"""
+        mock_parser.return_value.parse.return_value = []
+        cache_path = os.path.join(self.temp_dir, 'redirects.db')
+        sources = [dict(self.sources[0], fetch_full_text=True)]
+        worker_config = {'url_normalization': {'cache_path': cache_path},
+                         'full_text': {'cache_path': os.path.join(self.temp_dir, 'full_text.db')}}
+
+        with patch('src.distributed.FullTextFetcher') as mock_fetcher:
+            process_shard(sources, {}, worker_config=worker_config)
+        self.assertEqual(mock_parser.call_args[1]['url_normalizer'].cache_path, cache_path)
+        mock_fetcher.assert_called_once_with(worker_config['full_text'])
+
+        process_shard(self.sources, {}, worker_config={'url_normalization': {'enabled': False}})
+        self.assertIsNone(mock_parser.call_args[1]['url_normalizer'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -88,7 +88,8 @@ class TestDiTing(unittest.TestCase):
     def test_end_to_end(self, mock_smtp, mock_generation, mock_requests):
         """端到端测试"""
         # 模拟RSS响应
-        mock_requests.return_value.content = """
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.iter_content.return_value = ["""
         <?xml version="1.0" encoding="UTF-8" ?>
         <rss version="2.0">
         <channel>
@@ -101,7 +102,7 @@ class TestDiTing(unittest.TestCase):
             </item>
         </channel>
         </rss>
-        """
+        """.encode('utf-8')]
         
         # 模拟通义千问API响应
         mock_generation.return_value = MagicMock(
@@ -128,7 +129,8 @@ class TestDiTing(unittest.TestCase):
         source = self.test_sources['sources'][0]
         
         with patch('src.rss_parser.requests.get') as mock_get:
-            mock_get.return_value.content = """
+            mock_get.return_value.status_code = 200
+            mock_get.return_value.iter_content.return_value = ["""
             <?xml version="1.0" encoding="UTF-8" ?>
             <rss version="2.0">
             <channel>
@@ -141,7 +143,7 @@ class TestDiTing(unittest.TestCase):
                 </item>
             </channel>
             </rss>
-            """
+            """.encode('utf-8')]
             
             news_items = parser.parse(source)
             self.assertEqual(len(news_items), 1)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from src.full_text import FullTextFetcher, HostLimiter, extract_main_text
+
+ARTICLE = """<html><head><title>测试</title><script>var a = 1;</script></head><body>
+<div class="nav"><a href="/">首页</a> <a href="/tech">科技</a></div>
+<div id="main"><div class="article-content">
+<p>这是文章的第一段，介绍了新发布的芯片，性能提升明显，功耗也有所下降。</p>
+<p>第二段，厂商表示，该芯片将于下季度量产，首批客户包括多家手机厂商。</p>
+<div>第三段没有使用p标签，而是直接写在div里，同样属于正文，应该被抽取出来。</div>
+</div>
+<div class="related-news"><p><a href="/1">相关新闻的标题，这段链接文字不属于正文内容</a></p></div>
+</div>
+<div class="footer">版权所有，转载请注明出处，联系方式如下。</div>
+</body></html>"""
+
+class TestFullText(unittest.TestCase):
+    """全文抓取测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.config = {'cache_path': os.path.join(self.temp_dir, 'full_text.db'), 'min_chars': 50,
+                       'host_interval': 0}
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_extract_main_text(self):
+        """测试抽取正文段落，去掉导航、相关新闻和页脚"""
+        text = extract_main_text(ARTICLE.encode('gbk'), min_chars=50)
+        lines = text.split('\n')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('这是文章的第一段'))
+        self.assertTrue(lines[2].startswith('第三段'))
+        self.assertNotIn('首页', text)
+        self.assertNotIn('版权所有', text)
+        self.assertEqual(extract_main_text('<html><body><p>太短</p></body></html>'), '')
+
+    @patch('src.full_text.requests.get')
+    def test_fill_cached(self, mock_get):
+        """测试只为内容过短的新闻抓取全文，同一篇文章跨实例只下载一次，失败的链接过期后重试"""
+        def get(url, **kwargs):
+            response = MagicMock(status_code=500 if 'broken' in url else 200)
+            response.headers = {'Content-Type': 'text/html'}
+            response.iter_content.return_value = [ARTICLE.encode('utf-8')]
+            return response
+        mock_get.side_effect = get
+
+        items = [
+            {'title': '摘要', 'content': '只有一句摘要', 'link': 'https://example.com/a?utm_source=rss'},
+            {'title': '同一篇', 'content': '', 'link': 'https://EXAMPLE.com/a'},
+            {'title': '全文', 'content': '很长的内容' * 100, 'link': 'https://example.com/b'},
+            {'title': '失败', 'content': '摘要', 'link': 'https://example.com/broken'}
+        ]
+        fetcher = FullTextFetcher(self.config)
+        self.assertEqual(fetcher.fill(items), 2)
+        self.assertTrue(items[0]['content'].startswith('这是文章的第一段'))
+        self.assertTrue(items[1]['full_text'])
+        self.assertNotIn('full_text', items[2])
+        self.assertEqual(items[3]['content'], '摘要')
+        self.assertEqual(mock_get.call_count, 2)
+
+        again = [{'title': '摘要', 'content': '', 'link': 'https://example.com/a'},
+                 {'title': '失败', 'content': '', 'link': 'https://example.com/broken'}]
+        self.assertEqual(FullTextFetcher(self.config).fill(again), 1)
+        self.assertEqual(mock_get.call_count, 2)
+
+        FullTextFetcher(dict(self.config, failure_ttl=0)).fill(again)
+        self.assertEqual(mock_get.call_count, 3)
+
+    def test_host_interval(self):
+        """测试同一域名的相邻请求保持间隔，不同域名互不影响"""
+        limiter = HostLimiter(per_host=2, interval=0.2)
+        started = time.time()
+        with limiter.slot('a.com'):
+            pass
+        with limiter.slot('b.com'):
+            pass
+        self.assertLess(time.time() - started, 0.1)
+        with limiter.slot('a.com'):
+            pass
+        self.assertGreaterEqual(time.time() - started, 0.19)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from io import BytesIO
+from unittest.mock import patch, MagicMock
+
+from PIL import Image
+
+from src.image_triage import ImageTriage
+
+def image_bytes(size, image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, image_format)
+    return buffer.getvalue()
+
+class TestImageTriage(unittest.TestCase):
+    """图片下载前筛选测试"""
+
+    def _response(self, status_code, content=b'', headers=None):
+        response = MagicMock(status_code=status_code, headers=headers or {})
+        response.iter_content.return_value = [content]
+        response.__enter__.return_value = response
+        return response
+
+    def test_declared_sizes(self):
+        """测试去重和按声明宽高筛选，不发送请求"""
+        triage = ImageTriage({'max_per_item': 5})
+        urls = ['http://a.com/1.jpg', 'http://a.com/1.jpg#x', 'http://a.com/pixel.gif', 'data:image/gif;base64,R0']
+        declared = {'http://a.com/1.jpg': ('800', '600'), 'http://a.com/pixel.gif': (1, 1)}
+        with patch('src.image_triage.requests') as mock_requests:
+            self.assertEqual(triage.select(urls, declared), ['http://a.com/1.jpg'])
+            mock_requests.head.assert_not_called()
+
+    def test_probe_header(self):
+        """测试未声明宽高时通过Range请求读取图片头"""
+        triage = ImageTriage()
+        with patch('src.image_triage.requests.head') as mock_head, \
+             patch('src.image_triage.requests.get') as mock_get:
+            mock_head.return_value = self._response(200, headers={'Content-Length': '2048'})
+            mock_get.side_effect = [
+                self._response(206, image_bytes((640, 480))),
+                self._response(206, image_bytes((16, 16)))
+            ]
+            selected = triage.select(['http://a.com/photo.png', 'http://a.com/icon.png'])
+            self.assertEqual(mock_get.call_args[1]['headers']['Range'], 'bytes=0-65535')
+        self.assertEqual(selected, ['http://a.com/photo.png'])
+
+    def test_oversized(self):
+        """测试HEAD返回的文件过大时不再读取图片头"""
+        triage = ImageTriage({'max_bytes': 1024})
+        with patch('src.image_triage.requests.head') as mock_head, \
+             patch('src.image_triage.requests.get') as mock_get:
+            mock_head.return_value = self._response(200, headers={'Content-Length': '4096'})
+            self.assertEqual(triage.select(['http://a.com/huge.jpg']), [])
+            mock_get.assert_not_called()
+
+    def test_caps(self):
+        """测试单条新闻和单次报告的图片上限"""
+        triage = ImageTriage({'max_per_item': 2, 'max_per_report': 3})
+        declared = {f'http://a.com/{i}.jpg': (800, 600) for i in range(4)}
+        self.assertEqual(len(triage.select(list(declared), declared)), 2)
+        self.assertEqual(len(triage.select(list(declared), declared)), 1)
+        self.assertEqual(triage.select(list(declared), declared), [])
+        triage.reset()
+        self.assertEqual(len(triage.select(list(declared), declared)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
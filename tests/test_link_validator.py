@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from src.link_validator import LinkValidator, items_from_markdown
+
+class TestLinkValidator(unittest.TestCase):
+    """摘要链接校验测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.validator = LinkValidator()
+        self.items = [
+            {'title': '某公司发布新款芯片', 'link': 'https://test.com/news/1'},
+            {'title': '央行宣布降准0.5个百分点', 'link': 'https://test.com/news/2?id=7'},
+            {'title': '新能源汽车销量创新高', 'link': 'https://test.com/news/3'},
+        ]
+
+    def test_keep_and_repair(self):
+        """测试保留正确链接，修复格式差异和错误链接，去掉无法对应的链接"""
+        summary = '\n'.join([
+            '## tech',
+            '',
+            '- 某公司发布新款芯片，性能提升 [链接](https://test.com/news/1)',
+            '- 央行宣布降准 [链接](http://www.test.com/news/2/?id=7)',
+            '- 新能源汽车销量创新高 [链接](https://test.com/made-up)',
+            '- 其他消息 [链接](https://unknown.com/x) [R9]',
+        ])
+        fixed, report = self.validator.validate('tech', summary, self.items)
+        lines = fixed.split('\n')
+        self.assertEqual(lines[2], '- 某公司发布新款芯片，性能提升 [链接](https://test.com/news/1)')
+        self.assertEqual(lines[3], '- 央行宣布降准 [链接](https://test.com/news/2?id=7)')
+        self.assertEqual(lines[4], '- 新能源汽车销量创新高 [链接](https://test.com/news/3)')
+        self.assertEqual(lines[5], '- 其他消息 ')
+        self.assertEqual((report['kept'], report['repaired'], report['dropped']), (1, 2, 1))
+        self.assertEqual(report['missing'], [])
+
+    def test_missing_items(self):
+        """测试记录摘要中未提及的新闻"""
+        _, report = self.validator.validate('tech', '## tech\n\n- 芯片 [链接](https://test.com/news/1)', self.items)
+        self.assertEqual(report['missing'], ['央行宣布降准0.5个百分点', '新能源汽车销量创新高'])
+
+    def test_items_from_markdown(self):
+        """测试从分段摘要中取出链接及所在行的文字"""
+        items = items_from_markdown([
+            '## tech\n\n- 某公司发布新款芯片 [链接](https://test.com/news/1)',
+            '- 1. 新能源汽车销量创新高 [链接](https://test.com/news/3)\n- 重复 [链接](https://test.com/news/1)'
+        ])
+        self.assertEqual(items, [
+            {'title': '某公司发布新款芯片 链接', 'link': 'https://test.com/news/1'},
+            {'title': '新能源汽车销量创新高 链接', 'link': 'https://test.com/news/3'}
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from src.log_utils import ArtifactStore, PayloadDumper, setup_logging
+
+def _log_in_worker(message):
+    logging.getLogger('test_log_utils').info(message)
+    return os.getpid()
+
+class TestLogUtils(unittest.TestCase):
+    """日志工具测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.logger = logging.getLogger('test_log_utils')
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_artifact_store(self):
+        """测试相同内容只保存一份并可按引用读回"""
+        store = ArtifactStore(self.temp_dir)
+        ref = store.put('提示词' * 1000)
+        self.assertEqual(store.put('提示词' * 1000), ref)
+        self.assertEqual(store.get(ref), '提示词' * 1000)
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(self.temp_dir)), 1)
+
+    def test_dumper(self):
+        """测试采样、内联和artifact引用"""
+        store = ArtifactStore(self.temp_dir)
+        with self.assertLogs('test_log_utils', level='DEBUG') as logs:
+            self.assertIsNone(PayloadDumper(store, {'sample_rate': 0}).dump(self.logger, '提示词', 'x' * 1000))
+            dumper = PayloadDumper(store, {'sample_rate': 1, 'inline_limit': 10})
+            self.assertIsNone(dumper.dump(self.logger, '响应', '短内容'))
+            ref = dumper.dump(self.logger, '提示词', 'x' * 1000)
+
+        self.assertIn('未采样', logs.output[0])
+        self.assertIn('响应: 短内容', logs.output[1])
+        self.assertIn(ref, logs.output[2])
+        self.assertNotIn('x' * 100, logs.output[2])
+
+    def test_setup_logging(self):
+        """测试日志经队列异步写入轮转文件，fork出的worker进程的日志也写入同一文件"""
+        root = logging.getLogger()
+        saved_handlers, saved_level = list(root.handlers), root.level
+        log_file = os.path.join(self.temp_dir, 'logs', 'diting.log')
+        try:
+            listener = setup_logging({'level': 'INFO', 'file': log_file, 'max_bytes': 1024, 'backup_count': 2})
+            for index in range(100):
+                self.logger.info(f"第 {index} 条日志")
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                worker_pid = executor.submit(_log_in_worker, '来自worker进程的日志').result()
+            listener.stop()
+        finally:
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            for handler in saved_handlers:
+                root.addHandler(handler)
+            root.setLevel(saved_level)
+
+        self.assertTrue(os.path.exists(f"{log_file}.1"))
+        self.assertFalse(os.path.exists(f"{log_file}.3"))
+        self.assertNotEqual(worker_pid, os.getpid())
+        with open(log_file, encoding='utf-8') as f:
+            content = f.read()
+        self.assertIn('第 99 条日志', content)
+        self.assertIn('来自worker进程的日志', content)
+
+if __name__ == '__main__':
+    unittest.main()
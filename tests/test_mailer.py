@@ -137,6 +137,20 @@ class TestMailer(unittest.TestCase):
             if os.path.exists(test_image_dir):
                 os.rmdir(test_image_dir)
                 
+    def test_attach_inline_images(self):
+        """测试只附加正文引用的内嵌图片"""
+        from email.mime.multipart import MIMEMultipart
+        
+        msg = MIMEMultipart('related')
+        self.mailer._attach_images(msg, [
+            {'cid': 'news-1@diting', 'data': b'fake webp data', 'subtype': 'webp', 'filename': 'news.webp'}
+        ])
+        
+        attachments = [part for part in msg.walk() if part.get_content_type().startswith('image/')]
+        self.assertEqual(len(attachments), 1)
+        self.assertEqual(attachments[0].get_content_type(), 'image/webp')
+        self.assertEqual(attachments[0]['Content-ID'], '<news-1@diting>')
+        
     def test_get_default_template(self):
         """测试默认模板获取"""
         template = self.mailer._get_default_template()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+
+from src.model_router import ModelRouter, ModelCallError
+
+class TestModelRouter(unittest.TestCase):
+    """模型路由测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.config = {
+            'tiers': [
+                {'name': 'quality', 'model': 'qwen-plus', 'max_tokens': 3000, 'timeout': 5},
+                {'name': 'fast', 'model': 'qwen-turbo', 'max_tokens': 1500, 'timeout': 5}
+            ],
+            'default': ['quality', 'fast'],
+            'categories': {'photo': ['fast']},
+            'large_prompt': {'chars': 1000, 'tiers': ['fast']},
+            'breaker': {'failure_threshold': 2, 'cooldown': 60}
+        }
+
+    def test_route(self):
+        """测试按分类和提示词长度选择档位"""
+        router = ModelRouter(self.config, {})
+        self.assertEqual([t.name for t in router.route('tech', 100)], ['quality', 'fast'])
+        self.assertEqual([t.name for t in router.route('photo', 100)], ['fast'])
+        self.assertEqual([t.name for t in router.route('tech', 5000)], ['fast'])
+        self.assertEqual([t.name for t in router.route('tech', 100, 'fast')], ['fast'])
+
+    def test_prefer_open(self):
+        """测试指定的档位熔断时按正常顺序选择，而不是没有可用档位"""
+        router = ModelRouter(self.config, {})
+        for _ in range(2):
+            router.breakers['fast'].record_failure()
+        self.assertEqual([t.name for t in router.route('tech', 100, 'fast')], ['quality'])
+        self.assertEqual(router.call('tech', 100, lambda tier: tier.name, 'fast'), 'quality')
+
+    def test_fallback_and_breaker(self):
+        """测试失败降级，以及连续失败后熔断"""
+        router = ModelRouter(self.config, {})
+        calls = []
+
+        def invoke(tier):
+            calls.append(tier.name)
+            if tier.name == 'quality':
+                raise ModelCallError('服务不可用')
+            return tier.model
+
+        self.assertEqual(router.call('tech', 100, invoke), 'qwen-turbo')
+        self.assertEqual(router.call('tech', 100, invoke), 'qwen-turbo')
+        self.assertEqual(router.status()['quality'], 'open')
+
+        # 熔断后不再调用quality档位
+        calls.clear()
+        router.call('tech', 100, invoke)
+        self.assertEqual(calls, ['fast'])
+
+    def test_half_open_probe(self):
+        """测试冷却期结束后只放行一个试探调用，试探结束前其他调用跳过该档位"""
+        router = ModelRouter(dict(self.config, breaker={'failure_threshold': 1, 'cooldown': 0.05}), {})
+        breaker = router.breakers['quality']
+        breaker.record_failure()
+        self.assertEqual([t.name for t in router.route('tech', 100)], ['fast'])
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.available())
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.available())
+        self.assertEqual(router.call('tech', 100, lambda tier: tier.name), 'fast')
+        breaker.record_failure()
+        self.assertFalse(breaker.available())
+
+        time.sleep(0.06)
+        self.assertEqual(router.call('tech', 100, lambda tier: tier.name), 'quality')
+        self.assertEqual(router.status()['quality'], 'closed')
+        router.close()
+
+    def test_all_tiers_fail(self):
+        """测试所有档位都失败"""
+        router = ModelRouter(self.config, {})
+
+        def invoke(tier):
+            raise ModelCallError('失败')
+
+        with self.assertRaises(ModelCallError):
+            router.call('tech', 100, invoke)
+
+    def test_hedge(self):
+        """测试主档位过慢时发送对冲请求"""
+        config = dict(self.config, hedge_after=0.05, hedge_tier='fast')
+        router = ModelRouter(config, {})
+
+        def invoke(tier):
+            if tier.name == 'quality':
+                time.sleep(0.5)
+            return tier.name
+
+        self.assertEqual(router.call('tech', 100, invoke), 'fast')
+
+    def test_default_tier(self):
+        """测试未配置档位时使用默认档位"""
+        router = ModelRouter({}, {'name': 'default', 'model': 'qwen-turbo'})
+        self.assertEqual(router.call('tech', 100, lambda tier: tier.model), 'qwen-turbo')
+
+if __name__ == '__main__':
+    unittest.main()
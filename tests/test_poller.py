@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from src.item_store import ItemStore
+from src.poller import SourcePoller
+
+class TestPoller(unittest.TestCase):
+    """后台轮询与本地存储测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ItemStore(os.path.join(self.temp_dir, 'items.db'))
+        self.source = {'name': '测试源', 'url': 'http://test.com/rss', 'type': 'text'}
+        self.items = [{
+            'title': '测试新闻',
+            'link': 'http://test.com/news/1',
+            'published': datetime(2024, 1, 1),
+            'source_url': self.source['url']
+        }]
+
+        self.rss_parser = MagicMock()
+        self.content_processor = MagicMock()
+        self.content_processor.process.side_effect = lambda items, content_type, rules: items
+        self.poller = SourcePoller(
+            self.rss_parser, self.content_processor, self.store,
+            [self.source], {}, {'min_interval': 60, 'default_interval': 600}
+        )
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_poll_stores_new_items_once(self):
+        """测试新条目只入库和处理一次"""
+        self.rss_parser.fetch.return_value = (self.items, {})
+        self.assertEqual(self.poller.poll_source(self.source), 1)
+        self.assertEqual(self.poller.poll_source(self.source), 0)
+        self.content_processor.process.assert_called_once()
+
+        pending = self.store.pending_items()
+        self.assertEqual(pending, self.items)
+        self.store.mark_reported(pending)
+        self.assertEqual(self.store.pending_items(), [])
+
+    def test_interval_respects_hints(self):
+        """测试源声明的刷新提示作为间隔下限"""
+        state = self.poller._update_state({}, {'ttl': 3600}, 0, 1000.0)
+        self.assertEqual(state['interval'], 3600)
+        self.assertEqual(state['next_poll'], 4600.0)
+
+    def test_interval_learns_from_rate(self):
+        """测试根据新条目速率调整间隔"""
+        state = {'last_poll': 0.0, 'interval': 600}
+        state = self.poller._update_state(state, {}, 10, 1000.0)
+        self.assertAlmostEqual(state['interval'], 100.0)
+
+        # 没有新条目时间隔逐步变长
+        quiet = self.poller._update_state({'last_poll': 0.0, 'interval': 600}, {}, 0, 1000.0)
+        self.assertEqual(quiet['interval'], 900)
+
+if __name__ == '__main__':
+    unittest.main()
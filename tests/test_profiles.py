@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest.mock import patch
+
+from src.profiles import Profile, load_profiles, merge_sources
+from src.summarizer import Summarizer
+
+class TestProfiles(unittest.TestCase):
+    """多profile模式测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.sources = [
+            {'name': '源A', 'url': 'http://a.com/rss', 'type': 'text', 'category': 'tech'},
+            {'name': '源B', 'url': 'http://b.com/rss', 'type': 'text', 'category': 'news'}
+        ]
+        self.config = {
+            'email': {
+                'recipients': ['all@test.com'],
+                'subject_template': '谛听日报 - {date}'
+            },
+            'profiles': [
+                {'name': 'tech', 'sources': ['源A'], 'recipients': ['tech@test.com']},
+                {'name': 'all', 'content_filters': [{'pattern': '广告'}]}
+            ]
+        }
+        self.items = [
+            {'title': '新闻1', 'content': '', 'source_url': 'http://a.com/rss', 'category': 'tech'},
+            {'title': '广告新闻', 'content': '', 'source_url': 'http://b.com/rss', 'category': 'news'}
+        ]
+
+    def test_load_and_merge(self):
+        """测试profile加载和源合并"""
+        profiles = load_profiles(self.config, self.sources)
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0].email_config['recipients'], ['tech@test.com'])
+        self.assertEqual(profiles[1].email_config['recipients'], ['all@test.com'])
+        self.assertEqual(len(merge_sources(profiles)), 2)
+
+    def test_select(self):
+        """测试按profile筛选新闻"""
+        tech, everything = load_profiles(self.config, self.sources)
+        self.assertEqual([i['title'] for i in tech.select(self.items)], ['新闻1'])
+        self.assertEqual([i['title'] for i in everything.select(self.items)], ['新闻1'])
+
+    def test_unknown_source(self):
+        """测试引用不存在的源"""
+        with self.assertRaises(ValueError):
+            Profile({'name': 'bad', 'sources': ['不存在']}, self.sources, self.config['email'])
+
+    def test_merge_conflict(self):
+        """测试不同profile中同一URL的源配置不一致"""
+        profiles = load_profiles({
+            'email': self.config['email'],
+            'profiles': [
+                {'name': 'tech', 'sources': ['源A']},
+                {'name': 'photo', 'sources': [dict(self.sources[0], name='摄影A', category='photo')]}
+            ]
+        }, self.sources)
+        with self.assertRaisesRegex(ValueError, 'category'):
+            merge_sources(profiles)
+
+        # 只有名称不同的源正常合并
+        profiles[1].sources = [dict(self.sources[0], name='别名')]
+        self.assertEqual(len(merge_sources(profiles)), 1)
+
+    def test_summary_cache(self):
+        """测试相同分类和新闻集合的摘要只生成一次"""
+        summarizer = Summarizer('test_api_key')
+        with patch.object(summarizer, '_generate_category_summary', return_value='## tech') as mock_generate:
+            summarizer.generate_summary(self.items[:1])
+            summarizer.generate_summary(self.items[:1])
+            mock_generate.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from src.prompt_bench import PromptBenchmark, check_structure, percentile, format_table
+
+class TestPromptBench(unittest.TestCase):
+    """提示词基准测试工具测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.corpus = [{
+            'title': f'测试新闻{i}',
+            'content': '测试内容' * 20,
+            'link': f'http://test.com/news/{i}',
+            'source_name': '测试源',
+            'category': 'tech' if i < 4 else 'photo',
+            'media': {'images': [], 'videos': []}
+        } for i in range(6)]
+
+    def test_check_structure(self):
+        """测试结构检查和百分位数"""
+        summary = '## tech\n\n- 新闻一 [链接](http://a.com/1)\n\n- 新闻二 [链接](http://a.com/2)'
+        self.assertEqual(check_structure('tech', summary, 4),
+                         {'header_ok': True, 'list_ok': True, 'links': 2, 'link_coverage': 0.5})
+        self.assertFalse(check_structure('tech', '# tech\n正文', 1)['header_ok'])
+        self.assertEqual(percentile([3.0, 1.0, 2.0, 4.0], 0.5), 2.0)
+        self.assertEqual(percentile([3.0, 1.0, 2.0, 4.0], 0.9), 4.0)
+
+    def test_mock_variants(self):
+        """测试使用本地替身比较多组配置"""
+        benchmark = PromptBenchmark('', self.corpus, {'shorten_links': True}, mock=True)
+        results = benchmark.run([
+            {'name': 'baseline'},
+            {'name': 'short', 'max_tokens': 25, 'instructions': '只列出最重要的新闻。{link_rule}'}
+        ], repeat=2)
+
+        baseline, short = results
+        self.assertEqual(baseline['runs'], 4)
+        self.assertEqual(baseline['calls'], 4)
+        self.assertEqual(baseline['failures'], 0)
+        self.assertEqual(baseline['header_ok'], 1.0)
+        self.assertEqual(baseline['link_coverage'], 1.0)
+        self.assertTrue(baseline['estimated'])
+        self.assertLess(short['input_tokens'], baseline['input_tokens'])
+        self.assertLess(short['link_coverage'], 1.0)
+
+        table = format_table(results)
+        self.assertIn('| baseline | 4 | 0 |', table)
+        self.assertIn('| short |', table)
+
+if __name__ == '__main__':
+    unittest.main()
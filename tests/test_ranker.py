@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from datetime import datetime, timedelta
+
+from src.ranker import SalienceRanker, tokenize, estimate_tokens
+from src.summarizer import Summarizer
+
+class TestRanker(unittest.TestCase):
+    """本地排序筛选测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        now = datetime.utcnow()
+        self.items = [
+            {'title': '苹果发布新款芯片', 'content': '苹果今日发布M5芯片', 'published': now, 'source_weight': 1.0},
+            {'title': '苹果发布新款芯片M5', 'content': '多家媒体报道苹果芯片', 'published': now, 'source_weight': 1.0},
+            {'title': '某公司年会', 'content': '年会抽奖', 'published': now - timedelta(days=5), 'source_weight': 0.5},
+            {'title': '量子计算取得突破', 'content': '研究团队实现新的量子纠错方案', 'published': now, 'source_weight': 2.0},
+        ]
+
+    def test_tokenize(self):
+        """测试中英文分词和token估算"""
+        self.assertEqual(tokenize('苹果M5芯片'), ['m5', '苹果', '芯片'])
+        self.assertEqual(estimate_tokens('苹果abcd'), 3)
+
+    def test_select(self):
+        """测试相似新闻合并、top_k截取"""
+        ranker = SalienceRanker({'top_k': 2})
+        selected = ranker.select('tech', list(self.items))
+        titles = [item['title'] for item in selected]
+
+        self.assertEqual(len(selected), 2)
+        self.assertNotIn('某公司年会', titles)
+        # 两条苹果新闻只保留一条
+        self.assertEqual(len([t for t in titles if t.startswith('苹果')]), 1)
+        self.assertEqual(max(item['cluster_size'] for item in selected), 2)
+
+    def test_token_budget(self):
+        """测试token预算限制"""
+        ranker = SalienceRanker({'top_k': 10, 'token_budget': 20})
+        self.assertEqual(len(ranker.select('tech', list(self.items))), 1)
+
+    def test_reference_ids(self):
+        """测试提示词使用引用编号，输出中还原为链接"""
+        summarizer = Summarizer('test_api_key')
+        refs = {}
+        prompt = summarizer._prepare_prompt('tech', [{'title': '新闻', 'link': 'http://test.com/a?utm_source=rss'}], refs)
+        self.assertIn('[R1]', prompt)
+        self.assertNotIn('http://test.com/a', prompt)
+
+        summary = summarizer._expand_references('- 新闻概述 [R1]\n- 其他 【R2】', refs)
+        self.assertEqual(summary, '- 新闻概述 [链接](http://test.com/a?utm_source=rss)\n- 其他 【R2】')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+import markdown2
+from PIL import Image, ImageDraw
+
+from src.report_images import ReportImageRenderer, psnr
+
+class TestReportImages(unittest.TestCase):
+    """报告内嵌图片测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for index in range(2):
+            img = Image.new('RGB', (1200, 900), 'skyblue')
+            ImageDraw.Draw(img).ellipse((200, 200, 900, 700), fill=(200, 60 * index, 40))
+            path = os.path.join(self.temp_dir, f'{index}.png')
+            img.save(path)
+            self.paths.append(path)
+
+        self.items = [
+            {'title': '新闻1', 'link': 'http://test.com/1?a=1&b=2', 'category': 'tech',
+             'media': {'images': [self.paths[0]], 'videos': []}},
+            {'title': '新闻2', 'link': 'http://test.com/2', 'category': 'tech',
+             'media': {'images': [self.paths[1]], 'videos': []}}
+        ]
+        self.html = ('<h2>tech</h2>\n<ul>\n<li>第一条 <a href="http://test.com/1?a=1&amp;b=2">链接</a></li>\n'
+                     '<li>第二条</li>\n</ul>')
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_inline_cid(self):
+        """测试图片插入到包含其链接的列表项，未被引用的图片不附加"""
+        html, images = ReportImageRenderer().render(self.html, self.items)
+        self.assertEqual(len(images), 1)
+        self.assertIn(f'<img src="cid:{images[0]["cid"]}"', html)
+        self.assertLess(html.index('cid:'), html.index('</li>'))
+        self.assertIn(images[0]['subtype'], ('jpeg', 'webp'))
+
+    def test_markdown_query_link(self):
+        """测试markdown2生成的未转义&的链接也能插入图片"""
+        report = markdown2.markdown('## tech\n\n- 第一条 [链接](http://test.com/1?a=1&b=2)')
+        self.assertIn('href="http://test.com/1?a=1&b=2"', report)
+        html, images = ReportImageRenderer().render(report, self.items)
+        self.assertEqual(len(images), 1)
+        self.assertLess(html.index(f'cid:{images[0]["cid"]}'), html.index('</li>'))
+
+    def test_smallest_encoding(self):
+        """测试选出的编码满足质量目标且不大于最高质量的JPEG"""
+        renderer = ReportImageRenderer({'min_psnr': 35})
+        image = renderer._encode(self.paths[0])
+
+        original = Image.open(self.paths[0]).convert('RGB')
+        original.thumbnail((600, 2400))
+        baseline = BytesIO()
+        original.save(baseline, 'JPEG', quality=85)
+        self.assertLessEqual(len(image['data']), len(baseline.getvalue()))
+        self.assertGreaterEqual(psnr(original, Image.open(BytesIO(image['data'])).convert('RGB')), 35)
+
+    def test_cache_per_report(self):
+        """测试同一份报告内复用编码结果，开始新报告时清空缓存"""
+        renderer = ReportImageRenderer()
+        self.assertIs(renderer._encode(self.paths[0]), renderer._encode(self.paths[0]))
+        renderer.start_report()
+        self.assertEqual(renderer._cache, {})
+
+    def test_contact_sheet(self):
+        """测试摄影类分类拼成一张联系表"""
+        for item in self.items:
+            item['category'] = 'photo'
+        html = '<h2>photo</h2>\n<ul>\n<li>作品</li>\n</ul>'
+        html, images = ReportImageRenderer({'contact_sheet_categories': ['photo'], 'sheet_cell': 100}).render(html, self.items)
+        self.assertEqual(len(images), 1)
+        self.assertTrue(html.startswith(f'<h2>photo</h2><p><img src="cid:{images[0]["cid"]}"'))
+        self.assertEqual(Image.open(BytesIO(images[0]['data'])).size, (200, 100))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import feedparser
+
+from src.rss_parser import RSSParser, time_window_cutoff
+from src.feed_stream import FeedStreamReader
+
+FEED = """<?xml version="1.0" encoding="UTF-8" ?>
+<rss version="2.0">
+<channel>
+    <title>测试RSS</title>
+    <ttl>60</ttl>
+    <item>
+        <title>新新闻</title>
+        <link>http://test.com/news/2</link>
+        <pubDate>Mon, 01 Jan 2024 12:00:00 GMT</pubDate>
+    </item>
+    <item>
+        <title>旧新闻</title>
+        <link>http://test.com/news/1</link>
+        <pubDate>Sun, 31 Dec 2023 00:00:00 GMT</pubDate>
+    </item>
+    <item>
+        <title>无日期新闻</title>
+        <link>http://test.com/news/0</link>
+    </item>
+</channel>
+</rss>
+"""
+
+class TestRSSParser(unittest.TestCase):
+    """RSS解析器测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.parser = RSSParser()
+        self.source = {'name': '测试源', 'url': 'http://test.com/rss', 'type': 'text'}
+
+    def _parse(self, source, since=None):
+        with patch('src.rss_parser.requests.get') as mock_get:
+            mock_get.return_value.status_code = 200
+            mock_get.return_value.headers = {'Cache-Control': 'max-age=600'}
+            mock_get.return_value.iter_content.return_value = [FEED.encode('utf-8')]
+            return self.parser.fetch(source, since=since)
+
+    def test_parse_date(self):
+        """测试日期解析优先使用已解析结果，失败时返回None"""
+        self.assertEqual(
+            self.parser._parse_date({'published_parsed': (2024, 1, 1, 8, 0, 0, 0, 1, 0)}, '源'),
+            datetime(2024, 1, 1, 8, 0, 0)
+        )
+        self.assertEqual(
+            self.parser._parse_date({'published': '2024-01-01T08:00:00+08:00'}, '源'),
+            datetime(2024, 1, 1, 0, 0, 0)
+        )
+        self.assertEqual(self.parser._date_formats['源'], '%Y-%m-%dT%H:%M:%S%z')
+        self.assertIsNone(self.parser._parse_date({'published': '不是日期'}, '源'))
+        self.assertIsNone(self.parser._parse_date({}, '源'))
+
+    def test_time_window(self):
+        """测试时间窗口在解析阶段丢弃过期条目"""
+        items, meta = self._parse(self.source, since=datetime(2024, 1, 1))
+        self.assertEqual([item['title'] for item in items], ['新新闻', '无日期新闻'])
+        self.assertEqual(meta['ttl'], 3600)
+        self.assertEqual(meta['max_age'], 600)
+
+        source = dict(self.source, time_window={'hours': 1, 'keep_undated': False})
+        items, _ = self._parse(source)
+        self.assertEqual(items, [])
+
+    def test_time_window_cutoff(self):
+        """测试时间窗口截止时间计算"""
+        last_run = datetime(2024, 1, 1)
+        self.assertIsNone(time_window_cutoff(None))
+        self.assertEqual(time_window_cutoff({'since_last_run': True, 'hours': 24}, last_run), last_run)
+        self.assertLess(time_window_cutoff({'since_last_run': True, 'hours': 24}), datetime.utcnow())
+
+class TestFeedStreamReader(unittest.TestCase):
+    """流式读取测试"""
+
+    def _response(self, data, chunk_size=64):
+        response = MagicMock()
+        response.iter_content.return_value = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        return response
+
+    def test_stop_after_max_entries(self):
+        """测试达到条目上限后截断并补齐闭合标签"""
+        response = self._response(FEED.encode('utf-8'))
+        document = FeedStreamReader(1024 * 1024, max_entries=1).read(response)
+        feed = feedparser.parse(document)
+        self.assertFalse(feed.bozo)
+        self.assertEqual([entry.title for entry in feed.entries], ['新新闻'])
+        response.close.assert_called_once()
+
+    def test_stop_after_old_entries(self):
+        """测试连续出现过期条目后停止下载"""
+        reader = FeedStreamReader(1024 * 1024, since=datetime(2024, 1, 1), old_entry_tolerance=1)
+        feed = feedparser.parse(reader.read(self._response(FEED.encode('utf-8'))))
+        self.assertEqual(len(feed.entries), 2)
+
+    def test_malformed_feed(self):
+        """测试非良构文档按字节上限整体交给feedparser"""
+        data = FEED.replace('<title>测试RSS</title>', '<title>测试&nbsp;RSS</title>').encode('utf-8')
+        document = FeedStreamReader(1024 * 1024, max_entries=1).read(self._response(data))
+        self.assertEqual(document, data.lstrip())
+
+if __name__ == '__main__':
+    unittest.main()
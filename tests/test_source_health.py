@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from src.rss_parser import RSSParser
+from src.source_health import SourceHealth
+
+class TestSourceHealth(unittest.TestCase):
+    """源健康记录测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'source_health.json')
+        self.config = {'failure_threshold': 2, 'cooldown': 100, 'min_timeout': 2, 'max_timeout': 30}
+        self.health = SourceHealth(self.path, self.config)
+        self.source = {'name': '测试源', 'url': 'http://test.com/rss', 'type': 'text'}
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_adaptive_timeout(self):
+        """测试超时按历史耗时自适应，并限制在上下限之间"""
+        self.assertEqual(self.health.timeout(self.source['url']), 30)
+        self.health.record_success(self.source, 1.0, 10)
+        self.assertEqual(self.health.timeout(self.source['url']), 4.0)
+        self.health.record_success(self.source, 0.1, 10)
+        self.assertAlmostEqual(self.health.timeout(self.source['url']), 2.92)
+
+        fast = {'name': '快速源', 'url': 'http://fast.com/rss', 'type': 'text'}
+        self.health.record_success(fast, 0.1, 3)
+        self.assertEqual(self.health.timeout(fast['url']), 2)
+
+        # 记录在运行结束时统一持久化，之后重新加载
+        self.assertFalse(os.path.exists(self.path))
+        self.health.log_run_summary()
+        record = SourceHealth(self.path, self.config).record(self.source['url'])
+        self.assertEqual(record['avg_items'], 10)
+        self.assertEqual(record['successes'], 2)
+        self.assertIsNotNone(record['last_success'])
+
+    def test_circuit_breaking(self):
+        """测试连续失败后熔断，试探失败时冷却期翻倍，成功后恢复"""
+        with patch('src.source_health.time.time', return_value=1000.0):
+            self.health.record_failure(self.source, 'HTTP 500')
+            self.assertTrue(self.health.allow(self.source))
+            self.health.record_failure(self.source, 'HTTP 500')
+            self.assertFalse(self.health.allow(self.source))
+        self.assertEqual(self.health.record(self.source['url'])['open_until'], 1100.0)
+
+        with patch('src.source_health.time.time', return_value=1100.0):
+            self.assertTrue(self.health.allow(self.source))
+            self.health.record_failure(self.source, 'HTTP 500')
+        self.assertEqual(self.health.record(self.source['url'])['open_until'], 1300.0)
+
+        self.health.record_success(self.source, 1.0, 5)
+        self.assertTrue(self.health.allow(self.source))
+        self.assertEqual(self.health.record(self.source['url'])['error_streak'], 0)
+
+        summary = self.health.run_summary()
+        self.assertEqual(summary['counts'], {'failed': 3, 'skipped': 1, 'ok': 1})
+
+    def test_parser_skips_open_source(self):
+        """测试解析器记录失败并跳过熔断中的源"""
+        parser = RSSParser(self.health)
+        with patch('src.rss_parser.requests.get') as mock_get:
+            mock_get.side_effect = requests.exceptions.ConnectTimeout('timeout')
+            for _ in range(3):
+                items, meta = parser.fetch(self.source)
+                self.assertEqual(items, [])
+            self.assertEqual(mock_get.call_count, 2)
+            self.assertTrue(meta['skipped'])
+
+        record = self.health.record(self.source['url'])
+        self.assertEqual(record['error_streak'], 2)
+        self.assertIn('timeout', record['last_error'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from src.model_router import ModelTier
+from src.summarizer import Summarizer, StreamStalledError
+
+def _chunk(text):
+    """构造一个流式响应分片"""
+    response = MagicMock(status_code=200)
+    response.output.choices = [MagicMock()]
+    response.output.choices[0].message.content = text
+    return response
+
+class TestSummarizer(unittest.TestCase):
+    """摘要生成器测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.items = [{
+            'title': '测试新闻',
+            'content': '测试内容',
+            'link': 'http://test.com/news/1',
+            'source_name': '测试源',
+            'category': 'tech',
+            'media': {'images': [], 'videos': []}
+        }]
+
+    @patch('src.summarizer.USE_DASHSCOPE_SDK', True)
+    @patch('src.summarizer.Generation.call')
+    def test_stream_sdk(self, mock_call):
+        """测试流式输出按增量拼接并按分类转换为HTML"""
+        mock_call.return_value = iter([_chunk('## tech\n\n'), _chunk('- 第一条新闻')])
+        summarizer = Summarizer('test_api_key', {'stream': True})
+
+        html = summarizer.generate_summary(self.items)
+        self.assertIn('<h2>tech</h2>', html)
+        self.assertIn('<li>第一条新闻</li>', html)
+        self.assertTrue(mock_call.call_args[1]['stream'])
+        self.assertTrue(mock_call.call_args[1]['incremental_output'])
+
+    @patch('src.summarizer.USE_DASHSCOPE_SDK', True)
+    @patch('src.summarizer.Generation.call')
+    def test_stream_stall_retry(self, mock_call):
+        """测试流式响应卡住时重试"""
+        def stalled():
+            yield _chunk('## tech')
+            time.sleep(1)
+            yield _chunk('不会被读取')
+
+        mock_call.side_effect = [stalled(), iter([_chunk('## tech\n\n- 重试成功')])]
+        summarizer = Summarizer('test_api_key', {'stream': True, 'stall_timeout': 0.1})
+
+        summary = summarizer._generate_category_summary('tech', self.items)
+        self.assertEqual(summary, '## tech\n\n- 重试成功')
+        self.assertEqual(mock_call.call_count, 2)
+
+    def test_stream_stall_closes(self):
+        """测试流式响应卡住后关闭底层的流，不再继续读取"""
+        state = {'read': 0, 'closed': False}
+
+        def stalled():
+            try:
+                while True:
+                    state['read'] += 1
+                    yield _chunk('## tech')
+                    time.sleep(0.3)
+            finally:
+                state['closed'] = True
+
+        summarizer = Summarizer('test_api_key', {'stall_timeout': 0.1})
+        with self.assertRaises(StreamStalledError):
+            list(summarizer._iter_with_stall_timeout(stalled()))
+        time.sleep(0.5)
+        self.assertTrue(state['closed'])
+        self.assertEqual(state['read'], 2)
+
+    def test_stream_total_timeout(self):
+        """测试持续有数据但超过档位超时的流式响应被中止"""
+        closed = []
+
+        def slow():
+            while True:
+                time.sleep(0.05)
+                yield 'data:{}'
+
+        summarizer = Summarizer('test_api_key', {'stall_timeout': 1})
+        tier = ModelTier({'name': 'fast', 'model': 'qwen-turbo', 'timeout': 0.3})
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            list(summarizer._iter_with_stall_timeout(slow(), tier.timeout, close=lambda: closed.append(True)))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(closed, [True])
+
+    @patch('src.summarizer.USE_DASHSCOPE_SDK', False)
+    @patch('src.summarizer.requests.post')
+    def test_stream_http(self, mock_post):
+        """测试HTTP SSE流式输出"""
+        response = mock_post.return_value
+        response.__enter__.return_value = response
+        response.status_code = 200
+        response.iter_lines.return_value = [
+            'id:1',
+            'data:{"output":{"choices":[{"message":{"content":"## tech"}}]}}',
+            '',
+            'data:{"output":{"choices":[{"message":{"content":"\\n\\n- 新闻"}}]}}'
+        ]
+        summarizer = Summarizer('test_api_key', {'stream': True})
+
+        summary = summarizer._generate_category_summary('tech', self.items)
+        self.assertEqual(summary, '## tech\n\n- 新闻')
+        self.assertEqual(mock_post.call_args[1]['headers']['X-DashScope-SSE'], 'enable')
+
+    def test_prompt_video_meta(self):
+        """测试提示词包含视频元数据"""
+        self.items[0]['media'] = {
+            'images': [],
+            'videos': ['http://test.com/v.mp4'],
+            'video_meta': [{'duration': 83.5, 'width': 1920, 'height': 1080, 'frames': ['a.jpg', 'b.jpg']}]
+        }
+        prompt = Summarizer('test_api_key')._prepare_prompt('tech', self.items)
+        self.assertIn('视频：时长1分23秒，分辨率1920x1080，已抽取2张关键帧', prompt)
+
+    @patch('src.summarizer.USE_DASHSCOPE_SDK', False)
+    @patch('src.summarizer.requests.post')
+    def test_stable_prefix_cache(self, mock_post):
+        """测试各分类共用逐字节相同的固定前缀，开启显式缓存时标记cache_control"""
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {
+            'output': {'choices': [{'message': {'content': '## tech\n\n- 新闻'}}]},
+            'usage': {'input_tokens': 1200, 'output_tokens': 50, 'prompt_tokens_details': {'cached_tokens': 1024}}
+        }
+        summarizer = Summarizer('test_api_key', {'context_cache': True})
+        summarizer._record_usage = MagicMock()
+        summarizer._generate_with_llm('tech', self.items)
+        summarizer._generate_with_llm('photo', self.items)
+
+        first, second = [call[1]['json']['input']['messages'] for call in mock_post.call_args_list]
+        self.assertEqual(first[0], second[0])
+        self.assertEqual(first[0]['content'][0]['cache_control'], {'type': 'ephemeral'})
+        self.assertNotIn('tech', first[0]['content'][0]['text'])
+        self.assertIn('tech类新闻', first[1]['content'])
+        usage = summarizer._record_usage.call_args[0][2]
+        self.assertEqual(usage['prompt_tokens_details']['cached_tokens'], 1024)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest.mock import patch
+
+from src.summary_backends import ExtractiveBackend
+from src.summarizer import Summarizer
+
+class TestSummaryBackends(unittest.TestCase):
+    """摘要后端测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.items = [
+            {
+                'title': '芯片新品发布',
+                'content': '某公司今日发布新一代芯片。新芯片的性能提升了百分之三十。发布会在北京举行。',
+                'link': 'http://test.com/news/1',
+                'category': 'tech'
+            },
+            {
+                'title': '芯片产业报告',
+                'content': '报告显示芯片产业规模持续增长。新一代芯片成为增长的主要动力。',
+                'link': 'http://test.com/news/2',
+                'category': 'tech'
+            },
+            {'title': '无内容新闻', 'content': '', 'category': 'tech'}
+        ]
+
+    def test_extractive_structure(self):
+        """测试抽取式摘要的Markdown结构"""
+        summary = ExtractiveBackend().summarize('tech', self.items)
+        lines = [line for line in summary.split('\n') if line]
+
+        self.assertEqual(lines[0], '## tech')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(line.startswith('- **') for line in lines[1:]))
+        self.assertIn('[链接](http://test.com/news/1)', summary)
+        self.assertIn('原始链接缺失', lines[-1])
+
+    def test_extractive_backend(self):
+        """测试配置为抽取式后端时不调用大模型"""
+        summarizer = Summarizer('test_api_key', {'backend': 'extractive'})
+        with patch.object(summarizer, '_generate_with_llm') as mock_llm:
+            summary = summarizer._generate_category_summary('tech', self.items)
+            mock_llm.assert_not_called()
+        self.assertTrue(summary.startswith('## tech'))
+
+    def test_fallback_backend(self):
+        """测试大模型失败时退回抽取式后端"""
+        summarizer = Summarizer('test_api_key', {'fallback_backend': 'extractive'})
+        with patch.object(summarizer, '_generate_with_llm', side_effect=RuntimeError('超时')):
+            summary = summarizer._generate_category_summary('tech', self.items)
+        self.assertIn('[链接](http://test.com/news/2)', summary)
+
+    def test_unknown_backend(self):
+        """测试不支持的后端"""
+        with self.assertRaises(ValueError):
+            Summarizer('test_api_key', {'backend': 'unknown'})
+
+if __name__ == '__main__':
+    unittest.main()
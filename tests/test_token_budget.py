@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.summarizer import Summarizer
+from src.token_budget import TokenLedger, BudgetController
+
+class TestTokenBudget(unittest.TestCase):
+    """token用量台账与预算控制测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'usage.db')
+        self.items = [{
+            'title': f'测试新闻{i}',
+            'content': '很长的测试内容' * 50,
+            'link': f'http://test.com/news/{i}',
+            'source_name': '测试源',
+            'category': 'tech',
+            'media': {'images': [], 'videos': []}
+        } for i in range(4)]
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_ledger_totals(self):
+        """测试按运行和分类汇总用量"""
+        ledger = TokenLedger(self.path)
+        ledger.record('tech', 'qwen-turbo', 100, 20)
+        ledger.record('photo', 'qwen-turbo', 50, 10, estimated=True)
+        first_run = ledger.run_id
+        ledger.start_run()
+        ledger.record('tech', 'qwen-plus', 200, 40)
+
+        self.assertEqual(ledger.totals()[0], {'calls': 3, 'input_tokens': 350, 'output_tokens': 70, 'cached_tokens': 0})
+        self.assertEqual(ledger.totals(run_id=first_run)[0]['input_tokens'], 150)
+        by_category = ledger.totals(group_by='category')
+        self.assertEqual(by_category[0], {'category': 'tech', 'calls': 2, 'input_tokens': 300, 'output_tokens': 60,
+                                          'cached_tokens': 0})
+
+    def test_plan_levels(self):
+        """测试预算压力越大降级越多"""
+        ledger = TokenLedger(self.path)
+        ledger.record('tech', 'qwen-turbo', 400, 0)
+        budget = BudgetController(ledger, {'daily_tokens': 1000, 'cheap_tier': 'fast'})
+
+        plan = budget.plan('tech', 0)
+        self.assertIsNone(plan['max_content_chars'])
+        plan = budget.plan('tech', 350)
+        self.assertEqual(plan['max_content_chars'], 300)
+        self.assertEqual(plan['top_k_factor'], 0.5)
+        self.assertIsNone(budget.tier(350))
+
+        budget.add(500)
+        self.assertEqual(budget.tier(), 'fast')
+        self.assertEqual(budget.plan('tech', 100)['backend'], 'extractive')
+
+    @patch('src.summarizer.USE_DASHSCOPE_SDK', False)
+    @patch('src.summarizer.requests.post')
+    def test_summarizer_records_and_degrades(self, mock_post):
+        """测试记录接口返回的用量，超出预算后改用抽取式摘要"""
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {
+            'output': {'choices': [{'message': {'content': '## tech\n\n- 新闻'}}]},
+            'usage': {'input_tokens': 4500, 'output_tokens': 500, 'prompt_tokens_details': {'cached_tokens': 1024}}
+        }
+        summarizer = Summarizer('test_api_key', {
+            'usage': {'path': self.path, 'budget': {'run_tokens': 5000, 'shrink_at': 0.9}}
+        })
+        summarizer.start_run()
+
+        self.assertEqual(summarizer._generate_category_summary('tech', self.items), '## tech\n\n- 新闻')
+        prompt = mock_post.call_args[1]['json']['input']['messages'][1]['content']
+        self.assertIn('很长的测试内容' * 50, prompt)
+        self.assertEqual(summarizer.ledger.totals()[0]['input_tokens'], 4500)
+        self.assertEqual(summarizer.ledger.totals()[0]['cached_tokens'], 1024)
+
+        summary = summarizer._generate_category_summary('photo', self.items)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertTrue(summary.startswith('## photo'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from contextlib import closing
+from unittest.mock import patch, MagicMock
+
+import requests
+
+from src.url_normalizer import UrlNormalizer, canonicalize
+
+class TestUrlNormalizer(unittest.TestCase):
+    """链接规范化与跳转解析测试"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.config = {'cache_path': os.path.join(self.temp_dir, 'redirects.db')}
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_canonicalize(self):
+        """测试统一协议、域名、端口、路径写法并去掉跟踪参数和锚点，保留前端路由片段"""
+        self.assertEqual(canonicalize('HTTP://News.Example.COM:80/a/./b/../c?utm_source=rss&id=3#comments'),
+                         'http://news.example.com/a/c?id=3')
+        self.assertEqual(canonicalize('https://example.com:443//2024//post/?spm=a1.b2'),
+                         'https://example.com/2024/post/')
+        self.assertEqual(canonicalize('https://example.com:8443/x?q=a%20b'), 'https://example.com:8443/x?q=a%20b')
+        self.assertEqual(canonicalize('https://example.com/x?from=rss', ['from']), 'https://example.com/x')
+        self.assertEqual(canonicalize('mailto:someone@example.com'), 'mailto:someone@example.com')
+        # 前端路由片段决定文章内容，不能合并
+        self.assertEqual(canonicalize('https://example.com/#/article/1?utm_source=rss'),
+                         'https://example.com/#/article/1?utm_source=rss')
+        self.assertEqual(canonicalize('https://Example.com/app?spm=x#!/post/2'), 'https://example.com/app#!/post/2')
+        self.assertNotEqual(canonicalize('https://example.com/#/article/1'), canonicalize('https://example.com/#/article/2'))
+
+    @patch('src.url_normalizer.requests.Session')
+    def test_resolve_cached(self, mock_session):
+        """测试包装链接解析一次后读取缓存，解析失败的链接保留原样"""
+        def head(url, **kwargs):
+            if url.endswith('/broken'):
+                raise requests.exceptions.ConnectionError('连接失败')
+            response = MagicMock(status_code=200, history=[MagicMock()])
+            response.url = 'https://Example.com/article/1?utm_medium=feed'
+            return response
+        mock_session.return_value.head.side_effect = head
+
+        normalizer = UrlNormalizer(self.config)
+        items = [
+            {'title': '包装链接', 'link': 'http://plink.anyfeeder.com/abc'},
+            {'title': '失败链接', 'link': 'http://plink.anyfeeder.com/broken'},
+            {'title': '普通链接', 'link': 'https://example.com/article/2?utm_source=rss'},
+            {'title': '已规范', 'link': 'https://example.com/article/3'}
+        ]
+        normalizer.normalize_items(items)
+
+        self.assertEqual(items[0]['link'], 'https://example.com/article/1')
+        self.assertEqual(items[0]['original_link'], 'http://plink.anyfeeder.com/abc')
+        self.assertEqual(items[1]['link'], 'http://plink.anyfeeder.com/broken')
+        self.assertNotIn('original_link', items[1])
+        self.assertEqual(items[2]['link'], 'https://example.com/article/2')
+        self.assertNotIn('original_link', items[3])
+        self.assertEqual(mock_session.return_value.head.call_count, 2)
+
+        # 新实例读取同一个缓存文件，不再发送请求
+        cached = UrlNormalizer(self.config).resolve_many(['http://plink.anyfeeder.com/abc'])
+        self.assertEqual(cached, {'http://plink.anyfeeder.com/abc': 'https://Example.com/article/1?utm_medium=feed'})
+        self.assertEqual(mock_session.return_value.head.call_count, 2)
+
+    def test_purge(self):
+        """测试删除过期的跳转缓存"""
+        normalizer = UrlNormalizer(self.config)
+        with closing(normalizer._connect()) as conn:
+            conn.executemany("INSERT INTO redirects (url, resolved, expires_at) VALUES (?, ?, ?)", [
+                ('http://a.com/old', 'http://a.com/1', time.time() - 1),
+                ('http://a.com/new', 'http://a.com/2', time.time() + 3600)
+            ])
+        normalizer.purge()
+        with closing(normalizer._connect()) as conn:
+            self.assertEqual([row[0] for row in conn.execute("SELECT url FROM redirects")], ['http://a.com/new'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from src.video_processor import VideoProcessor, FFMPEG_EXE
+
+@unittest.skipUnless(FFMPEG_EXE, "需要ffmpeg")
+class TestVideoProcessor(unittest.TestCase):
+    """视频处理测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        """生成一段测试视频"""
+        cls.temp_dir = tempfile.mkdtemp()
+        path = os.path.join(cls.temp_dir, 'test.mp4')
+        subprocess.run([
+            FFMPEG_EXE, '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc=duration=4:size=320x240:rate=10',
+            '-c:v', 'mpeg4', '-y', path
+        ], check=True)
+        with open(path, 'rb') as f:
+            cls.video = f.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir)
+
+    def _fake_get(self, url, headers=None, **kwargs):
+        """按Range请求头返回视频的一部分"""
+        start, end = 0, len(self.video) - 1
+        if headers and headers.get('Range'):
+            first, _, last = headers['Range'][len('bytes='):].partition('-')
+            start = int(first)
+            end = int(last) if last else end
+        body = self.video[start:end + 1]
+        self.requested.append(len(body))
+        response = MagicMock(status_code=206 if headers and headers.get('Range') else 200)
+        response.headers = {
+            'Content-Type': 'video/mp4',
+            'Content-Length': str(len(body)),
+            'Content-Range': f"bytes {start}-{end}/{len(self.video)}",
+            'Accept-Ranges': 'bytes'
+        }
+        response.iter_content.return_value = [body[i:i + 65536] for i in range(0, len(body), 65536)]
+        response.__enter__.return_value = response
+        return response
+
+    def setUp(self):
+        self.requested = []
+        self.output_dir = os.path.join(self.temp_dir, 'frames')
+
+    def test_metadata_and_keyframes(self):
+        """测试探测时长、分辨率并抽取关键帧"""
+        processor = VideoProcessor({'keyframes': 2, 'frame_width': 160}, self.output_dir)
+        with patch('src.video_processor.requests.get', side_effect=self._fake_get):
+            results = processor.process(['http://test.com/v.mp4', 'http://test.com/v.mp4'])
+
+        self.assertEqual(len(results), 1)
+        meta = results[0]
+        self.assertEqual((meta['width'], meta['height']), (320, 240))
+        self.assertAlmostEqual(meta['duration'], 4.0, delta=0.2)
+        self.assertEqual(len(meta['frames']), 2)
+        self.assertTrue(all(os.path.exists(path) for path in meta['frames']))
+
+    def test_byte_budget(self):
+        """测试超出字节预算后停止读取"""
+        processor = VideoProcessor({'byte_budget': 1}, self.output_dir)
+        with patch('src.video_processor.requests.get', side_effect=self._fake_get):
+            results = processor.process(['http://test.com/v.mp4'])
+        self.assertTrue(all(not meta['frames'] for meta in results))
+        self.assertLessEqual(len(self.requested), 1)
+
+if __name__ == '__main__':
+    unittest.main()